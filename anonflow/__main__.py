@@ -1,11 +1,35 @@
+import argparse
 import asyncio
-
-from .app import Application
+import time
 
 
 async def main():
-    app = Application()
-    await app.run()
+    parser = argparse.ArgumentParser(prog="anonflow")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes; updates are sharded between them by chat_id"
+    )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="log how long each startup phase took"
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from .supervisor import Supervisor
+
+        await Supervisor(workers=args.workers, startup_profile=args.startup_profile).run()
+    else:
+        start_time = time.perf_counter()
+        from .app import Application
+        import_time = time.perf_counter() - start_time
+
+        app = Application(startup_profile=args.startup_profile)
+        app.startup_timings["imports"] = import_time
+        await app.run()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,30 +1,58 @@
+import asyncio
+import importlib
 import logging
-from contextlib import contextmanager
-from typing import Any, Generator, Optional
+import signal
+import socket
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import Any, Awaitable, Dict, Generator, List, Optional, TypeVar
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.bot import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiohttp import web
 
-from anonflow import __version_str__
+from anonflow import __version_str__, metrics, tracing
 from anonflow.bot.builders.middleware import build as build_middleware
 from anonflow.bot.builders.routers import build as build_routers
-from anonflow.config import Config
+from anonflow.bot.middleware import (
+    ConcurrencyMiddleware,
+    RecordingMiddleware,
+    SubscriptionMiddleware,
+    ThrottlingMiddleware,
+    TracingMiddleware
+)
+from anonflow.bot.routers import MediaRouter, TextRouter
+from anonflow.bot.sharding import run_worker
+from anonflow.bot.webhook import run_webhook
+from anonflow.config import Config, ConfigReloader
 from anonflow.database import (
     BanRepository,
     Database,
     ModeratorRepository,
+    OutboxRepository,
+    TokenUsageRepository,
     UserRepository
 )
 from anonflow.moderation import (
+    BackendHealth,
+    Hedger,
     ModerationExecutor,
     ModerationPlanner,
-    RuleManager
+    RuleManager,
+    TokenBudget
 )
+from anonflow.profiling import LoopMonitor, ProfilerBusyError, SamplingProfiler
+from anonflow.recording import Recorder, RequestRecordingMiddleware
 from anonflow.services import (
     DeliveryService,
     MessageRouter,
     ModeratorService,
+    Outbox,
+    RateLimiter,
+    StaffDigest,
     UserService
 )
 from anonflow.translator import Translator
@@ -32,6 +60,26 @@ from anonflow.translator import Translator
 from . import paths
 
 
+T = TypeVar("T")
+
+LIVE_CONFIG_FIELDS = (
+    "behavior.throttling.delay",
+    "behavior.subscription_requirement.channel_ids",
+    "forwarding.moderation_chat_ids",
+    "forwarding.publication_channel_ids",
+    "forwarding.types",
+    "forwarding.digest.immediate_severity",
+    "moderation.enabled",
+    "moderation.model",
+    "moderation.backends",
+    "moderation.rules_top_k",
+    "moderation.budget",
+    "moderation.adaptive",
+    "moderation.hedging",
+    "logging.level"
+)
+
+
 class NotInitializedError(RuntimeError): ...
 
 @contextmanager
@@ -49,21 +97,51 @@ def require(obj, *names) -> Generator[Any, Any, None]:
         yield tuple(values)
 
 class Application:
-    def __init__(self):
+    def __init__(
+        self,
+        shard: Optional[int] = None,
+        shards: int = 1,
+        startup_profile: bool = False,
+        config: Optional[Config] = None,
+        session: Optional[BaseSession] = None
+    ):
         self._logger = logging.getLogger(__name__)
 
+        self.shard = shard
+        self.shards = shards
+        self.session = session
+
+        self.startup_profile = startup_profile
+        self.startup_timings: Dict[str, float] = {}
+
         self.bot: Optional[Bot] = None
         self.dispatcher: Optional[Dispatcher] = None
-        self.config: Optional[Config] = None
+        self.config: Optional[Config] = config
         self.database: Optional[Database] = None
         self.moderator_service: Optional[ModeratorService] = None
         self.user_service: Optional[UserService] = None
         self.translator: Optional[Translator] = None
+        self.rate_limiter: Optional[RateLimiter] = None
+        self.delivery_service: Optional[DeliveryService] = None
+        self.staff_digest: Optional[StaffDigest] = None
         self.moderation_planner: Optional[ModerationPlanner] = None
         self.moderation_executor: Optional[ModerationExecutor] = None
         self.message_router: Optional[MessageRouter] = None
+        self.concurrency: Optional[ConcurrencyMiddleware] = None
+        self.config_reloader: Optional[ConfigReloader] = None
+        self.loop_monitor: Optional[LoopMonitor] = None
+        self.profiler: Optional[SamplingProfiler] = None
+        self.recorder: Optional[Recorder] = None
+
+        self.middlewares: List[Any] = []
+        self.routers: List[Any] = []
+
+        self._metrics_runner: Optional[web.AppRunner] = None
 
     def _init_config(self):
+        if self.config is not None:
+            return
+
         config_filepath = paths.CONFIG_FILEPATH
 
         if not config_filepath.exists():
@@ -80,6 +158,16 @@ class Application:
                 level=config.logging.level,
             )
 
+    def _init_recording(self):
+        with require(self, "config") as config:
+            recording = config.recording
+            if recording.enabled:
+                self.recorder = Recorder(
+                    self._get_shard_filepath(paths.RECORDING_FILEPATH),
+                    salt=recording.salt.get_secret_value() if recording.salt else None,
+                    redact_text=recording.redact_text
+                )
+
     async def _init_database(self):
         with require(self, "config") as config:
             self.database = Database(config.get_database_url())
@@ -93,7 +181,9 @@ class Application:
             await self.moderator_service.init()
             self.user_service = UserService(
                 self.database,
-                UserRepository()
+                UserRepository(),
+                cache_size=config.database.repositories.user.cache_size,
+                cache_ttl=config.database.repositories.user.cache_ttl
             )
 
     def _init_bot(self):
@@ -104,29 +194,101 @@ class Application:
 
             self.bot = Bot(
                 token=bot_token.get_secret_value(),
+                session=self.session,
                 default=DefaultBotProperties(parse_mode="HTML")
             )
+            if self.recorder:
+                self.bot.session.middleware(RequestRecordingMiddleware(self.recorder))
             self.dispatcher = Dispatcher(storage=MemoryStorage())
 
     async def _init_translator(self):
         self.translator = Translator(translations_dir=paths.TRANSLATIONS_DIR)
         await self.translator.init(self.bot)
 
+    async def _init_telegram(self):
+        self._init_bot()
+        await self._init_translator()
+
+    @staticmethod
+    def _get_shared_chat_ids(config: Config):
+        return (*config.forwarding.moderation_chat_ids, *config.forwarding.publication_channel_ids)
+
     def _init_transport(self):
         with require(
-            self, "bot", "config", "translator"
-        ) as (bot, config, translator):
+            self, "bot", "config", "database", "translator", "user_service"
+        ) as (bot, config, database, translator, user_service):
+            rate_limit = config.delivery.rate_limit
+            outbox = config.delivery.outbox
+
+            self.rate_limiter = RateLimiter(
+                global_per_second=rate_limit.global_per_second / self.shards,
+                private_chat_per_second=rate_limit.private_chat_per_second,
+                group_chat_per_minute=rate_limit.group_chat_per_minute,
+                chat_burst=rate_limit.chat_burst,
+                shared_chat_ids=self._get_shared_chat_ids(config),
+                shards=self.shards
+            ) if rate_limit.enabled else None
+
+            self.delivery_service = DeliveryService(
+                bot,
+                rate_limiter=self.rate_limiter,
+                outbox=Outbox(
+                    database,
+                    OutboxRepository(),
+                    workers=outbox.workers,
+                    max_attempts=outbox.max_attempts,
+                    backoff_base=outbox.backoff_base,
+                    backoff_max=outbox.backoff_max,
+                    shard=self.shard,
+                    shards=self.shards
+                ) if outbox.enabled else None
+            )
+
+            digest = config.forwarding.digest
+            if digest.enabled:
+                _ = translator.get()
+                self.staff_digest = StaffDigest(
+                    self.delivery_service,
+                    header=lambda count: _("messages.staff.moderation_digest", count=count),
+                    interval=digest.interval,
+                    max_items=digest.max_items
+                )
+
             self.message_router = MessageRouter(
                 moderation_chat_ids=config.forwarding.moderation_chat_ids,
                 publication_channel_ids=config.forwarding.publication_channel_ids,
-                delivery_service=DeliveryService(bot),
-                translator=translator
+                delivery_service=self.delivery_service,
+                translator=translator,
+                status_message=config.behavior.status_message.enabled,
+                staff_digest=self.staff_digest,
+                digest_immediate_severity=digest.immediate_severity,
+                user_service=user_service
             )
 
     def _init_middleware(self):
         with require(
             self, "dispatcher", "config", "message_router", "user_service", "moderator_service"
         ) as (dispatcher, config, message_router, user_service, moderator_service):
+            if self.recorder:
+                dispatcher.update.outer_middleware(RecordingMiddleware(self.recorder))
+
+            if config.tracing.enabled:
+                tracing.set_tracer(
+                    tracing.Tracer(
+                        self._get_shard_filepath(paths.TRACES_FILEPATH),
+                        sample_rate=config.tracing.sample_rate,
+                        slow_threshold=config.tracing.slow_threshold,
+                        report_size=config.tracing.report_size
+                    )
+                )
+                dispatcher.update.outer_middleware(TracingMiddleware())
+
+            self.concurrency = ConcurrencyMiddleware(
+                limit=config.bot.concurrency.limit,
+                max_waiting=config.bot.concurrency.max_waiting
+            )
+            dispatcher.update.outer_middleware(self.concurrency)
+
             middlewares = build_middleware(
                 message_router=message_router,
                 user_service=user_service,
@@ -140,16 +302,20 @@ class Application:
 
             for middleware in middlewares:
                 dispatcher.update.middleware(middleware)
+            self.middlewares = middlewares
 
-    def _init_moderation(self):
+    async def _init_moderation(self):
         with require(self, "config") as config:
-            self.rule_manager = RuleManager(rules_dir=paths.RULES_DIR)
+            self.rule_manager = RuleManager(rules_dir=paths.RULES_DIR, top_k=config.moderation.rules_top_k)
             self.rule_manager.reload()
 
             api_key = config.openai.api_key
             if not api_key and config.moderation.enabled:
                 raise ValueError("openai.api_key is required and cannot be empty")
 
+            if config.moderation.enabled:
+                await asyncio.to_thread(importlib.import_module, "openai")
+
             base_url = config.openai.base_url
             proxy = config.openai.proxy
 
@@ -161,22 +327,252 @@ class Application:
                 base_url=str(base_url) if base_url else None,
                 proxy=str(proxy) if proxy else None,
                 timeout=config.openai.timeout,
-                max_retries=config.openai.max_retries
+                max_retries=config.openai.max_retries,
+                recorder=self.recorder,
+                output=config.moderation.output,
+                stream=config.moderation.stream,
+                token_budget=TokenBudget(
+                    daily_tokens=config.moderation.budget.daily_tokens,
+                    request_tokens=config.moderation.budget.request_tokens,
+                    on_exceeded=config.moderation.budget.on_exceeded,
+                    shard=self.shard,
+                    shards=self.shards
+                ),
+                backend_health=BackendHealth(
+                    enabled=config.moderation.adaptive.enabled,
+                    latency_slo=config.moderation.adaptive.latency_slo,
+                    error_rate_slo=config.moderation.adaptive.error_rate_slo,
+                    window=config.moderation.adaptive.window,
+                    min_samples=config.moderation.adaptive.min_samples,
+                    recovery_samples=config.moderation.adaptive.recovery_samples,
+                    probe_interval=config.moderation.adaptive.probe_interval
+                ),
+                hedger=Hedger(
+                    enabled=config.moderation.hedging.enabled,
+                    quantile=config.moderation.hedging.quantile,
+                    max_rate=config.moderation.hedging.max_rate,
+                    window=config.moderation.hedging.window,
+                    min_samples=config.moderation.hedging.min_samples,
+                    min_delay=config.moderation.hedging.min_delay
+                )
             )
             self.moderation_planner.set_enabled(config.moderation.enabled)
             self.moderation_executor = ModerationExecutor(planner=self.moderation_planner)
 
+            await self.moderation_planner.prewarm()
+
+    def _get_live_fields(self):
+        # Settings of a middleware that was not installed at startup only take effect after a restart.
+        installed = {type(middleware) for middleware in self.middlewares}
+        skipped = set()
+        if ThrottlingMiddleware not in installed:
+            skipped.add("behavior.throttling.delay")
+        if SubscriptionMiddleware not in installed:
+            skipped.add("behavior.subscription_requirement.channel_ids")
+
+        return [field for field in LIVE_CONFIG_FIELDS if field not in skipped]
+
+    def _apply_config(self, config: Config):
+        with require(
+            self, "message_router", "moderation_planner"
+        ) as (message_router, moderation_planner):
+            # The steps that can fail come first, so that a rejected config changes nothing.
+            rules = self.rule_manager.read()
+            api_key = config.openai.api_key
+            moderation_planner.set_enabled(
+                config.moderation.enabled,
+                api_key=api_key.get_secret_value() if api_key else None
+            )
+            moderation_planner.set_model(config.moderation.model)
+            moderation_planner.set_backends(config.moderation.backends)
+            self.rule_manager.top_k = config.moderation.rules_top_k
+
+            token_budget = moderation_planner.token_budget
+            token_budget.daily_tokens = config.moderation.budget.daily_tokens
+            token_budget.request_tokens = config.moderation.budget.request_tokens
+            token_budget.on_exceeded = config.moderation.budget.on_exceeded
+
+            backend_health = moderation_planner.backend_health
+            backend_health.enabled = config.moderation.adaptive.enabled
+            backend_health.latency_slo = config.moderation.adaptive.latency_slo
+            backend_health.error_rate_slo = config.moderation.adaptive.error_rate_slo
+            backend_health.window = config.moderation.adaptive.window
+            backend_health.min_samples = config.moderation.adaptive.min_samples
+            backend_health.recovery_samples = config.moderation.adaptive.recovery_samples
+            backend_health.probe_interval = config.moderation.adaptive.probe_interval
+
+            hedger = moderation_planner.hedger
+            hedger.enabled = config.moderation.hedging.enabled
+            hedger.quantile = config.moderation.hedging.quantile
+            hedger.max_rate = config.moderation.hedging.max_rate
+            hedger.window = config.moderation.hedging.window
+            hedger.min_samples = config.moderation.hedging.min_samples
+            hedger.min_delay = config.moderation.hedging.min_delay
+            self.rule_manager.reload(rules)
+
+            message_router.moderation_chat_ids = config.forwarding.moderation_chat_ids
+            message_router.publication_channel_ids = config.forwarding.publication_channel_ids
+            message_router.digest_immediate_severity = config.forwarding.digest.immediate_severity
+            if self.rate_limiter:
+                self.rate_limiter.set_shared_chat_ids(self._get_shared_chat_ids(config))
+
+            for middleware in self.middlewares:
+                if isinstance(middleware, ThrottlingMiddleware):
+                    middleware.delay = config.behavior.throttling.delay
+                    middleware.allowed_chat_ids = config.forwarding.moderation_chat_ids
+                elif isinstance(middleware, SubscriptionMiddleware):
+                    middleware.channel_ids = config.behavior.subscription_requirement.channel_ids
+
+            for router in self.routers:
+                if isinstance(router, (MediaRouter, TextRouter)):
+                    router.forwarding_types = config.forwarding.types
+
+            logging.getLogger().setLevel(config.logging.level)
+
+    @contextmanager
+    def _measure(self, phase: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[phase] = time.perf_counter() - start_time
+
+    async def _measured(self, phase: str, awaitable: Awaitable[T]) -> T:
+        with self._measure(phase):
+            return await awaitable
+
+    def _report_startup(self):
+        width = max(map(len, self.startup_timings), default=0)
+        self._logger.info(
+            "Startup profile:\n%s",
+            "\n".join(
+                f"  {phase:<{width}}  {elapsed_time * 1000:8.1f} ms"
+                for phase, elapsed_time in self.startup_timings.items()
+            )
+        )
+
+    def _get_shard_filepath(self, filepath: Path):
+        if self.shard is None:
+            return filepath
+        return filepath.with_name(f"{filepath.stem}.{self.shard}{filepath.suffix}")
+
+    def _start_profile(self):
+        with require(self, "config", "profiler") as (config, profiler):
+            try:
+                profiler.start(config.profiling.default_duration)
+            except ProfilerBusyError as e:
+                self._logger.warning("%s", e)
+
+    def _start_profiling(self):
+        with require(self, "config") as config:
+            profiling = config.profiling
+
+            if profiling.loop_monitor:
+                self.loop_monitor = LoopMonitor(
+                    threshold=profiling.lag_threshold,
+                    asyncio_debug=profiling.asyncio_debug,
+                    slow_callback_duration=profiling.slow_callback_duration
+                )
+                self.loop_monitor.start()
+
+            if self.profiler:
+                with suppress(NotImplementedError, AttributeError):
+                    asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self._start_profile)
+
+    async def _stop_profiling(self):
+        if self.profiler:
+            with suppress(NotImplementedError, AttributeError):
+                asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+            await self.profiler.close()
+        if self.loop_monitor:
+            await self.loop_monitor.close()
+
+    def _report_traces(self):
+        tracer = tracing.get_tracer()
+        if tracer is None:
+            return
+
+        self._logger.info(tracer.report())
+        tracer.close()
+        tracing.set_tracer(None)
+
+    async def _replay_pending_updates(self):
+        with require(self, "bot", "dispatcher", "concurrency") as (bot, dispatcher, concurrency):
+            updates = concurrency.load(self._get_shard_filepath(paths.PENDING_UPDATES_FILEPATH))
+            if updates:
+                self._logger.info("Replaying %d update(s) left unfinished by the previous run.", len(updates))
+
+            for update in updates:
+                await concurrency.spawn(dispatcher.feed_raw_update(bot, update))
+
+    async def _drain(self, routers: List[MediaRouter]):
+        with require(self, "config", "concurrency") as (config, concurrency):
+            timeout = config.bot.concurrency.shutdown_timeout
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+
+            closing = asyncio.gather(*(router.close() for router in routers))
+            if not await concurrency.wait_idle(timeout):
+                concurrency.dump(self._get_shard_filepath(paths.PENDING_UPDATES_FILEPATH))
+                await concurrency.cancel()
+
+            try:
+                await asyncio.wait_for(closing, max(0, deadline - loop.time()))
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            except Exception:
+                self._logger.exception("Failed to close media routers.")
+
+    def _init_routers(self):
+        with require(
+            self,
+            "dispatcher", "config", "message_router", "user_service",
+            "moderator_service", "moderation_executor", "concurrency"
+        ) as (
+            dispatcher, config, message_router, user_service,
+            moderator_service, moderation_executor, concurrency
+        ):
+            if config.profiling.sampling:
+                self.profiler = SamplingProfiler(
+                    paths.PROFILES_DIR,
+                    interval=config.profiling.sampling_interval,
+                    name="profile" if self.shard is None else f"profile.{self.shard}"
+                )
+
+            main_router = build_routers(
+                config=config,
+                message_router=message_router,
+                user_service=user_service,
+                moderator_service=moderator_service,
+                moderation_executor=moderation_executor,
+                concurrency=concurrency,
+                profiler=self.profiler
+            )
+            dispatcher.include_router(main_router)
+            self.routers = list(main_router.sub_routers)
+
     async def init(self):
-        self._init_config()
-        self._init_logging()
-        await self._init_database()
-        self._init_bot()
-        await self._init_translator()
-        self._init_transport()
-        self._init_middleware()
-        self._init_moderation()
+        with self._measure("init"):
+            with self._measure("config"):
+                self._init_config()
+                self._init_logging()
+                self._init_recording()
+
+            results = await asyncio.gather(
+                self._measured("database", self._init_database()),
+                self._measured("telegram", self._init_telegram()),
+                self._measured("moderation", self._init_moderation()),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            with self._measure("transport"):
+                self._init_transport()
+                self._init_middleware()
 
-    async def run(self):
+    async def run(self, sock: Optional[socket.socket] = None):
         try:
             await self.init()
         except Exception:
@@ -189,33 +585,101 @@ class Application:
             raise
 
         self._logger.info(f"Anonflow v{__version_str__} has been successfully initialized.")
+        if self.startup_profile:
+            self._report_startup()
 
         with require(
             self,
             "bot", "dispatcher", "config",
-            "database", "message_router",
-            "user_service", "moderator_service",
-            "moderation_planner", "moderation_executor"
+            "database", "delivery_service", "translator",
+            "moderation_planner", "concurrency"
         ) as (
             bot, dispatcher, config,
-            database, message_router,
-            user_service, moderator_service,
-            moderation_planner, moderation_executor
+            database, delivery_service, translator,
+            moderation_planner, concurrency
         ):
-            dispatcher.include_router(
-                build_routers(
-                    config=config,
-                    message_router=message_router,
-                    user_service=user_service,
-                    moderator_service=moderator_service,
-                    moderation_executor=moderation_executor,
-                )
+            self._init_routers()
+
+            self.config_reloader = ConfigReloader(
+                paths.CONFIG_FILEPATH,
+                config,
+                self._apply_config,
+                self._get_live_fields(),
+                watch=config.reload.watch,
+                interval=config.reload.interval
             )
 
+            allowed_updates = dispatcher.resolve_used_update_types()
+
             try:
-                await dispatcher.start_polling(bot)
+                await delivery_service.start()
+                await moderation_planner.token_budget.start(database, TokenUsageRepository())
+                if self.staff_digest:
+                    self.staff_digest.start()
+                if config.metrics.enabled:
+                    metrics.set_enabled(True)
+                    self._metrics_runner = await metrics.serve(
+                        config.metrics.host, config.metrics.port + (self.shard or 0)
+                    )
+
+                self._start_profiling()
+                await self._replay_pending_updates()
+                self.config_reloader.start()
+                translator.start()
+
+                if sock is not None:
+                    await run_worker(
+                        dispatcher,
+                        bot,
+                        sock,
+                        allowed_updates=allowed_updates,
+                        concurrency=concurrency
+                    )
+                elif config.bot.mode == "webhook":
+                    webhook = config.bot.webhook
+                    if not webhook.url:
+                        raise ValueError("bot.webhook.url is required in webhook mode")
+
+                    await run_webhook(
+                        dispatcher,
+                        bot,
+                        url=str(webhook.url),
+                        path=webhook.path,
+                        host=webhook.host,
+                        port=webhook.port,
+                        secret_token=(
+                            webhook.secret_token.get_secret_value()
+                            if webhook.secret_token else None
+                        ),
+                        max_connections=webhook.max_connections,
+                        allowed_updates=allowed_updates,
+                        concurrency=concurrency
+                    )
+                else:
+                    await dispatcher.start_polling(
+                        bot,
+                        allowed_updates=allowed_updates,
+                        tasks_concurrency_limit=concurrency.capacity,
+                        close_bot_session=False
+                    )
             finally:
                 self._logger.info("Shutting down Anonflow...")
+                await self.config_reloader.close()
+                await translator.close()
+                await self._stop_profiling()
+                await self._drain([
+                    router for router in self.routers
+                    if isinstance(router, MediaRouter)
+                ])
+                if self.staff_digest:
+                    await self.staff_digest.close()
+                await delivery_service.close()
                 await bot.session.close()
+                await moderation_planner.token_budget.close()
                 await database.close()
                 await moderation_planner.close()
+                self._report_traces()
+                if self.recorder:
+                    self.recorder.close()
+                if self._metrics_runner:
+                    await self._metrics_runner.cleanup()
@@ -1,12 +1,17 @@
+from typing import Optional
+
 from aiogram import Router
 
+from anonflow.bot.middleware import ConcurrencyMiddleware
 from anonflow.config import Config
 from anonflow.moderation import ModerationExecutor
+from anonflow.profiling import SamplingProfiler
 from anonflow.services import MessageRouter, ModeratorService, UserService
 
 from anonflow.bot.routers import (
     InfoRouter,
     MediaRouter,
+    ProfileRouter,
     StartRouter,
     TextRouter
 )
@@ -17,6 +22,8 @@ def build(
     user_service: UserService,
     moderator_service: ModeratorService,
     moderation_executor: ModerationExecutor,
+    concurrency: Optional[ConcurrencyMiddleware] = None,
+    profiler: Optional[SamplingProfiler] = None
 ) -> Router:
     main_router = Router()
 
@@ -26,6 +33,20 @@ def build(
             user_service=user_service
         ),
         InfoRouter(message_router=message_router),
+    ]
+
+    if profiler:
+        routers.append(
+            ProfileRouter(
+                message_router=message_router,
+                moderator_service=moderator_service,
+                profiler=profiler,
+                default_duration=config.profiling.default_duration,
+                max_duration=config.profiling.max_duration
+            )
+        )
+
+    routers += [
         TextRouter(
             message_router=message_router,
             forwarding_types=config.forwarding.types,
@@ -34,7 +55,9 @@ def build(
         MediaRouter(
             message_router=message_router,
             forwarding_types=config.forwarding.types,
-            moderation_executor=moderation_executor
+            moderation_executor=moderation_executor,
+            media_groups=config.behavior.media_groups,
+            concurrency=concurrency
         ),
     ]
 
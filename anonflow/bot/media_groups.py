@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from anonflow import metrics, tracing
+from anonflow.constants import MAX_MEDIA_GROUP_SIZE
+
+GAP_HISTORY = 256
+GAP_QUANTILE = 0.95
+
+
+@dataclass
+class _PendingGroup:
+    chat_id: int
+    items: List[Any] = field(default_factory=list)
+    last_arrival: float = 0
+    max_gap: float = 0
+    deadline: float = 0
+
+
+class MediaGroupAggregator:
+    def __init__(
+        self,
+        callback: Callable[[List[Any]], Awaitable[None]],
+        window: float = 2,
+        min_window: float = 1.5,
+        max_window: float = 5,
+        adaptive: bool = True,
+        max_pending: int = 1024
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self._callback = callback
+
+        self.window = window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.adaptive = adaptive
+        self.max_pending = max_pending
+
+        self._gaps: Deque[float] = deque(maxlen=GAP_HISTORY)
+
+        self._groups: Dict[str, _PendingGroup] = {}
+        self._deadlines: List[Tuple[float, str]] = []
+
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_lock_users: Dict[int, int] = {}
+        self._flush_tasks: Set[asyncio.Task] = set()
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.media_groups_pending.set_function(lambda: len(self._groups))
+
+    def _get_window(self, group: _PendingGroup):
+        if not self.adaptive or not self._gaps:
+            return self.window
+
+        # A high percentile rather than the mean: most albums arrive within milliseconds,
+        # but the slow ones on poor connections must not be split into two posts.
+        # An album that is already arriving slowly gets a window based on its own gaps.
+        gaps = sorted(self._gaps)
+        gap = max(gaps[int(GAP_QUANTILE * (len(gaps) - 1))] * 4, group.max_gap * 2)
+        return min(self.max_window, max(self.min_window, gap))
+
+    def _observe_gap(self, group: _PendingGroup, gap: float):
+        group.max_gap = max(group.max_gap, gap)
+        if gap <= self.max_window:
+            self._gaps.append(gap)
+
+    def _schedule(self, group_id: str, deadline: float):
+        heapq.heappush(self._deadlines, (deadline, group_id))
+        self._wakeup.set()
+
+    def _close(self, group_id: str):
+        group = self._groups.pop(group_id, None)
+        if group is None:
+            return
+
+        task = asyncio.create_task(self._flush(group))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self, group: _PendingGroup):
+        chat_id = group.chat_id
+
+        lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_lock_users[chat_id] = self._chat_lock_users.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await self._callback(group.items)
+        except Exception:
+            self._logger.exception("Failed to process media group chat_id=%s", chat_id)
+        finally:
+            self._chat_lock_users[chat_id] -= 1
+            if not self._chat_lock_users[chat_id]:
+                self._chat_lock_users.pop(chat_id)
+                self._chat_locks.pop(chat_id)
+
+    def _evict(self):
+        while len(self._groups) > self.max_pending:
+            group_id = min(self._groups, key=lambda key: self._groups[key].last_arrival)
+            self._logger.warning("Too many pending media groups, closing media_group_id=%s early.", group_id)
+            self._close(group_id)
+
+    async def _run(self):
+        tracing.detach()
+
+        while True:
+            now = time.monotonic()
+            while self._deadlines and self._deadlines[0][0] <= now:
+                deadline, group_id = heapq.heappop(self._deadlines)
+                group = self._groups.get(group_id)
+                if group is not None and group.deadline == deadline:
+                    self._close(group_id)
+
+            self._wakeup.clear()
+            timeout = self._deadlines[0][0] - now if self._deadlines else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def add(self, chat_id: int, group_id: str, item: Any):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        now = time.monotonic()
+
+        group = self._groups.get(group_id)
+        if group is None:
+            group = self._groups[group_id] = _PendingGroup(chat_id=chat_id)
+        else:
+            self._observe_gap(group, now - group.last_arrival)
+
+        group.items.append(item)
+        group.last_arrival = now
+
+        if len(group.items) >= MAX_MEDIA_GROUP_SIZE:
+            self._close(group_id)
+            return
+
+        group.deadline = now + self._get_window(group)
+        self._schedule(group_id, group.deadline)
+
+        self._evict()
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        for group_id in list(self._groups):
+            self._close(group_id)
+        self._deadlines.clear()
+
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
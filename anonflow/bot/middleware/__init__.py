@@ -1,11 +1,17 @@
 from .banned import BannedMiddleware
+from .concurrency import ConcurrencyMiddleware
 from .not_registered import NotRegisteredMiddleware
+from .recording import RecordingMiddleware
 from .subscription import SubscriptionMiddleware
 from .throttling import ThrottlingMiddleware
+from .tracing import TracingMiddleware
 
 __all__ = [
     "BannedMiddleware",
+    "ConcurrencyMiddleware",
     "NotRegisteredMiddleware",
+    "RecordingMiddleware",
     "SubscriptionMiddleware",
-    "ThrottlingMiddleware"
+    "ThrottlingMiddleware",
+    "TracingMiddleware"
 ]
@@ -1,6 +1,7 @@
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
+from anonflow import metrics, tracing
 from anonflow.services import MessageRouter, ModeratorService
 from anonflow.services.transport.results import UserBannedResult
 
@@ -15,8 +16,12 @@ class BannedMiddleware(BaseMiddleware):
     async def __call__(self, handler, event, data):
         message = getattr(event, "message", None)
         if isinstance(message, Message):
-            if await self.moderator_service.is_banned(message.chat.id):
+            with tracing.span("middleware.banned"):
+                is_banned = await self.moderator_service.is_banned(message.chat.id)
+            if is_banned:
+                metrics.middleware_decisions_total.inc("banned", "blocked")
                 await self.message_router.dispatch(UserBannedResult(), message)
                 return
+            metrics.middleware_decisions_total.inc("banned", "passed")
 
         return await handler(event, data)
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Coroutine, Dict, List, Set
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from anonflow import metrics, tracing
+
+
+class ConcurrencyMiddleware(BaseMiddleware):
+    def __init__(self, limit: int = 64, max_waiting: int = 1024):
+        super().__init__()
+
+        self._logger = logging.getLogger(__name__)
+
+        self.limit = limit
+        self.max_waiting = max_waiting
+
+        self._semaphore = asyncio.Semaphore(limit)
+        self._admission = asyncio.Semaphore(self.capacity)
+
+        self._updates: Dict[int, Update] = {}
+        self._holds: Dict[int, int] = {}
+        # Updates whose handler has run and may have sent messages already, so they are never replayed.
+        self._started: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        metrics.updates_in_flight.set_function(lambda: len(self._updates))
+
+    @property
+    def capacity(self):
+        return self.limit + self.max_waiting
+
+    def hold(self, update: Update):
+        self._updates[update.update_id] = update
+        self._holds[update.update_id] = self._holds.get(update.update_id, 0) + 1
+        self._idle.clear()
+
+    def release(self, update_id: int):
+        count = self._holds.get(update_id, 0) - 1
+        if count > 0:
+            self._holds[update_id] = count
+            return
+
+        self._holds.pop(update_id, None)
+        self._updates.pop(update_id, None)
+        self._started.discard(update_id)
+        if not self._updates:
+            self._idle.set()
+
+    def _track(self, task: asyncio.Task):
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def spawn(self, coro: Coroutine[Any, Any, Any]):
+        await self._admission.acquire()
+
+        task = asyncio.create_task(coro)
+        self._track(task)
+        task.add_done_callback(lambda _: self._admission.release())
+        return task
+
+    async def __call__(self, handler, event: Update, data):
+        task = asyncio.current_task()
+        if task:
+            self._track(task)
+
+        self.hold(event)
+        start_time = time.perf_counter()
+        try:
+            with tracing.span("concurrency.wait"):
+                await self._semaphore.acquire()
+            self._started.add(event.update_id)
+            try:
+                result = await handler(event, data)
+            finally:
+                self._semaphore.release()
+        except Exception:
+            metrics.updates_total.inc("error")
+            raise
+        else:
+            metrics.updates_total.inc("ok")
+            return result
+        finally:
+            metrics.update_duration_seconds.observe(time.perf_counter() - start_time)
+            self.release(event.update_id)
+
+    async def wait_idle(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def cancel(self):
+        tasks = set(self._tasks)
+        current_task = asyncio.current_task()
+        tasks.discard(current_task) # type: ignore
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def dump(self, filepath: Path):
+        started = len(self._started)
+        if started:
+            self._logger.warning("Dropping %d update(s) interrupted while being handled.", started)
+
+        updates = sorted(
+            (update for update_id, update in self._updates.items() if update_id not in self._started),
+            key=lambda update: update.update_id
+        )
+        if not updates:
+            return 0
+
+        with filepath.open("a", encoding="utf-8") as file:
+            for update in updates:
+                file.write(update.model_dump_json(exclude_unset=True) + "\n")
+
+        self._logger.warning("Saved %d unfinished update(s) to %s.", len(updates), filepath)
+        return len(updates)
+
+    @staticmethod
+    def load(filepath: Path) -> List[Dict[str, Any]]:
+        if not filepath.exists():
+            return []
+
+        with filepath.open(encoding="utf-8") as file:
+            updates = [json.loads(line) for line in file if line.strip()]
+        filepath.unlink()
+
+        return updates
@@ -2,6 +2,7 @@ from aiogram import BaseMiddleware
 from aiogram.enums import ChatType
 from aiogram.types import Message
 
+from anonflow import metrics, tracing
 from anonflow.services import MessageRouter, UserService
 from anonflow.services.transport.results import UserNotRegisteredResult
 
@@ -18,9 +19,12 @@ class NotRegisteredMiddleware(BaseMiddleware):
         if isinstance(message, Message) and message.chat.type == ChatType.PRIVATE:
             text = message.text or message.caption or ""
 
-            is_user_exists = await self.user_service.has(message.chat.id)
+            with tracing.span("middleware.not_registered"):
+                is_user_exists = await self.user_service.has(message.chat.id)
             if not is_user_exists and not text.startswith("/start"):
+                metrics.middleware_decisions_total.inc("not_registered", "blocked")
                 await self.message_router.dispatch(UserNotRegisteredResult(), message)
                 return
+            metrics.middleware_decisions_total.inc("not_registered", "passed")
 
         return await handler(event, data)
@@ -0,0 +1,13 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from anonflow.recording import Recorder
+
+
+class RecordingMiddleware(BaseMiddleware):
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+
+    async def __call__(self, handler, event: Update, data):
+        self.recorder.record_update(event)
+        return await handler(event, data)
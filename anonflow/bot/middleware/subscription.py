@@ -4,6 +4,7 @@ from aiogram import BaseMiddleware
 from aiogram.enums import ChatMemberStatus, ChatType
 from aiogram.types import ChatIdUnion, Message
 
+from anonflow import metrics, tracing
 from anonflow.services import MessageRouter
 from anonflow.services.transport.results import UserSubscriptionRequiredResult
 
@@ -20,9 +21,12 @@ class SubscriptionMiddleware(BaseMiddleware):
         if isinstance(message, Message) and message.chat.type == ChatType.PRIVATE:
             user_id = message.from_user.id # type: ignore
             for channel_id in self.channel_ids:
-                member = await message.bot.get_chat_member(channel_id, user_id) # type: ignore
+                with tracing.span("middleware.subscription"):
+                    member = await message.bot.get_chat_member(channel_id, user_id) # type: ignore
                 if member.status in (ChatMemberStatus.KICKED, ChatMemberStatus.LEFT):
+                    metrics.middleware_decisions_total.inc("subscription", "blocked")
                     await self.message_router.dispatch(UserSubscriptionRequiredResult(), message)
                     return
+            metrics.middleware_decisions_total.inc("subscription", "passed")
 
         return await handler(event, data)
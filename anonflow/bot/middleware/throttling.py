@@ -5,6 +5,7 @@ from typing import Dict, Iterable, Optional
 from aiogram import BaseMiddleware
 from aiogram.types import ChatIdUnion, Message
 
+from anonflow import metrics, tracing
 from anonflow.services import MessageRouter
 from anonflow.services.transport.results import UserThrottledResult
 
@@ -36,6 +37,7 @@ class ThrottlingMiddleware(BaseMiddleware):
                     user_lock = self.user_locks.setdefault(message.chat.id, asyncio.Lock())
 
                 if user_lock.locked():
+                    metrics.middleware_decisions_total.inc("throttling", "blocked")
                     start_time = self.user_times.get(message.chat.id) or 0
                     current_time = time.monotonic()
 
@@ -50,6 +52,7 @@ class ThrottlingMiddleware(BaseMiddleware):
                     )
                     return
 
+                metrics.middleware_decisions_total.inc("throttling", "passed")
                 async with user_lock:
                     start_time = time.monotonic()
                     self.user_times[message.chat.id] = start_time
@@ -57,7 +60,8 @@ class ThrottlingMiddleware(BaseMiddleware):
                     result = await handler(event, data)
 
                     elapsed_time = time.monotonic() - start_time
-                    await asyncio.sleep(max(0, self.delay - elapsed_time))
+                    with tracing.span("middleware.throttling.cooldown"):
+                        await asyncio.sleep(max(0, self.delay - elapsed_time))
 
                 async with self.lock:
                     self.user_locks.pop(message.chat.id)
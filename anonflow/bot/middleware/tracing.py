@@ -0,0 +1,17 @@
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from anonflow import tracing
+
+
+class TracingMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event: Update, data):
+        trace = tracing.start("update", update_id=event.update_id, type=event.event_type)
+        if trace is None:
+            return await handler(event, data)
+
+        try:
+            with tracing.activate(trace):
+                return await handler(event, data)
+        finally:
+            tracing.finish(trace)
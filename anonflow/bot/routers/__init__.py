@@ -1,11 +1,13 @@
 from .info import InfoRouter
 from .media import MediaRouter
+from .profile import ProfileRouter
 from .start import StartRouter
 from .text import TextRouter
 
 __all__ = [
     "InfoRouter",
     "MediaRouter",
+    "ProfileRouter",
     "StartRouter",
     "TextRouter"
 ]
@@ -1,15 +1,20 @@
 import asyncio
 import base64
-from asyncio import CancelledError
-from contextlib import suppress
 from io import BytesIO
-from typing import Dict, FrozenSet, List
+from typing import Dict, FrozenSet, List, Optional, Tuple, get_args
 
 from aiogram import F, Router
 from aiogram.enums import ChatType
-from aiogram.types import Message
-
-from anonflow.config.models import ForwardingType
+from aiogram.types import Message, Update
+
+from anonflow import tracing
+from anonflow.bot.media_groups import MediaGroupAggregator
+from anonflow.bot.middleware import ConcurrencyMiddleware
+from anonflow.config.models import (
+    BehaviorMediaGroups,
+    ForwardingType,
+    ModerationSeverity
+)
 from anonflow.moderation import ModerationExecutor
 from anonflow.services.transport import MessageRouter
 from anonflow.services.transport.content import (
@@ -19,9 +24,13 @@ from anonflow.services.transport.content import (
 )
 from anonflow.services.transport.results import (
     ModerationDecisionResult,
-    PostPreparedResult
+    ModerationStartedResult,
+    PostPreparedResult,
+    Results
 )
 
+PendingMessage = Tuple[Message, Optional["asyncio.Task[List[Results]]"]]
+
 
 class MediaRouter(Router):
     def __init__(
@@ -29,27 +38,39 @@ class MediaRouter(Router):
         message_router: MessageRouter,
         forwarding_types: FrozenSet[ForwardingType],
         moderation_executor: ModerationExecutor,
+        media_groups: BehaviorMediaGroups = BehaviorMediaGroups(),
+        concurrency: Optional[ConcurrencyMiddleware] = None
     ):
         super().__init__()
 
         self.message_router = message_router
         self.forwarding_types = forwarding_types
         self.moderation_executor = moderation_executor
-
-        self.media_groups: Dict[str, List[Message]] = {}
-        self.media_groups_tasks: Dict[str, asyncio.Task] = {}
-        self.media_groups_lock = asyncio.Lock()
+        self.concurrency = concurrency
+
+        self._held_updates: Dict[Tuple[int, int], int] = {}
+        self._held_traces: Dict[Tuple[int, int], tracing.Trace] = {}
+
+        self.media_groups = MediaGroupAggregator(
+            self._process_messages,
+            window=media_groups.window,
+            min_window=media_groups.min_window,
+            max_window=media_groups.max_window,
+            adaptive=media_groups.adaptive,
+            max_pending=media_groups.max_pending
+        )
 
     @staticmethod
     async def get_b64image(message: Message):
         if message.photo and message.bot:
-            photo = message.photo[-1]
-            file = await message.bot.get_file(photo.file_id)
-            if file:
-                buffer = BytesIO()
-                await message.bot.download(file, buffer)
-                buffer.seek(0)
-                return (base64.b64encode(buffer.read())).decode()
+            with tracing.span("media.download"):
+                photo = message.photo[-1]
+                file = await message.bot.get_file(photo.file_id)
+                if file:
+                    buffer = BytesIO()
+                    await message.bot.download(file, buffer)
+                    buffer.seek(0)
+                    return (base64.b64encode(buffer.read())).decode()
 
     def _can_send_media(self, msgs: List[Message]):
         return any(
@@ -64,61 +85,134 @@ class MediaRouter(Router):
         elif message.video and "video" in self.forwarding_types:
             return {"type": MediaType.VIDEO, "file_id": message.video.file_id}
 
-    def setup(self):
-        async def process_messages(messages: List[Message]):
-            if not messages:
-                return
-
-            if self._can_send_media(messages):
-                moderation_approved = False
-
-                content_group = ContentMediaGroup()
-                caption = next((msg.caption for msg in messages if msg.caption), "")
-                for message in messages:
-                    async for result in self.moderation_executor.process(
-                        message.caption,
-                        await self.get_b64image(message)
-                    ):
-                        if isinstance(result, ModerationDecisionResult):
-                            moderation_approved = result.is_approved
-                        await self.message_router.dispatch(result, message)
-
-                    media = self._get_media(message)
-                    if media:
-                        content_group.items.append(ContentMediaItem(**media, caption=caption))
-
-                await self.message_router.dispatch(
-                    PostPreparedResult(content_group, moderation_approved),
-                    messages[0]
-                )
+    async def _moderate(self, message: Message, download: bool = True) -> List[Results]:
+        return [
+            result
+            async for result in self.moderation_executor.process(
+                message.caption,
+                await self.get_b64image(message) if download else None
+            )
+        ]
 
-        @self.message(F.photo | F.video)
-        async def on_photo(message: Message):
-            if message.chat.type != ChatType.PRIVATE:
-                return
+    @staticmethod
+    def _merge_decisions(decisions: List[ModerationDecisionResult]):
+        if not decisions:
+            return None
+
+        rejected = [decision for decision in decisions if not decision.is_approved]
+        reasons = dict.fromkeys(decision.reason for decision in (rejected or decisions))
+
+        return ModerationDecisionResult(
+            is_approved=not rejected,
+            reason="\n".join(reasons),
+            severity=max(
+                (decision.severity for decision in rejected),
+                key=get_args(ModerationSeverity).index,
+                default="medium"
+            ),
+            # A rejected item outweighs items that only need a review.
+            needs_review=bool(rejected) and all(decision.needs_review for decision in rejected)
+        )
 
-            media_group_id = message.media_group_id
+    def _start_moderation(self, message: Message) -> PendingMessage:
+        # Media that will not be forwarded is never downloaded. Only its caption is checked,
+        # because the album shares it with the items that are forwarded.
+        forwarded = self._get_media(message) is not None
+        if not forwarded and not message.caption:
+            return message, None
+        return message, asyncio.create_task(self._moderate(message, download=forwarded))
 
-            async def await_media_group():
-                with suppress(CancelledError):
-                    await asyncio.sleep(2)
-                    async with self.media_groups_lock:
-                        messages = self.media_groups.pop(media_group_id, []) # type: ignore
-                        self.media_groups_tasks.pop(media_group_id, None) # type: ignore
+    @staticmethod
+    def _cancel(pending: List[PendingMessage]):
+        for _, task in pending:
+            if task:
+                task.cancel()
+
+    def _hold(self, message: Message, update: Update):
+        key = (message.chat.id, message.message_id)
+        if self.concurrency:
+            self.concurrency.hold(update)
+            self._held_updates[key] = update.update_id
+
+        trace = tracing.retain()
+        if trace:
+            self._held_traces[key] = trace
+
+    def _release(self, pending: List[PendingMessage]):
+        for message, _ in pending:
+            key = (message.chat.id, message.message_id)
+            update_id = self._held_updates.pop(key, None)
+            if update_id is not None and self.concurrency:
+                self.concurrency.release(update_id)
+            tracing.release(self._held_traces.pop(key, None))
+
+    async def _process_messages(self, pending: List[PendingMessage]):
+        # Media groups are flushed outside of their updates, so continue the first item's trace.
+        trace = (
+            self._held_traces.get((pending[0][0].chat.id, pending[0][0].message_id))
+            if pending else None
+        )
+        try:
+            with tracing.activate(trace), tracing.span("router.media", items=len(pending)):
+                await self._process_pending(pending)
+        finally:
+            self._release(pending)
+
+    async def _process_pending(self, pending: List[PendingMessage]):
+        if not pending:
+            return
+
+        messages = [message for message, _ in pending]
+        if not self._can_send_media(messages):
+            self._cancel(pending)
+            return
+
+        message = messages[0]
+
+        await self.message_router.dispatch(ModerationStartedResult(), message)
+
+        try:
+            results = [result for _, task in pending if task for result in await task]
+        finally:
+            self._cancel(pending)
+
+        decisions = []
+        for result in results:
+            if isinstance(result, ModerationDecisionResult):
+                decisions.append(result)
+            elif not isinstance(result, ModerationStartedResult):
+                await self.message_router.dispatch(result, message)
+
+        decision = self._merge_decisions(decisions)
+        if decision:
+            await self.message_router.dispatch(decision, message)
+
+        content_group = ContentMediaGroup()
+        caption = next((msg.caption for msg in messages if msg.caption), "")
+        for msg in messages:
+            media = self._get_media(msg)
+            if media:
+                content_group.items.append(ContentMediaItem(**media, caption=caption))
+
+        await self.message_router.dispatch(
+            PostPreparedResult(content_group, decision.is_approved if decision else False),
+            message
+        )
 
-                    await process_messages(messages)
+    async def close(self):
+        await self.media_groups.close()
 
-            if media_group_id:
-                async with self.media_groups_lock:
-                    self.media_groups.setdefault(media_group_id, []).append(message)
+    def setup(self):
+        @self.message(F.photo | F.video)
+        async def on_photo(message: Message, event_update: Update):
+            if message.chat.type != ChatType.PRIVATE:
+                return
 
-                    task = self.media_groups_tasks.get(media_group_id)
-                    if task:
-                        task.cancel()
+            pending = self._start_moderation(message)
 
-                    self.media_groups_tasks[media_group_id] = asyncio.create_task(
-                        await_media_group()
-                    )
+            if message.media_group_id:
+                self._hold(message, event_update)
+                self.media_groups.add(message.chat.id, message.media_group_id, pending)
                 return
 
-            await process_messages([message])
+            await self._process_messages([pending])
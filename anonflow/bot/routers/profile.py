@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Set, Tuple
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from anonflow import tracing
+from anonflow.profiling import ProfilerBusyError, SamplingProfiler
+from anonflow.services import MessageRouter, ModeratorService
+from anonflow.services.transport.results import (
+    ProfilingBusyResult,
+    ProfilingFinishedResult,
+    ProfilingStartedResult
+)
+
+
+class ProfileRouter(Router):
+    def __init__(
+        self,
+        message_router: MessageRouter,
+        moderator_service: ModeratorService,
+        profiler: SamplingProfiler,
+        default_duration: float = 30,
+        max_duration: float = 120
+    ):
+        super().__init__()
+
+        self._logger = logging.getLogger(__name__)
+
+        self.message_router = message_router
+        self.moderator_service = moderator_service
+        self.profiler = profiler
+        self.default_duration = default_duration
+        self.max_duration = max_duration
+
+        self._reports: Set[asyncio.Task] = set()
+
+    async def _is_moderator(self, message: Message):
+        return bool(message.from_user) and await self.moderator_service.has(message.from_user.id) # type: ignore
+
+    def _get_duration(self, args: str):
+        try:
+            duration = float(args) if args else self.default_duration
+        except ValueError:
+            duration = self.default_duration
+
+        return min(self.max_duration, max(1, duration))
+
+    async def _report(self, task: "asyncio.Task[Tuple[Path, int]]", message: Message):
+        # Runs after the update is handled, so that a long profile does not hold a concurrency slot.
+        tracing.detach()
+
+        try:
+            filepath, samples = await task
+        except Exception:
+            self._logger.exception("Failed to record a profile.")
+            return
+
+        await self.message_router.dispatch(ProfilingFinishedResult(str(filepath), samples), message)
+
+    def setup(self):
+        @self.message(Command("profile"), self._is_moderator)
+        async def on_profile(message: Message, command: CommandObject):
+            duration = self._get_duration((command.args or "").strip())
+
+            try:
+                task = self.profiler.start(duration)
+            except ProfilerBusyError:
+                await self.message_router.dispatch(ProfilingBusyResult(), message)
+                return
+
+            await self.message_router.dispatch(ProfilingStartedResult(duration), message)
+
+            report = asyncio.create_task(self._report(task, message))
+            self._reports.add(report)
+            report.add_done_callback(self._reports.discard)
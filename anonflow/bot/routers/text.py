@@ -4,6 +4,7 @@ from aiogram import F, Router
 from aiogram.enums import ChatType
 from aiogram.types import Message
 
+from anonflow import tracing
 from anonflow.config.models import ForwardingType
 from anonflow.moderation import ModerationExecutor
 from anonflow.services.transport import MessageRouter
@@ -34,17 +35,18 @@ class TextRouter(Router):
                 message.chat.type == ChatType.PRIVATE
                 and "text" in self.forwarding_types
             ):
-                moderation_approved = False
-
-                async for result in self.moderation_executor.process(message.text):
-                    if isinstance(result, ModerationDecisionResult):
-                        moderation_approved = result.is_approved
-                    await self.message_router.dispatch(result, message)
-
-                await self.message_router.dispatch(
-                    PostPreparedResult(
-                        ContentTextItem(message.text or ""),
-                        moderation_approved
-                    ),
-                    message
-                )
+                with tracing.span("router.text"):
+                    moderation_approved = False
+
+                    async for result in self.moderation_executor.process(message.text):
+                        if isinstance(result, ModerationDecisionResult):
+                            moderation_approved = result.is_approved
+                        await self.message_router.dispatch(result, message)
+
+                    await self.message_router.dispatch(
+                        PostPreparedResult(
+                            ContentTextItem(message.text or ""),
+                            moderation_approved
+                        ),
+                        message
+                    )
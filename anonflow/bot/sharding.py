@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import socket
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+
+from anonflow.bot.middleware import ConcurrencyMiddleware
+
+logger = logging.getLogger(__name__)
+
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+CHAT_UPDATE_TYPES = (
+    "message",
+    "edited_message",
+    "channel_post",
+    "edited_channel_post",
+    "business_message",
+    "edited_business_message",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "message_reaction",
+    "message_reaction_count",
+    "chat_boost",
+    "removed_chat_boost"
+)
+USER_UPDATE_TYPES = (
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "poll_answer",
+    "purchased_paid_media"
+)
+
+
+def get_chat_id(update: Dict[str, Any]) -> int:
+    for update_type in CHAT_UPDATE_TYPES:
+        event = update.get(update_type)
+        if event and event.get("chat"):
+            return event["chat"]["id"]
+
+    callback_query = update.get("callback_query")
+    if callback_query:
+        message = callback_query.get("message")
+        if message and message.get("chat"):
+            return message["chat"]["id"]
+        return callback_query["from"]["id"]
+
+    for update_type in USER_UPDATE_TYPES:
+        event = update.get(update_type)
+        if event:
+            user = event.get("from") or event.get("user")
+            if user:
+                return user["id"]
+
+    return 0
+
+def get_shard(chat_id: int, shards: int):
+    return chat_id % shards
+
+def encode_frame(data: Dict[str, Any]):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class ShardRouter:
+    def __init__(self, shards: int):
+        self.shards = shards
+
+        self._writers: List[Optional[asyncio.StreamWriter]] = [None] * shards
+        self._ready: List[asyncio.Event] = [asyncio.Event() for _ in range(shards)]
+
+    async def attach(self, shard: int, sock: socket.socket):
+        self._ready[shard].clear()
+
+        reader, writer = await asyncio.open_connection(sock=sock, limit=MAX_FRAME_SIZE)
+        self._writers[shard] = writer
+
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError(f"Worker {shard} exited before becoming ready.")
+
+        self._ready[shard].set()
+        return json.loads(line).get("allowed_updates")
+
+    async def route(self, update: Dict[str, Any]):
+        # Waits until the update is handed to its worker, so the caller only confirms delivered updates.
+        # An update that a worker has read but not finished when it crashes is still lost.
+        shard = get_shard(get_chat_id(update), self.shards)
+
+        while True:
+            await self._ready[shard].wait()
+            writer = self._writers[shard]
+            if writer is not None and not writer.is_closing():
+                try:
+                    writer.write(encode_frame(update))
+                    await writer.drain()
+                    return
+                except ConnectionError:
+                    pass
+
+            # The monitor restarts the worker, and attach() marks it ready again.
+            if self._writers[shard] is writer:
+                self._ready[shard].clear()
+            logger.warning(
+                "Worker %d is unavailable, holding update id=%s until it restarts.", shard, update.get("update_id")
+            )
+
+    async def close(self):
+        for writer in self._writers:
+            if writer and not writer.is_closing():
+                writer.write_eof()
+                writer.close()
+
+        self._writers = [None] * self.shards
+
+
+async def poll_updates(
+    bot: Bot,
+    route: Callable[[Dict[str, Any]], Awaitable],
+    *,
+    allowed_updates: Optional[List[str]] = None,
+    polling_timeout: int = 10,
+    backoff_max: float = 30
+):
+    url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+    offset = None
+    backoff = 1.0
+
+    async with aiohttp.ClientSession() as session:
+        while True:
+            params: Dict[str, Any] = {"timeout": polling_timeout}
+            if allowed_updates is not None:
+                params["allowed_updates"] = allowed_updates
+            if offset is not None:
+                params["offset"] = offset
+
+            try:
+                async with session.post(
+                    url,
+                    json=params,
+                    timeout=aiohttp.ClientTimeout(total=polling_timeout + 10)
+                ) as response:
+                    body = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning("Failed to fetch updates, retrying in %.1fs. Error: %r", backoff, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff_max, backoff * 2)
+                continue
+
+            if not body.get("ok"):
+                delay = (body.get("parameters") or {}).get("retry_after") or backoff
+                logger.warning("Telegram rejected getUpdates: %s", body.get("description"))
+                await asyncio.sleep(delay)
+                backoff = min(backoff_max, backoff * 2)
+                continue
+
+            backoff = 1.0
+            # The offset only moves past updates that were routed, so Telegram keeps the rest.
+            for update in body["result"]:
+                await route(update)
+                offset = update["update_id"] + 1
+
+
+async def run_worker(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    sock: socket.socket,
+    allowed_updates: Optional[List[str]] = None,
+    concurrency: Optional[ConcurrencyMiddleware] = None
+):
+    reader, writer = await asyncio.open_connection(sock=sock, limit=MAX_FRAME_SIZE)
+    tasks: Set[asyncio.Task] = set()
+
+    async def process(update: Dict[str, Any]):
+        try:
+            await dispatcher.feed_raw_update(bot, update)
+        except Exception:
+            logger.exception("Failed to process update id=%s.", update.get("update_id"))
+
+    workflow_data = {
+        "dispatcher": dispatcher,
+        "bots": [bot],
+        **dispatcher.workflow_data
+    }
+    workflow_data.pop("bot", None)
+
+    await dispatcher.emit_startup(bot=bot, **workflow_data)
+    try:
+        writer.write(encode_frame({"allowed_updates": allowed_updates}))
+        await writer.drain()
+
+        while line := await reader.readline():
+            if concurrency:
+                await concurrency.spawn(process(json.loads(line)))
+                continue
+
+            task = asyncio.create_task(process(json.loads(line)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+    finally:
+        writer.close()
+        await dispatcher.emit_shutdown(bot=bot, **workflow_data)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import secrets
+import signal
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from anonflow.bot.middleware import ConcurrencyMiddleware
+
+logger = logging.getLogger(__name__)
+
+
+class _RequestHandler(SimpleRequestHandler):
+    def __init__(self, *args, concurrency: Optional[ConcurrencyMiddleware] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.concurrency = concurrency
+
+    async def _handle_request_background(self, bot: Bot, request: web.Request):
+        if self.concurrency is None:
+            return await super()._handle_request_background(bot, request)
+
+        update = await request.json(loads=bot.session.json_loads)
+        await self.concurrency.spawn(self._background_feed_update(bot=bot, update=update))
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self):
+        pass
+
+
+async def _serve(
+    app: web.Application,
+    bot: Bot,
+    *,
+    url: Optional[str],
+    path: str,
+    host: str,
+    port: int,
+    secret_token: str,
+    max_connections: int,
+    allowed_updates: Optional[List[str]],
+    drop_pending_updates: bool,
+    handle_signals: bool
+):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    stop_event = asyncio.Event()
+    if handle_signals:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        if url:
+            await bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret_token,
+                max_connections=max_connections,
+                allowed_updates=allowed_updates,
+                drop_pending_updates=drop_pending_updates
+            )
+
+        logger.info(
+            "Webhook server is listening on %s:%d%s. Allowed updates: %s",
+            host, port, path, ", ".join(allowed_updates or []) or "all"
+        )
+        await stop_event.wait()
+    finally:
+        if handle_signals:
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                with suppress(NotImplementedError):
+                    loop.remove_signal_handler(sig)
+
+        if url:
+            with suppress(Exception):
+                await bot.delete_webhook()
+        await runner.cleanup()
+
+
+async def run_webhook(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    *,
+    url: Optional[str],
+    path: str = "/webhook",
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    secret_token: Optional[str] = None,
+    max_connections: int = 40,
+    allowed_updates: Optional[List[str]] = None,
+    drop_pending_updates: bool = False,
+    handle_signals: bool = True,
+    concurrency: Optional[ConcurrencyMiddleware] = None
+):
+    secret_token = secret_token or secrets.token_urlsafe(32)
+
+    app = web.Application()
+    _RequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        secret_token=secret_token,
+        concurrency=concurrency
+    ).register(app, path=path)
+    setup_application(app, dispatcher, bot=bot)
+
+    await _serve(
+        app,
+        bot,
+        url=url,
+        path=path,
+        host=host,
+        port=port,
+        secret_token=secret_token,
+        max_connections=max_connections,
+        allowed_updates=allowed_updates,
+        drop_pending_updates=drop_pending_updates,
+        handle_signals=handle_signals
+    )
+
+async def run_ingress_webhook(
+    route: Callable[[Dict[str, Any]], Awaitable],
+    bot: Bot,
+    *,
+    url: Optional[str],
+    path: str = "/webhook",
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    secret_token: Optional[str] = None,
+    max_connections: int = 40,
+    allowed_updates: Optional[List[str]] = None,
+    drop_pending_updates: bool = False,
+    handle_signals: bool = True
+):
+    secret_token = secret_token or secrets.token_urlsafe(32)
+
+    async def handle(request: web.Request):
+        if not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token
+        ):
+            return web.Response(status=401, text="Unauthorized")
+
+        await route(await request.json())
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+
+    await _serve(
+        app,
+        bot,
+        url=url,
+        path=path,
+        host=host,
+        port=port,
+        secret_token=secret_token,
+        max_connections=max_connections,
+        allowed_updates=allowed_updates,
+        drop_pending_updates=drop_pending_updates,
+        handle_signals=handle_signals
+    )
@@ -1,3 +1,4 @@
 from .config import Config
+from .reloader import ConfigReloader
 
-__all__ = ["Config"]
+__all__ = ["Config", "ConfigReloader"]
@@ -10,10 +10,16 @@ from .models import (
     Behavior,
     Bot,
     Database,
+    Delivery,
     Forwarding,
     Logging,
+    Metrics,
     Moderation,
-    OpenAI
+    OpenAI,
+    Profiling,
+    Recording,
+    Reload,
+    Tracing
 )
 
 
@@ -21,10 +27,16 @@ class Config(BaseModel):
     bot: Bot = Bot()
     behavior: Behavior = Behavior()
     database: Database = Database()
+    delivery: Delivery = Delivery()
     forwarding: Forwarding = Forwarding()
     openai: OpenAI = OpenAI()
     moderation: Moderation = Moderation()
     logging: Logging = Logging()
+    metrics: Metrics = Metrics()
+    tracing: Tracing = Tracing()
+    recording: Recording = Recording()
+    profiling: Profiling = Profiling()
+    reload: Reload = Reload()
     model_config = {"frozen": True}
 
     def get_database_url(self):
@@ -3,14 +3,38 @@ from typing import FrozenSet, Literal, Optional, Tuple, TypeAlias, Union
 
 from pydantic import BaseModel, Field, HttpUrl, SecretStr
 
+BotMode: TypeAlias = Literal["polling", "webhook"]
 ForwardingType: TypeAlias = Literal["text", "photo", "video"]
 ModerationBackend: TypeAlias = Literal["omni", "gpt"]
+ModerationBudgetAction: TypeAlias = Literal["omni", "queue"]
+ModerationOutput: TypeAlias = Literal["text", "json_schema"]
+ModerationSeverity: TypeAlias = Literal["low", "medium", "high"]
 LoggingLevel: TypeAlias = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
 
+class BotWebhook(BaseModel):
+    url: Optional[HttpUrl] = None
+    path: str = "/webhook"
+    host: str = "0.0.0.0"
+    port: int = 8080
+    secret_token: Optional[SecretStr] = None
+    max_connections: int = 40
+    model_config = {"frozen": True}
+
+
+class BotConcurrency(BaseModel):
+    limit: int = 64
+    max_waiting: int = 1024
+    shutdown_timeout: float = 30
+    model_config = {"frozen": True}
+
+
 class Bot(BaseModel):
     token: Optional[SecretStr] = None
     timeout: int = 10
+    mode: BotMode = "polling"
+    webhook: BotWebhook = BotWebhook()
+    concurrency: BotConcurrency = BotConcurrency()
     model_config = {"frozen": True}
 
 
@@ -26,9 +50,25 @@ class BehaviorSubscriptionRequirement(BaseModel):
     model_config = {"frozen": True}
 
 
+class BehaviorMediaGroups(BaseModel):
+    window: float = 2
+    min_window: float = 1.5
+    max_window: float = 5
+    adaptive: bool = True
+    max_pending: int = 1024
+    model_config = {"frozen": True}
+
+
+class BehaviorStatusMessage(BaseModel):
+    enabled: bool = False
+    model_config = {"frozen": True}
+
+
 class Behavior(BaseModel):
     throttling: BehaviorThrottling = BehaviorThrottling()
     subscription_requirement: BehaviorSubscriptionRequirement = BehaviorSubscriptionRequirement()
+    media_groups: BehaviorMediaGroups = BehaviorMediaGroups()
+    status_message: BehaviorStatusMessage = BehaviorStatusMessage()
     model_config = {"frozen": True}
 
 
@@ -60,10 +100,43 @@ class Database(BaseModel):
     model_config = {"frozen": True}
 
 
+class DeliveryRateLimit(BaseModel):
+    enabled: bool = True
+    global_per_second: float = 30
+    private_chat_per_second: float = 1
+    group_chat_per_minute: float = 20
+    chat_burst: float = 3
+    model_config = {"frozen": True}
+
+
+class DeliveryOutbox(BaseModel):
+    enabled: bool = True
+    workers: int = 8
+    max_attempts: int = 10
+    backoff_base: float = 1
+    backoff_max: float = 300
+    model_config = {"frozen": True}
+
+
+class Delivery(BaseModel):
+    rate_limit: DeliveryRateLimit = DeliveryRateLimit()
+    outbox: DeliveryOutbox = DeliveryOutbox()
+    model_config = {"frozen": True}
+
+
+class ForwardingDigest(BaseModel):
+    enabled: bool = False
+    interval: float = 60
+    max_items: int = 20
+    immediate_severity: ModerationSeverity = "high"
+    model_config = {"frozen": True}
+
+
 class Forwarding(BaseModel):
     moderation_chat_ids: Tuple[int, ...] = Field(default_factory=tuple)
     publication_channel_ids: Tuple[int, ...] = Field(default_factory=tuple)
     types: FrozenSet[ForwardingType] = frozenset(["text", "photo", "video"])
+    digest: ForwardingDigest = ForwardingDigest()
     model_config = {"frozen": True}
 
 
@@ -76,10 +149,44 @@ class OpenAI(BaseModel):
     model_config = {"frozen": True}
 
 
+class ModerationBudget(BaseModel):
+    daily_tokens: Optional[int] = Field(default=None, ge=1)
+    request_tokens: Optional[int] = Field(default=None, ge=1)
+    on_exceeded: ModerationBudgetAction = "omni"
+    model_config = {"frozen": True}
+
+
+class ModerationAdaptive(BaseModel):
+    enabled: bool = False
+    latency_slo: float = Field(default=5, gt=0)
+    error_rate_slo: float = Field(default=0.2, ge=0, le=1)
+    window: int = Field(default=50, ge=1)
+    min_samples: int = Field(default=10, ge=1)
+    recovery_samples: int = Field(default=3, ge=1)
+    probe_interval: float = Field(default=5, ge=0)
+    model_config = {"frozen": True}
+
+
+class ModerationHedging(BaseModel):
+    enabled: bool = False
+    quantile: float = Field(default=0.95, gt=0, lt=1)
+    max_rate: float = Field(default=0.1, ge=0, le=1)
+    window: int = Field(default=100, ge=1)
+    min_samples: int = Field(default=20, ge=1)
+    min_delay: float = Field(default=0.05, ge=0)
+    model_config = {"frozen": True}
+
+
 class Moderation(BaseModel):
     enabled: bool = True
     model: str = "gpt-5-mini"
     backends: FrozenSet[ModerationBackend] = frozenset(["omni", "gpt"])
+    output: ModerationOutput = "text"
+    stream: bool = False
+    rules_top_k: int = Field(default=0, ge=0)
+    budget: ModerationBudget = ModerationBudget()
+    adaptive: ModerationAdaptive = ModerationAdaptive()
+    hedging: ModerationHedging = ModerationHedging()
     model_config = {"frozen": True}
 
 
@@ -88,3 +195,43 @@ class Logging(BaseModel):
     fmt: Optional[str] = "%(asctime)s.%(msecs)03d %(levelname)s [%(name)s] %(message)s"
     date_fmt: Optional[str] = "%Y-%m-%d %H:%M:%S"
     model_config = {"frozen": True}
+
+
+class Metrics(BaseModel):
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9100
+    model_config = {"frozen": True}
+
+
+class Tracing(BaseModel):
+    enabled: bool = False
+    sample_rate: float = Field(default=0.01, ge=0, le=1)
+    slow_threshold: float = 5
+    report_size: int = 10
+    model_config = {"frozen": True}
+
+
+class Recording(BaseModel):
+    enabled: bool = False
+    salt: Optional[SecretStr] = None
+    redact_text: bool = True
+    model_config = {"frozen": True}
+
+
+class Profiling(BaseModel):
+    loop_monitor: bool = False
+    lag_threshold: float = 0.1
+    asyncio_debug: bool = False
+    slow_callback_duration: float = 0.1
+    sampling: bool = False
+    sampling_interval: float = 0.005
+    default_duration: float = 30
+    max_duration: float = 120
+    model_config = {"frozen": True}
+
+
+class Reload(BaseModel):
+    watch: bool = False
+    interval: float = 5
+    model_config = {"frozen": True}
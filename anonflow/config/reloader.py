@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional
+
+import yaml
+
+from .config import Config
+
+
+def diff(old: Config, new: Config) -> List[str]:
+    def walk(prefix: str, a: Any, b: Any):
+        if isinstance(a, dict) and isinstance(b, dict):
+            for key in dict.fromkeys([*a, *b]):
+                yield from walk(f"{prefix}.{key}" if prefix else key, a.get(key), b.get(key))
+        elif a != b:
+            yield prefix
+
+    return list(walk("", old.model_dump(), new.model_dump()))
+
+
+class ConfigReloader:
+    def __init__(
+        self,
+        filepath: Path,
+        config: Config,
+        apply: Callable[[Config], None],
+        live_fields: Iterable[str],
+        *,
+        watch: bool = False,
+        interval: float = 5
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.filepath = filepath
+        self.live_fields = tuple(live_fields)
+        self.watch = watch
+        self.interval = interval
+
+        self._apply = apply
+        self._initial_config = config
+        self._config = config
+
+        self._mtime = self._get_mtime()
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_mtime(self):
+        try:
+            return self.filepath.stat().st_mtime
+        except OSError:
+            return 0
+
+    def _is_live(self, field: str):
+        return any(
+            field == live_field or field.startswith(live_field + ".")
+            for live_field in self.live_fields
+        )
+
+    def reload(self):
+        self._mtime = self._get_mtime()
+
+        try:
+            config = Config.load(self.filepath)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            self._logger.error("Config reload failed, keeping the current config: %s", e)
+            return False
+
+        changed = [field for field in diff(self._config, config) if self._is_live(field)]
+        restart_required = [
+            field for field in diff(self._initial_config, config) if not self._is_live(field)
+        ]
+
+        if changed:
+            try:
+                self._apply(config)
+            except (OSError, ValueError) as e:
+                self._logger.error("Config reload rejected, keeping the current config: %s", e)
+                return False
+
+            self._logger.info("Config reloaded. Applied: %s", ", ".join(changed))
+        else:
+            self._logger.info("Config reloaded. No runtime settings changed.")
+
+        if restart_required:
+            self._logger.warning(
+                "Changes to the following settings require a restart: %s",
+                ", ".join(restart_required)
+            )
+
+        self._config = config
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+
+            if self._get_mtime() != self._mtime:
+                self.reload()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        with suppress(NotImplementedError, AttributeError):
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+
+        if self.watch and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        with suppress(NotImplementedError, AttributeError):
+            loop.remove_signal_handler(signal.SIGHUP)
+
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -1 +1,2 @@
 SYSTEM_USER_ID = -1
+MAX_MEDIA_GROUP_SIZE = 10
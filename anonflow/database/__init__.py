@@ -1,13 +1,23 @@
 from .database import Database
-from .orm import Ban, Moderator, User
-from .repositories import BanRepository, ModeratorRepository, UserRepository
+from .orm import Ban, Moderator, OutboxEntry, TokenUsageEntry, User
+from .repositories import (
+    BanRepository,
+    ModeratorRepository,
+    OutboxRepository,
+    TokenUsageRepository,
+    UserRepository
+)
 
 __all__ = [
     "Database",
     "Ban",
     "Moderator",
+    "OutboxEntry",
+    "TokenUsageEntry",
     "User",
     "BanRepository",
     "ModeratorRepository",
+    "OutboxRepository",
+    "TokenUsageRepository",
     "UserRepository"
 ]
@@ -1,6 +1,7 @@
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+from sqlalchemy import event
 from sqlalchemy.engine import URL
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
@@ -8,15 +9,32 @@ from sqlalchemy.orm import sessionmaker
 from .base import Base
 
 
+SQLITE_BUSY_TIMEOUT = 30
+
+
 class Database:
     def __init__(self, url: URL, echo: bool = False):
         self.url = url
 
-        self._engine = create_async_engine(self.url, echo=echo)
+        if url.get_backend_name() == "sqlite":
+            # Worker processes share the database file: writers wait for the lock instead of
+            # failing with "database is locked", and WAL keeps readers from blocking them.
+            self._engine = create_async_engine(
+                self.url, echo=echo, connect_args={"timeout": SQLITE_BUSY_TIMEOUT}
+            )
+            event.listen(self._engine.sync_engine, "connect", self._on_sqlite_connect)
+        else:
+            self._engine = create_async_engine(self.url, echo=echo)
         self._session_maker = sessionmaker(
             self._engine, expire_on_commit=False, class_=AsyncSession # type: ignore
         )
 
+    @staticmethod
+    def _on_sqlite_connect(connection, _):
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
     @asynccontextmanager
     async def begin_session(self) -> AsyncGenerator[AsyncSession, None]:
         async with self._session_maker() as session: # type: ignore
@@ -1,10 +1,14 @@
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
+    Float,
     ForeignKey,
     Integer,
     String,
+    Text,
     func
 )
 from sqlalchemy.orm import relationship
@@ -52,6 +56,39 @@ class Moderator(Base):
 
     user = relationship("User", back_populates="moderator")
 
+class OutboxEntry(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, index=True, nullable=False)
+    kind = Column(String(16), nullable=False)
+    payload = Column(Text, nullable=False)
+    shard = Column(Integer, nullable=True)
+
+    status = Column(String(16), index=True, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Float, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+
+class TokenUsageEntry(Base):
+    __tablename__ = "token_usage"
+
+    # Every worker writes its own rows, so concurrent workers never update the same row.
+    day = Column(Date, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    backend = Column(String(16), primary_key=True)
+    model = Column(String(64), primary_key=True)
+
+    requests = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(BigInteger, nullable=False, default=0)
+    output_tokens = Column(BigInteger, nullable=False, default=0)
+
 class User(Base):
     __tablename__ = "users"
 
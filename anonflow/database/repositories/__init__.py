@@ -1,9 +1,13 @@
 from .ban import BanRepository
 from .moderator import ModeratorRepository
+from .outbox import OutboxRepository
+from .token_usage import TokenUsageRepository
 from .user import UserRepository
 
 __all__ = [
     "BanRepository",
     "ModeratorRepository",
+    "OutboxRepository",
+    "TokenUsageRepository",
     "UserRepository"
 ]
@@ -0,0 +1,51 @@
+from typing import List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from anonflow.database.orm import OutboxEntry
+
+from .base import BaseRepository
+
+
+class OutboxRepository(BaseRepository):
+    model = OutboxEntry
+
+    async def add(
+        self,
+        session: AsyncSession,
+        chat_id: int,
+        kind: str,
+        payload: str,
+        shard: Optional[int] = None
+    ) -> OutboxEntry:
+        entry = OutboxEntry(chat_id=chat_id, kind=kind, payload=payload, shard=shard)
+        session.add(entry)
+        await session.flush()
+        return entry
+
+    async def get_pending(
+        self,
+        session: AsyncSession,
+        shard: Optional[int] = None,
+        shards: int = 1
+    ) -> List[OutboxEntry]:
+        query = select(OutboxEntry).where(OutboxEntry.status == "pending")
+        if shard is not None and shards > 1:
+            query = query.where(func.coalesce(OutboxEntry.shard, 0) % shards == shard)
+
+        result = await session.execute(query.order_by(OutboxEntry.id))
+        return list(result.scalars().all())
+
+    async def remove(self, session: AsyncSession, entry_id: int):
+        await super()._remove(
+            session,
+            filters={"id": entry_id}
+        )
+
+    async def update(self, session: AsyncSession, entry_id: int, **fields):
+        await super()._update(
+            session,
+            filters={"id": entry_id},
+            fields=fields
+        )
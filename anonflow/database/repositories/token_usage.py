@@ -0,0 +1,41 @@
+from datetime import date
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from anonflow.database.orm import TokenUsageEntry
+
+from .base import BaseRepository
+
+
+class TokenUsageRepository(BaseRepository):
+    model = TokenUsageEntry
+
+    async def add(
+        self,
+        session: AsyncSession,
+        day: date,
+        shard: int,
+        backend: str,
+        model: str,
+        requests: int,
+        input_tokens: int,
+        output_tokens: int
+    ):
+        filters = {"day": day, "shard": shard, "backend": backend, "model": model}
+        entry = await super()._get(session, filters=filters)
+        if entry is None:
+            entry = TokenUsageEntry(**filters, requests=0, input_tokens=0, output_tokens=0)
+            session.add(entry)
+
+        entry.requests += requests
+        entry.input_tokens += input_tokens
+        entry.output_tokens += output_tokens
+
+    async def get_day(self, session: AsyncSession, day: date, shard: int) -> List[TokenUsageEntry]:
+        result = await session.execute(
+            select(TokenUsageEntry)
+            .where(TokenUsageEntry.day == day, TokenUsageEntry.shard == shard)
+        )
+        return list(result.scalars().all())
@@ -1,3 +1,4 @@
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, selectinload
 
@@ -25,6 +26,13 @@ class UserRepository(BaseRepository):
             ]
         )
 
+    async def get_language(self, session: AsyncSession, user_id: int):
+        result = await session.execute(
+            select(User.language)
+            .where(User.user_id == user_id)
+        )
+        return result.scalar_one_or_none()
+
     async def has(self, session: AsyncSession, user_id: int):
         return await super()._has(
             session,
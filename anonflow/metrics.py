@@ -0,0 +1,277 @@
+import bisect
+import logging
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_enabled = False
+_metrics: Dict[str, "Metric"] = {}
+
+
+def is_enabled():
+    return _enabled
+
+def set_enabled(value: bool):
+    global _enabled
+    _enabled = value
+
+def _escape(value: Any):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        if name in _metrics:
+            raise ValueError(f"Metric {name!r} is already registered.")
+
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        _metrics[name] = self
+
+    def _labels(self, labels: Tuple[str, ...], extra: Iterable[Tuple[str, str]] = ()):
+        pairs = [*zip(self.labelnames, labels), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def _samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{self._labels(labels)} {_format_value(value)}"
+
+    def collect(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+            *self._samples()
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        if not _enabled:
+            return
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, *labels: str):
+        if not _enabled:
+            return
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        if not _enabled:
+            return
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable[[], float], *labels: str):
+        self._functions[labels] = function
+
+    def _samples(self):
+        for labels, function in list(self._functions.items()):
+            try:
+                self._values[labels] = function()
+            except Exception:
+                logging.getLogger(__name__).exception("Failed to collect gauge %s.", self.name)
+
+        return super()._samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, description, labelnames)
+
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        if not _enabled:
+            return
+
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def _samples(self):
+        for labels, (counts, total, count) in list(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                le = (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket{self._labels(labels, le)} {cumulative}"
+
+            yield f"{self.name}_sum{self._labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{self._labels(labels)} {count}"
+
+
+def render():
+    return "\n".join(
+        line for metric in list(_metrics.values()) for line in metric.collect()
+    ) + "\n"
+
+
+async def serve(host: str = "127.0.0.1", port: int = 9100, path: str = "/metrics"):
+    async def handle(request: web.Request):
+        return web.Response(body=render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get(path, handle)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    logging.getLogger(__name__).info("Metrics are served on http://%s:%d%s", host, port, path)
+    return runner
+
+
+updates_total = Counter(
+    "anonflow_updates_total",
+    "Updates processed, by outcome.",
+    ("outcome",)
+)
+update_duration_seconds = Histogram(
+    "anonflow_update_duration_seconds",
+    "Time from the start of update processing until its handler returned."
+)
+updates_in_flight = Gauge(
+    "anonflow_updates_in_flight",
+    "Updates currently being processed or waiting for a free slot."
+)
+middleware_decisions_total = Counter(
+    "anonflow_middleware_decisions_total",
+    "Decisions taken by update middlewares.",
+    ("middleware", "decision")
+)
+cache_requests_total = Counter(
+    "anonflow_cache_requests_total",
+    "Cache lookups, by cache and result.",
+    ("cache", "result")
+)
+moderation_backend_requests_total = Counter(
+    "anonflow_moderation_backend_requests_total",
+    "OpenAI moderation backend calls, by backend and outcome.",
+    ("backend", "outcome")
+)
+moderation_backend_latency_seconds = Histogram(
+    "anonflow_moderation_backend_latency_seconds",
+    "OpenAI moderation backend call latency.",
+    ("backend",)
+)
+moderation_prompt_chars = Histogram(
+    "anonflow_moderation_prompt_chars",
+    "Size of GPT prompts (instructions, selected rules and the message) in characters.",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+moderation_prompt_tokens_estimated_total = Counter(
+    "anonflow_moderation_prompt_tokens_estimated_total",
+    "Estimated GPT prompt tokens before sending, by prompt part.",
+    ("part",)
+)
+moderation_tokens_total = Counter(
+    "anonflow_moderation_tokens_total",
+    "Tokens used by moderation backends, as reported by the API or estimated when it reports none.",
+    ("backend", "model", "kind")
+)
+moderation_tokens_today = Gauge(
+    "anonflow_moderation_tokens_today",
+    "Tokens used by moderation backends since the start of the UTC day."
+)
+moderation_budget_exceeded_total = Counter(
+    "anonflow_moderation_budget_exceeded_total",
+    "GPT requests not sent because of the token budget, by the action taken instead.",
+    ("action",)
+)
+moderation_backend_degraded = Gauge(
+    "anonflow_moderation_backend_degraded",
+    "Whether a moderation backend is currently skipped for breaking its SLO.",
+    ("backend",)
+)
+moderation_backend_switches_total = Counter(
+    "anonflow_moderation_backend_switches_total",
+    "Moderation backend state changes, by backend and new state.",
+    ("backend", "state")
+)
+moderation_backend_skipped_total = Counter(
+    "anonflow_moderation_backend_skipped_total",
+    "Messages not checked by a moderation backend because it was degraded.",
+    ("backend",)
+)
+moderation_hedges_total = Counter(
+    "anonflow_moderation_hedges_total",
+    "Slow moderation requests, by backend and outcome: the hedged request won or lost, both failed, the rate cap prevented the hedge, or the hedge was declined, for example by the token budget.",
+    ("backend", "outcome")
+)
+moderation_parse_retries_total = Counter(
+    "anonflow_moderation_parse_retries_total",
+    "GPT responses that could not be parsed and were retried."
+)
+moderation_function_calls_total = Counter(
+    "anonflow_moderation_function_calls_total",
+    "Moderation functions executed, by function and outcome.",
+    ("function", "outcome")
+)
+delivery_requests_total = Counter(
+    "anonflow_delivery_requests_total",
+    "Bot API calls made by the delivery service, by method and outcome.",
+    ("method", "outcome")
+)
+delivery_latency_seconds = Histogram(
+    "anonflow_delivery_latency_seconds",
+    "Bot API call latency, including rate limiter waits.",
+    ("method",)
+)
+event_loop_lag_seconds = Histogram(
+    "anonflow_event_loop_lag_seconds",
+    "How late the loop monitor's periodic wakeups were.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+event_loop_stalls_total = Counter(
+    "anonflow_event_loop_stalls_total",
+    "Times the event loop was blocked for longer than the monitor threshold."
+)
+outbox_pending = Gauge(
+    "anonflow_outbox_pending",
+    "Outbox entries waiting to be delivered."
+)
+media_groups_pending = Gauge(
+    "anonflow_media_groups_pending",
+    "Media groups still collecting items."
+)
@@ -1,8 +1,15 @@
+from .budget import TokenBudget, TokenUsage
 from .executor import ModerationExecutor, ModerationPlanner
+from .health import BackendHealth
+from .hedging import Hedger
 from .rule_manager import RuleManager
 
 __all__ = [
+    "BackendHealth",
+    "Hedger",
     "ModerationExecutor",
     "ModerationPlanner",
     "RuleManager",
+    "TokenBudget",
+    "TokenUsage",
 ]
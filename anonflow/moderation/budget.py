@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from anonflow import metrics
+from anonflow.config.models import ModerationBudgetAction
+from anonflow.database import Database, TokenUsageRepository
+
+CHARS_PER_TOKEN = 4
+HISTORY_DAYS = 7
+SAVE_INTERVAL = 5
+
+
+def estimate_tokens(text: str):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class TokenUsage:
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    @property
+    def total_tokens(self):
+        return self.input_tokens + self.output_tokens
+
+
+class TokenBudget:
+    def __init__(
+        self,
+        daily_tokens: Optional[int] = None,
+        request_tokens: Optional[int] = None,
+        on_exceeded: ModerationBudgetAction = "omni",
+        *,
+        shard: Optional[int] = None,
+        shards: int = 1
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.daily_tokens = daily_tokens
+        self.request_tokens = request_tokens
+        self.on_exceeded = on_exceeded
+        self.shard = shard
+        self.shards = shards
+
+        # Usage by UTC day, then by (backend, model).
+        self._days: Dict[date, Dict[Tuple[str, str], TokenUsage]] = {}
+        # Actual prompt tokens per estimated token, learned from the usage reported by the API.
+        self._ratio = 1.0
+        # Estimates of requests in flight, so that concurrent requests cannot overshoot the daily budget together.
+        self._reserved = 0
+
+        # Usage recorded since the last save, by (day, backend, model).
+        self._unsaved: Dict[Tuple[date, str, str], TokenUsage] = {}
+        self._database: Optional[Database] = None
+        self._token_usage_repository: Optional[TokenUsageRepository] = None
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.moderation_tokens_today.set_function(self.get_spent)
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date()
+
+    def get_daily_limit(self):
+        # Every worker gets an equal share of the daily budget.
+        if self.daily_tokens is None:
+            return None
+        return self.daily_tokens // self.shards
+
+    def adjust(self, estimated_tokens: int):
+        return math.ceil(estimated_tokens * self._ratio)
+
+    def get_usage(self, day: Optional[date] = None) -> Dict[Tuple[str, str], TokenUsage]:
+        return self._days.get(day or self._today(), {})
+
+    def get_spent(self, day: Optional[date] = None):
+        return sum(usage.total_tokens for usage in self.get_usage(day).values())
+
+    def reserve(self, estimated_tokens: int) -> Optional[int]:
+        # Returns the reserved amount to release once the usage is recorded, or None when over budget.
+        tokens = self.adjust(estimated_tokens)
+        if self.request_tokens is not None and tokens > self.request_tokens:
+            return None
+        daily_limit = self.get_daily_limit()
+        if daily_limit is not None and self.get_spent() + self._reserved + tokens > daily_limit:
+            return None
+
+        self._reserved += tokens
+        return tokens
+
+    def release(self, tokens: int):
+        self._reserved -= tokens
+
+    def _log_usage(self, day: date):
+        for (backend, model), usage in self.get_usage(day).items():
+            self._logger.info(
+                "Token usage for %s, %s/%s: requests=%d input=%d output=%d",
+                day, backend, model, usage.requests, usage.input_tokens, usage.output_tokens
+            )
+
+    def record(
+        self,
+        backend: str,
+        model: str,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        *,
+        estimated_tokens: Optional[int] = None
+    ):
+        today = self._today()
+        if today not in self._days:
+            if self._days:
+                self._log_usage(max(self._days))
+            self._days[today] = {}
+            for day in sorted(self._days)[:-HISTORY_DAYS]:
+                del self._days[day]
+
+        for usage in (
+            self._days[today].setdefault((backend, model), TokenUsage()),
+            self._unsaved.setdefault((today, backend, model), TokenUsage())
+        ):
+            usage.requests += 1
+            usage.input_tokens += input_tokens
+            usage.output_tokens += output_tokens
+
+        metrics.moderation_tokens_total.inc(backend, model, "input", amount=input_tokens)
+        metrics.moderation_tokens_total.inc(backend, model, "output", amount=output_tokens)
+
+        if estimated_tokens:
+            self._ratio += 0.1 * (input_tokens / estimated_tokens - self._ratio)
+
+    async def save(self):
+        if self._database is None or not self._unsaved:
+            return
+
+        unsaved, self._unsaved = self._unsaved, {}
+        try:
+            async with self._database.begin_session() as session:
+                for (day, backend, model), usage in unsaved.items():
+                    await self._token_usage_repository.add( # type: ignore
+                        session, day, self.shard or 0, backend, model,
+                        usage.requests, usage.input_tokens, usage.output_tokens
+                    )
+        except Exception:
+            # Kept for the next save, merged with anything recorded meanwhile.
+            for key, usage in unsaved.items():
+                pending = self._unsaved.setdefault(key, TokenUsage())
+                pending.requests += usage.requests
+                pending.input_tokens += usage.input_tokens
+                pending.output_tokens += usage.output_tokens
+            raise
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SAVE_INTERVAL)
+            try:
+                await self.save()
+            except Exception:
+                self._logger.exception("Failed to save token usage.")
+
+    async def start(self, database: Database, token_usage_repository: TokenUsageRepository):
+        # Today's usage survives restarts, so a restart does not reset the daily budget.
+        self._database = database
+        self._token_usage_repository = token_usage_repository
+
+        today = self._today()
+        async with database.get_session() as session:
+            entries = await token_usage_repository.get_day(session, today, self.shard or 0)
+
+        usage_today = self._days.setdefault(today, {})
+        for entry in entries:
+            usage = usage_today.setdefault((entry.backend, entry.model), TokenUsage()) # type: ignore
+            usage.requests += entry.requests # type: ignore
+            usage.input_tokens += entry.input_tokens # type: ignore
+            usage.output_tokens += entry.output_tokens # type: ignore
+
+        if entries:
+            self._logger.info("Loaded today's token usage: %d token(s) spent.", self.get_spent(today))
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        try:
+            await self.save()
+        except Exception:
+            self._logger.exception("Failed to save token usage.")
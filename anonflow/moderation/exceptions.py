@@ -3,3 +3,5 @@ class ModerationError(RuntimeError): ...
 class ModerationOutputParseError(ModerationError): ...
 
 class ModerationNoAvailableFunctionsError(ModerationError): ...
+
+class ModerationFunctionArgumentsError(ModerationError): ...
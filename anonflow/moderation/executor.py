@@ -1,16 +1,22 @@
 import asyncio
 import logging
 import textwrap
-from typing import AsyncGenerator, Literal, Optional
+from typing import Any, AsyncGenerator, Dict, List, Literal, Optional, Tuple, get_args
 
+from anonflow import metrics, tracing
+from anonflow.config.models import ModerationSeverity
 from anonflow.services.transport.results import (
     Results,
     ModerationDecisionResult,
     ModerationStartedResult
 )
 
+from .exceptions import ModerationFunctionArgumentsError
+from .functions import ModerationFunction
 from .planner import ModerationPlanner
 
+_FAILED = object()
+
 
 class ModerationExecutor:
     def __init__(self, planner: ModerationPlanner):
@@ -19,38 +25,86 @@ class ModerationExecutor:
         self.planner = planner
         self.planner.set_functions(self.moderation_decision)
 
-    def moderation_decision(self, status: Literal["approve", "reject"], reason: str):
+    def moderation_decision(
+        self,
+        status: Literal["approve", "reject"],
+        reason: str,
+        severity: ModerationSeverity = "medium"
+    ):
         moderation_map = {"approve": True, "reject": False}
-        return ModerationDecisionResult(is_approved=moderation_map.get(status.lower(), False), reason=reason)
+        status = status.lower()
+        return ModerationDecisionResult(
+            is_approved=moderation_map.get(status, False),
+            reason=reason,
+            severity=severity if severity in get_args(ModerationSeverity) else "medium",
+            # Only the planner asks for a review, the model is offered approve and reject.
+            needs_review=status == "review"
+        )
     moderation_decision.description = textwrap.dedent( # type: ignore
         """
         Processes a message with a moderation decision by status and reason.
         This function must be called whenever there is no exact user request or no other available function
         matching the user's intent. Status must be either "approve if the message is allowed, or "reject" if it should be blocked.
+        Severity must be "low", "medium" or "high" and describes how serious the violation is.
         """
     ).strip()
+    moderation_decision.blocking = False # type: ignore
+
+    async def _call(self, function: ModerationFunction, args: Dict[str, Any]):
+        self._logger.info("Executing %s.", function.name)
+        try:
+            with tracing.span("moderation.function", function=function.name):
+                if function.is_async:
+                    result = await function.func(**args)
+                elif function.blocking:
+                    result = await asyncio.to_thread(function.func, **args)
+                else:
+                    result = function.func(**args)
+        except Exception:
+            metrics.moderation_function_calls_total.inc(function.name, "error")
+            self._logger.exception("Failed to execute %s.", function.name)
+            return _FAILED
+
+        metrics.moderation_function_calls_total.inc(function.name, "ok")
+        return result
 
     async def process(self, text: Optional[str] = None, image: Optional[str] = None) -> AsyncGenerator[Results, None]:
         yield ModerationStartedResult()
 
         functions = await self.planner.plan(text, image)
-        function_names = self.planner.get_function_names()
 
+        calls: List[Tuple[ModerationFunction, Dict[str, Any]]] = []
         for func in functions:
             func_name = func.get("name", "")
-            func_args = func.get("args", {})
+            function = self.planner.get_function(func_name)
 
-            method = getattr(self, func_name, None)
-
-            if method is None or func_name not in function_names:
+            if function is None:
+                metrics.moderation_function_calls_total.inc(str(func_name), "unknown")
                 self._logger.warning("Function %s not found, skipping.", func_name)
                 continue
 
-            self._logger.info("Executing %s.", func_name)
             try:
-                if asyncio.iscoroutinefunction(method):
-                    yield await method(**func_args)
-                else:
-                    yield await asyncio.to_thread(method, **func_args)
-            except Exception:
-                self._logger.exception("Failed to execute %s.", func_name)
+                calls.append((function, function.bind(func.get("args", {}))))
+            except ModerationFunctionArgumentsError as e:
+                metrics.moderation_function_calls_total.inc(func_name, "error")
+                self._logger.warning("Invalid arguments, skipping: %s", e)
+
+        # The calls are independent: blocking and async ones are started together when there
+        # is more than one, while results are still yielded in the order the model listed them.
+        tasks: Dict[int, asyncio.Task] = {}
+        if sum(not function.inline for function, _ in calls) > 1:
+            tasks = {
+                index: asyncio.create_task(self._call(function, args))
+                for index, (function, args) in enumerate(calls)
+                if not function.inline
+            }
+
+        try:
+            for index, (function, args) in enumerate(calls):
+                task = tasks.get(index)
+                result = await (task or self._call(function, args))
+                if result is not _FAILED:
+                    yield result
+        finally:
+            for task in tasks.values():
+                task.cancel()
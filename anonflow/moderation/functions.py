@@ -0,0 +1,99 @@
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Literal, get_args, get_origin
+
+from .exceptions import ModerationFunctionArgumentsError
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+def _get_schema(annotation: Any, required: bool) -> Dict[str, Any]:
+    # Strict structured output requires every property, so optional ones become nullable.
+    if get_origin(annotation) is Literal:
+        values = list(get_args(annotation))
+        if required:
+            return {"type": "string", "enum": values}
+        return {"type": ["string", "null"], "enum": [*values, None]}
+
+    json_type = JSON_TYPES.get(annotation, "string")
+    return {"type": json_type if required else [json_type, "null"]}
+
+
+@dataclass(frozen=True)
+class ModerationFunction:
+    name: str
+    func: Callable[..., Any]
+    description: str
+    args: Dict[str, str]
+    parameters: FrozenSet[str]
+    required: FrozenSet[str]
+    var_keyword: bool
+    is_async: bool
+    blocking: bool
+    schema: Dict[str, Any]
+
+    @property
+    def inline(self):
+        return not (self.is_async or self.blocking)
+
+    @classmethod
+    def from_callable(cls, func: Callable[..., Any]):
+        parameters = inspect.signature(func).parameters.values()
+        named = [
+            param for param in parameters
+            if param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY)
+        ]
+
+        return cls(
+            name=func.__name__,
+            func=func,
+            description=getattr(func, "description", None) or "",
+            args={
+                param.name: (
+                    getattr(param.annotation, "__name__", str(param.annotation))
+                    if param.annotation is not param.empty else "str"
+                )
+                for param in named
+            },
+            parameters=frozenset(param.name for param in named),
+            required=frozenset(param.name for param in named if param.default is param.empty),
+            var_keyword=any(param.kind == param.VAR_KEYWORD for param in parameters),
+            is_async=inspect.iscoroutinefunction(func),
+            # Plain functions are assumed to block unless they declare `blocking = False`.
+            blocking=getattr(func, "blocking", True),
+            schema={
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "enum": [func.__name__]},
+                    "args": {
+                        "type": "object",
+                        "properties": {
+                            param.name: _get_schema(param.annotation, param.default is param.empty)
+                            for param in named
+                        },
+                        "required": [param.name for param in named],
+                        "additionalProperties": False
+                    }
+                },
+                "required": ["name", "args"],
+                "additionalProperties": False
+            }
+        )
+
+    def bind(self, args: Any) -> Dict[str, Any]:
+        if not isinstance(args, dict):
+            raise ModerationFunctionArgumentsError(f"{self.name}: args must be an object, got {type(args).__name__}.")
+
+        missing = self.required.difference(args)
+        if missing:
+            raise ModerationFunctionArgumentsError(f"{self.name}: missing {', '.join(sorted(missing))}.")
+
+        # Models sometimes add arguments nobody asked for; they are dropped instead of failing the call.
+        # Nulls for optional arguments (structured output always sends them) fall back to the default.
+        return {
+            name: value for name, value in args.items()
+            if (self.var_keyword or name in self.parameters) and (value is not None or name in self.required)
+        }
+
+    def to_prompt(self):
+        return {"name": self.name, "args": self.args, "description": self.description}
@@ -0,0 +1,121 @@
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from anonflow import metrics
+
+
+@dataclass
+class BackendState:
+    # (latency, ok) of the latest calls.
+    samples: Deque[Tuple[float, bool]] = field(default_factory=deque)
+    degraded: bool = False
+    next_probe: float = 0
+
+
+class BackendHealth:
+    def __init__(
+        self,
+        enabled: bool = False,
+        latency_slo: float = 5,
+        error_rate_slo: float = 0.2,
+        window: int = 50,
+        min_samples: int = 10,
+        recovery_samples: int = 3,
+        probe_interval: float = 5
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.enabled = enabled
+        self.latency_slo = latency_slo
+        self.error_rate_slo = error_rate_slo
+        self.window = window
+        self.min_samples = min_samples
+        self.recovery_samples = recovery_samples
+        self.probe_interval = probe_interval
+
+        self._states: Dict[str, BackendState] = {}
+
+    def _get_state(self, backend: str):
+        state = self._states.get(backend)
+        if state is None or state.samples.maxlen != self.window:
+            state = self._states[backend] = BackendState(
+                samples=deque(state.samples if state else (), maxlen=self.window),
+                degraded=state.degraded if state else False
+            )
+        return state
+
+    def is_degraded(self, backend: str):
+        state = self._states.get(backend)
+        return state is not None and state.degraded
+
+    def get_stats(self, backend: str, recent: Optional[int] = None) -> Tuple[float, float]:
+        # p95 latency and error rate over the window, or over the `recent` latest calls.
+        state = self._states.get(backend)
+        samples = list(state.samples)[-(recent or self.window):] if state else []
+        if not samples:
+            return 0.0, 0.0
+
+        latencies = sorted(latency for latency, _ in samples)
+        return (
+            latencies[int(0.95 * (len(latencies) - 1))],
+            sum(not ok for _, ok in samples) / len(samples)
+        )
+
+    def allow(self, backend: str, backends: Iterable[str]):
+        if not self.enabled or not self.is_degraded(backend):
+            return True
+
+        # A degraded backend still runs when every other one is degraded too,
+        # so that messages are never left without an automatic check.
+        if all(self.is_degraded(other) for other in backends if other != backend):
+            return True
+
+        # Occasional probes keep measuring the backend so that it can recover.
+        state = self._get_state(backend)
+        now = time.monotonic()
+        if now >= state.next_probe:
+            state.next_probe = now + self.probe_interval
+            return True
+
+        metrics.moderation_backend_skipped_total.inc(backend)
+        return False
+
+    def observe(self, backend: str, latency: float, ok: bool = True):
+        if not self.enabled:
+            return
+
+        state = self._get_state(backend)
+        state.samples.append((latency, ok))
+
+        if state.degraded:
+            # A degraded backend only gets probes; it recovers once enough of them in a row meet the SLO.
+            if len(state.samples) < self.recovery_samples:
+                return
+            p95, error_rate = self.get_stats(backend, self.recovery_samples)
+            recent = list(state.samples)[-self.recovery_samples:]
+            violated = any(latency > self.latency_slo or not ok for latency, ok in recent)
+        else:
+            if len(state.samples) < self.min_samples:
+                return
+            p95, error_rate = self.get_stats(backend)
+            violated = p95 > self.latency_slo or error_rate > self.error_rate_slo
+
+        if violated == state.degraded:
+            return
+
+        state.degraded = violated
+        state.samples.clear()
+        state.next_probe = time.monotonic() + self.probe_interval
+
+        metrics.moderation_backend_degraded.set(int(violated), backend)
+        metrics.moderation_backend_switches_total.inc(backend, "degraded" if violated else "recovered")
+        if violated:
+            self._logger.warning(
+                "Backend %s is degraded: p95=%.2fs (SLO %.2fs), error rate=%.0f%% (SLO %.0f%%).",
+                backend, p95, self.latency_slo, error_rate * 100, self.error_rate_slo * 100
+            )
+        else:
+            self._logger.info("Backend %s recovered: p95=%.2fs, error rate=%.0f%%.", backend, p95, error_rate * 100)
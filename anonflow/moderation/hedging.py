@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from anonflow import metrics
+
+T = TypeVar("T")
+
+
+@dataclass
+class HedgeState:
+    latencies: Deque[float] = field(default_factory=deque)
+    # Whether each of the latest requests was hedged, for the rate cap.
+    hedged: Deque[bool] = field(default_factory=deque)
+    hedged_count: int = 0
+
+
+class Hedger:
+    def __init__(
+        self,
+        enabled: bool = False,
+        quantile: float = 0.95,
+        max_rate: float = 0.1,
+        window: int = 100,
+        min_samples: int = 20,
+        min_delay: float = 0.05
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.enabled = enabled
+        self.quantile = quantile
+        self.max_rate = max_rate
+        self.window = window
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+
+        self._states: Dict[str, HedgeState] = {}
+
+    def _get_state(self, backend: str):
+        state = self._states.get(backend)
+        if state is None or state.latencies.maxlen != self.window:
+            state = self._states[backend] = HedgeState(
+                latencies=deque(state.latencies if state else (), maxlen=self.window),
+                hedged=deque(maxlen=self.window)
+            )
+        return state
+
+    def get_delay(self, backend: str) -> Optional[float]:
+        state = self._states.get(backend)
+        if state is None or len(state.latencies) < self.min_samples:
+            return None
+
+        latencies = sorted(state.latencies)
+        return max(self.min_delay, latencies[int(self.quantile * (len(latencies) - 1))])
+
+    def _count(self, state: HedgeState, hedged: bool):
+        if len(state.hedged) == state.hedged.maxlen:
+            state.hedged_count -= state.hedged[0]
+        state.hedged.append(hedged)
+        state.hedged_count += hedged
+
+    async def _run(
+        self,
+        backend: str,
+        state: HedgeState,
+        factory: Callable[[], Awaitable[T]],
+        on_hedge: Optional[Callable[[], bool]]
+    ) -> T:
+        delay = self.get_delay(backend)
+        first = asyncio.ensure_future(factory())
+        tasks = [first]
+        try:
+            if delay is None:
+                self._count(state, False)
+                return await first
+
+            await asyncio.wait(tasks, timeout=delay)
+            if first.done():
+                self._count(state, False)
+                return first.result()
+
+            # The cap keeps the extra load and cost bounded when the backend is slow across the board.
+            if state.hedged_count + 1 > self.max_rate * (len(state.hedged) + 1):
+                outcome = "capped"
+            elif on_hedge and not on_hedge():
+                outcome = "declined"
+            else:
+                outcome = None
+            self._count(state, outcome is None)
+            if outcome:
+                metrics.moderation_hedges_total.inc(backend, outcome)
+                return await first
+
+            self._logger.debug("%s has not answered in %.2fs, sending a hedged request.", backend, delay)
+            tasks.append(asyncio.ensure_future(factory()))
+
+            # The first successful response wins; an error only counts once both requests have failed.
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        metrics.moderation_hedges_total.inc(backend, "won" if task is not first else "lost")
+                        return task.result()
+
+            metrics.moderation_hedges_total.inc(backend, "failed")
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(
+        self,
+        backend: str,
+        factory: Callable[[], Awaitable[T]],
+        on_hedge: Optional[Callable[[], bool]] = None
+    ) -> T:
+        # on_hedge is called before a duplicate is sent and can decline it by returning False.
+        if not self.enabled:
+            return await factory()
+
+        state = self._get_state(backend)
+        start_time = time.perf_counter()
+        result = await self._run(backend, state, factory, on_hedge)
+        # One sample per call, from the first request on. Sampling each request would miss the
+        # slow ones that hedging cancels, and the delay would drift down.
+        state.latencies.append(time.perf_counter() - start_time)
+        return result
@@ -0,0 +1,96 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exceptions import ModerationOutputParseError
+
+MAX_CANDIDATES = 8
+
+_FENCE = re.compile(r"```[\w-]*\s*\n?(.*?)```", re.DOTALL)
+_JSON_START = re.compile(r"[\[{]")
+_TRAILING_COMMA = re.compile(r",\s*([\]}])")
+
+
+def _normalize(value: Any) -> Optional[List[Dict[str, Any]]]:
+    if isinstance(value, dict):
+        if isinstance(value.get("calls"), list):
+            value = value["calls"]
+        elif "name" in value:
+            value = [value]
+    if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+        return value
+    return None
+
+def parse_output(text: str) -> List[Dict[str, Any]]:
+    # Accepts a bare array, a {"calls": [...]} object or a single call, and repairs
+    # the usual defects: code fences, prose around the JSON, trailing commas and
+    # output cut off after the last complete call.
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    decoder = json.JSONDecoder()
+    for index, match in enumerate(_JSON_START.finditer(text)):
+        if index >= MAX_CANDIDATES:
+            break
+
+        for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+            try:
+                value, _ = decoder.raw_decode(candidate, match.start())
+            except ValueError:
+                continue
+
+            calls = _normalize(value)
+            if calls is not None:
+                return calls
+
+    calls = OutputParser().feed(text)
+    if calls:
+        return calls
+
+    raise ModerationOutputParseError()
+
+
+class OutputParser:
+    def __init__(self):
+        self.text = ""
+
+        self._position = 0
+        self._in_string = False
+        self._escaped = False
+        # (bracket, start offset of an object that may be a call, or -1)
+        self._stack: List[Tuple[str, int]] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        # Returns the calls completed by this chunk. A call is any object with a
+        # "name" that is an element of an array or stands at the top level.
+        self.text += chunk
+        text = self.text
+        calls = []
+
+        for index in range(self._position, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = bool(self._stack)
+            elif char in "[{":
+                is_element = not self._stack or self._stack[-1][0] == "["
+                self._stack.append((char, index if char == "{" and is_element else -1))
+            elif char in "]}" and self._stack:
+                _, start = self._stack.pop()
+                if char == "}" and start >= 0:
+                    try:
+                        value = json.loads(text[start:index + 1])
+                    except ValueError:
+                        continue
+                    if isinstance(value, dict) and isinstance(value.get("name"), str):
+                        calls.append(value)
+
+        self._position = len(text)
+        return calls
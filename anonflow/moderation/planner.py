@@ -1,23 +1,32 @@
-import inspect
 import json
 import logging
 import textwrap
-from typing import Any, Dict, FrozenSet, List, Optional, Union
+import time
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Tuple, Union
 
-from httpx import AsyncClient
-from httpx._types import ProxyTypes
-from httpx._urls import URL
-from openai import AsyncOpenAI, OpenAIError
-
-from anonflow.config.models import ModerationBackend
+from anonflow import metrics, tracing
+from anonflow.config.models import ModerationBackend, ModerationOutput, ModerationSeverity
 
+from .budget import TokenBudget, estimate_tokens
 from .exceptions import (
     ModerationError,
     ModerationNoAvailableFunctionsError,
     ModerationOutputParseError
 )
+from .functions import ModerationFunction
+from .health import BackendHealth
+from .hedging import Hedger
+from .output import OutputParser, parse_output
 from .rule_manager import RuleManager
 
+if TYPE_CHECKING:
+    from httpx import AsyncClient
+    from httpx._types import ProxyTypes
+    from httpx._urls import URL
+    from openai import AsyncOpenAI
+
+    from anonflow.recording import Recorder
+
 
 class ModerationPlanner:
     def __init__(
@@ -27,32 +36,49 @@ class ModerationPlanner:
         backends: FrozenSet[ModerationBackend],
         rule_manager: RuleManager,
         *,
-        base_url: Optional[Union[str, URL]] = None,
-        proxy: Optional[ProxyTypes] = None,
+        base_url: Optional[Union[str, "URL"]] = None,
+        proxy: Optional["ProxyTypes"] = None,
         timeout: Optional[float] = None,
         max_retries: int = 2,
+        recorder: Optional["Recorder"] = None,
+        output: ModerationOutput = "text",
+        stream: bool = False,
+        token_budget: Optional[TokenBudget] = None,
+        backend_health: Optional[BackendHealth] = None,
+        hedger: Optional[Hedger] = None
     ):
         self._logger = logging.getLogger(__name__)
 
         self._gpt_model = gpt_model
         self._backends = backends
         self._max_retries = max_retries
+        self._output = output
+        self._stream = stream
 
-        self._client = AsyncClient(proxy=proxy)
+        self._proxy = proxy
+        self._recorder = recorder
+        self._client: Optional["AsyncClient"] = None
 
-        self._openai_client = None
+        self._openai_client: Optional["AsyncOpenAI"] = None
         self._openai_params = {
             "api_key": api_key,
             "base_url": base_url,
             "timeout": timeout,
-            "max_retries": self._max_retries,
-            "http_client": self._client
+            "max_retries": self._max_retries
         }
 
         self.rule_manager = rule_manager
+        self.token_budget = token_budget or TokenBudget()
+        self.backend_health = backend_health or BackendHealth()
+        self.hedger = hedger or Hedger()
 
         self._enabled = False
         self._functions: List[Dict[str, Any]] = []
+        self._functions_by_name: Dict[str, ModerationFunction] = {}
+        self._functions_prompt = ""
+        self._instructions = ""
+        self._text_format: Optional[Dict[str, Any]] = None
+        self._prompt_tokens: Dict[str, int] = {}
 
     @staticmethod
     def _approve(reason: str):
@@ -65,11 +91,22 @@ class ModerationPlanner:
         }]
 
     @staticmethod
-    def _reject(reason: str):
+    def _reject(reason: str, severity: ModerationSeverity = "medium"):
         return [{
             "name": "moderation_decision",
             "args": {
                 "status": "reject",
+                "reason": reason,
+                "severity": severity
+            }
+        }]
+
+    @staticmethod
+    def _review(reason: str):
+        return [{
+            "name": "moderation_decision",
+            "args": {
+                "status": "review",
                 "reason": reason
             }
         }]
@@ -112,77 +149,229 @@ class ModerationPlanner:
         return "\n".join(lines)
 
     async def _run_omni(self, text: Optional[str] = None, image: Optional[str] = None):
-        if self.is_backend_enabled("omni"):
+        if self._should_run("omni"):
             content = self._build_content(text, image)
 
             if content:
-                moderation = await self._openai_client.moderations.create(
-                    model="omni-moderation-latest", input=content
-                )
-
-                return moderation.results[0].flagged
+                start_time = time.perf_counter()
+                ok = False
+                try:
+                    with tracing.span("planner.omni"):
+                        moderation = await self.hedger.run(
+                            "omni",
+                            lambda: self._openai_client.moderations.create( # type: ignore
+                                model="omni-moderation-latest", input=content
+                            )
+                        )
+                    ok = True
+                except Exception:
+                    metrics.moderation_backend_requests_total.inc("omni", "error")
+                    raise
+                finally:
+                    latency = time.perf_counter() - start_time
+                    metrics.moderation_backend_latency_seconds.observe(latency, "omni")
+                    self.backend_health.observe("omni", latency, ok)
+
+                self.token_budget.record("omni", moderation.model)
+
+                flagged = moderation.results[0].flagged
+                metrics.moderation_backend_requests_total.inc("omni", "flagged" if flagged else "passed")
+                return flagged
 
         return False
 
+    def _build_instructions(self):
+        if self._output == "json_schema":
+            output_format = 'Respond with a JSON object `{"calls": [{"name": ..., "args": {...}}, ...]}`.'
+        else:
+            output_format = 'Respond strictly with a JSON array in the following format:\n`[{"name": ..., "args": {...}}, ...]`'
+
+        return textwrap.dedent(
+            """
+            {output_format}
+            `name` - the function name, `args` - dict of arguments.
+            Output only a valid JSON. Choose functions based on the user's request and the function descriptions.
+            You are allowed to call multiple functions, listing them in order in the output.
+
+            **IMPORTANT:**
+            - Each function must include **all and only the required arguments** specified in its description.
+            - Do not invent additional arguments.
+            - Do not omit required arguments.
+            Available functions:
+            {functions_prompt}
+            """
+        ).strip().format(output_format=output_format, functions_prompt=self._functions_prompt)
+
+    def _build_text_format(self):
+        return {
+            "format": {
+                "type": "json_schema",
+                "name": "moderation_calls",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "calls": {
+                            "type": "array",
+                            "items": {"anyOf": [function.schema for function in self._functions_by_name.values()]}
+                        }
+                    },
+                    "required": ["calls"],
+                    "additionalProperties": False
+                }
+            }
+        }
+
+    async def _stream_gpt(self, params: Dict[str, Any], span) -> Tuple[str, Optional[List[Dict[str, Any]]], Any]:
+        parser = OutputParser()
+        calls: List[Dict[str, Any]] = []
+        usage = None
+
+        stream = await self._openai_client.responses.create(**params, stream=True) # type: ignore
+        try:
+            async for event in stream:
+                if event.type == "response.completed":
+                    usage = event.response.usage
+                elif event.type == "response.output_text.delta":
+                    calls.extend(parser.feed(event.delta))
+                    # The decision is usually the last call; stop reading once it is complete.
+                    # The usage only arrives at the end, so it is estimated for such responses.
+                    if any(call.get("name") == "moderation_decision" for call in calls):
+                        span.set(early_decision=True)
+                        return parser.text, calls, None
+        finally:
+            await stream.close()
+
+        return parser.text, None, usage
+
+    async def _request_gpt(self, params: Dict[str, Any], span) -> Tuple[str, Optional[List[Dict[str, Any]]], Any]:
+        if self._stream:
+            return await self._stream_gpt(params, span)
+
+        response = await self._openai_client.responses.create(**params) # type: ignore
+        return response.output_text, None, response.usage
+
+    def _reserve_gpt_hedge(self, estimated_tokens: int, span):
+        # The duplicate is billed as well, so it has to fit in the budget like any other request.
+        reserved_tokens = self.token_budget.reserve(estimated_tokens)
+        if reserved_tokens is None:
+            span.set(hedge_declined=True)
+            return False
+
+        span.set(hedged=True)
+        # Its usage never arrives, so the prompt estimate is recorded right away.
+        self.token_budget.record("gpt", self._gpt_model, reserved_tokens)
+        self.token_budget.release(reserved_tokens)
+        return True
+
+    def _record_gpt_usage(self, usage: Any, estimated_tokens: int, output_text: str, span):
+        if usage is not None:
+            input_tokens, output_tokens = usage.input_tokens, usage.output_tokens
+            self.token_budget.record(
+                "gpt", self._gpt_model, input_tokens, output_tokens, estimated_tokens=estimated_tokens
+            )
+        else:
+            input_tokens, output_tokens = self.token_budget.adjust(estimated_tokens), estimate_tokens(output_text)
+            self.token_budget.record("gpt", self._gpt_model, input_tokens, output_tokens)
+
+        span.set(input_tokens=input_tokens, output_tokens=output_tokens, usage_estimated=usage is None)
+
     async def _run_gpt(self, text: Optional[str] = None):
         if not text:
             return
 
-        if self.is_backend_enabled("gpt"):
-            functions_prompt = self._build_functions_prompt(self._functions)
-
-            output = None
-            for attempt in range(self._max_retries + 1):
-                try:
-                    response = await self._openai_client.responses.create(
-                        model=self._gpt_model,
-                        input=[
-                            {
-                                "role": "system",
-                                "content": textwrap.dedent(
-                                    f'''
-                                    Respond strictly with a JSON array in the following format:
-                                    `[{{"name": ..., "args": {{...}}}}, ...]`
-                                    `name` - the function name, `args` - dict of arguments.
-                                    Output only a valid JSON. Choose functions based on the user's request and the function descriptions.
-                                    You are allowed to call multiple functions, listing them in order in the output.
-
-                                    **IMPORTANT:**
-                                    - Each function must include **all and only the required arguments** specified in its description.
-                                    - Do not invent additional arguments.
-                                    - Do not omit required arguments.
-                                    Available functions:
-                                    {functions_prompt}
-                                    '''
-                                ).strip(),
-                            },
-                            {
-                                "role": "system",
-                                "content": "\n\n".join(self.rule_manager.get_rules())
-                            },
-                            {
-                                "role": "user",
-                                "content": text
-                            }
-                        ]
-                    )
-                except OpenAIError as e:
-                    raise ModerationError() from e
-
-                try:
-                    output = json.loads(response.output_text)
+        if self._should_run("gpt"):
+            from openai import OpenAIError
+
+            rules = self.rule_manager.get_rules(text)
+            params: Dict[str, Any] = {
+                "model": self._gpt_model,
+                "input": [
+                    {
+                        "role": "system",
+                        "content": self._instructions
+                    },
+                    {
+                        "role": "system",
+                        "content": "\n\n".join(rules)
+                    },
+                    {
+                        "role": "user",
+                        "content": text
+                    }
+                ]
+            }
+            if self._text_format:
+                params["text"] = self._text_format
 
-                    if not isinstance(output, list) or not all(isinstance(obj, dict) for obj in output):
-                        raise ModerationOutputParseError()
+            prompt_chars = sum(len(message["content"]) for message in params["input"])
+            metrics.moderation_prompt_chars.observe(prompt_chars)
 
-                    break
-                except (ValueError, ModerationOutputParseError):
-                    self._logger.warning(
-                        "Failed to parse response. Attempt %d/%d.",
-                        attempt + 1,
-                        self._max_retries + 1,
+            prompt_tokens = {
+                **self._prompt_tokens,
+                "rules": estimate_tokens(params["input"][1]["content"]),
+                "message": estimate_tokens(text)
+            }
+            for part, tokens in prompt_tokens.items():
+                metrics.moderation_prompt_tokens_estimated_total.inc(part, amount=tokens)
+            estimated_tokens = sum(prompt_tokens.values())
+
+            reserved_tokens = self.token_budget.reserve(estimated_tokens)
+            if reserved_tokens is None:
+                action = self.token_budget.on_exceeded
+                metrics.moderation_budget_exceeded_total.inc(action)
+                self._logger.warning(
+                    "Token budget exceeded (estimated prompt %d, spent today %d), GPT is skipped: %s.",
+                    estimated_tokens, self.token_budget.get_spent(), action
+                )
+                if action == "queue":
+                    return self._review("Token budget is exhausted, the message needs a manual review.")
+                return None
+
+            try:
+                output = None
+                for attempt in range(self._max_retries + 1):
+                    span = tracing.span("planner.gpt", attempt=attempt + 1, rules=len(rules), prompt_chars=prompt_chars)
+                    start_time = time.perf_counter()
+                    output_text, usage = "", None
+                    ok = False
+                    try:
+                        with span:
+                            output_text, output, usage = await self.hedger.run(
+                                "gpt",
+                                lambda: self._request_gpt(params, span),
+                                on_hedge=lambda: self._reserve_gpt_hedge(estimated_tokens, span)
+                            )
+                            if output_text or usage is not None:
+                                self._record_gpt_usage(usage, estimated_tokens, output_text, span)
+                            ok = True
+                            if output is None:
+                                output = parse_output(output_text)
+                    except OpenAIError as e:
+                        metrics.moderation_backend_requests_total.inc("gpt", "error")
+                        raise ModerationError() from e
+                    except ModerationOutputParseError:
+                        output = None
+                        span.set(parse_error=True)
+                        metrics.moderation_parse_retries_total.inc()
+                        self._logger.warning(
+                            "Failed to parse response. Attempt %d/%d.",
+                            attempt + 1,
+                            self._max_retries + 1,
+                        )
+                    finally:
+                        latency = time.perf_counter() - start_time
+                        metrics.moderation_backend_latency_seconds.observe(latency, "gpt")
+                        self.backend_health.observe("gpt", latency, ok)
+                    metrics.moderation_backend_requests_total.inc(
+                        "gpt", "ok" if output is not None else "parse_error"
                     )
 
+                    if output is not None:
+                        break
+            finally:
+                self.token_budget.release(reserved_tokens)
+
             if output is None:
                 raise ModerationOutputParseError()
 
@@ -191,7 +380,17 @@ class ModerationPlanner:
     async def close(self):
         if self._openai_client:
             await self._openai_client.close()
-        await self._client.aclose()
+        if self._client:
+            await self._client.aclose()
+
+    async def prewarm(self):
+        if not (self._client and self._openai_client):
+            return
+
+        try:
+            await self._client.head(str(self._openai_client.base_url), timeout=5)
+        except Exception as e:
+            self._logger.warning("Failed to pre-warm the OpenAI connection: %r", e)
 
     def is_backend_enabled(self, backend: ModerationBackend):
         return (
@@ -200,35 +399,53 @@ class ModerationPlanner:
             and self._openai_client is not None
         )
 
-    def set_enabled(self, value: bool, *, api_key: Optional[str] = None):
-        self._enabled = value
+    def _should_run(self, backend: ModerationBackend):
+        return self.is_backend_enabled(backend) and self.backend_health.allow(backend, self._backends)
 
+    def set_enabled(self, value: bool, *, api_key: Optional[str] = None):
         if not getattr(self._openai_client, "api_key", None) and api_key:
             self._openai_params["api_key"] = api_key
 
         if value and not self._openai_client:
             if not self._openai_params.get("api_key"):
                 raise ValueError("api_key is required to enable moderation")
-            self._openai_client = AsyncOpenAI(**self._openai_params)
+
+            from httpx import AsyncClient
+            from openai import AsyncOpenAI
+
+            self._client = AsyncClient(
+                proxy=self._proxy,
+                event_hooks=self._recorder.get_httpx_hooks() if self._recorder else None
+            )
+            self._openai_client = AsyncOpenAI(**self._openai_params, http_client=self._client)
+
+        self._enabled = value
+
+    def set_backends(self, backends: FrozenSet[ModerationBackend]):
+        self._backends = backends
+
+    def set_model(self, gpt_model: str):
+        self._gpt_model = gpt_model
 
     def set_functions(self, *functions):
         if not functions:
             return
 
-        self._functions.clear()
-        for func in functions:
-            sig = inspect.signature(func)
-            args = {
-                name: (
-                    getattr(param.annotation, "__name__", str(param.annotation))
-                    if param.annotation != inspect._empty else "str"
-                )
-                for name, param in sig.parameters.items()
-            }
-
-            self._functions.append(
-                {"name": func.__name__, "args": args, "description": func.description or ""}
-            )
+        # Signatures are inspected once here; the executor only looks functions up by name.
+        compiled = [ModerationFunction.from_callable(func) for func in functions]
+        self._functions_by_name = {function.name: function for function in compiled}
+        self._functions = [function.to_prompt() for function in compiled]
+        self._functions_prompt = self._build_functions_prompt(self._functions)
+        self._instructions = self._build_instructions()
+        self._text_format = self._build_text_format() if self._output == "json_schema" else None
+
+        functions_tokens = estimate_tokens(self._functions_prompt)
+        if self._text_format:
+            functions_tokens += estimate_tokens(json.dumps(self._text_format))
+        self._prompt_tokens = {
+            "instructions": estimate_tokens(self._instructions) - estimate_tokens(self._functions_prompt),
+            "functions": functions_tokens
+        }
 
         function_names = self.get_function_names()
 
@@ -244,7 +461,14 @@ class ModerationPlanner:
     def get_function_names(self) -> List[str]:
         return [f["name"] for f in self._functions if "name" in f]
 
+    def get_function(self, name: str) -> Optional[ModerationFunction]:
+        return self._functions_by_name.get(name)
+
     async def plan(self, text: Optional[str] = None, image: Optional[str] = None) -> List[Dict[str, Any]]:
+        with tracing.span("planner.plan"):
+            return await self._plan(text, image)
+
+    async def _plan(self, text: Optional[str] = None, image: Optional[str] = None) -> List[Dict[str, Any]]:
         if not self._enabled:
             return self._approve("Moderation is disabled.")
 
@@ -252,7 +476,7 @@ class ModerationPlanner:
             raise ModerationNoAvailableFunctionsError()
 
         if await self._run_omni(text, image):
-            return self._reject("Message was rejected by the auto-moderator.")
+            return self._reject("Message was rejected by the auto-moderator.", "high")
 
         output = await self._run_gpt(text)
         if output:
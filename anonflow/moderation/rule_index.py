@@ -0,0 +1,49 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+STEM_LENGTH = 6
+STOP_WORDS = frozenset("""
+    the and are all any for not but you your our who what this that these those with from have has was were
+    will can its into about there their them they than then when also just only other some such very
+    как что это так все они его она оно для при или ещё уже был была были быть есть нет тоже только
+    если чтобы когда где кто там тут вот над под без про вам нам вас нас мне меня тебя себя
+""".split())
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    # Cutting words to a fixed prefix is a crude stemmer, but it folds most
+    # Russian and English inflections together without any dependencies.
+    return [
+        word[:STEM_LENGTH] for word in _WORD.findall(text.lower())
+        if len(word) > 2 and word not in STOP_WORDS
+    ]
+
+
+class BM25Index:
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.size = len(documents)
+
+        counts = [Counter(tokenize(document)) for document in documents]
+        lengths = [sum(count.values()) for count in counts]
+        average_length = sum(lengths) / len(lengths) if lengths else 0
+        frequencies = Counter(term for count in counts for term in count)
+
+        # Term weights do not depend on the query, so each posting stores its final score.
+        self._postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for index, (count, length) in enumerate(zip(counts, lengths)):
+            norm = k1 * (1 - b + b * length / average_length) if average_length else k1
+            for term, frequency in count.items():
+                idf = math.log(1 + (self.size - frequencies[term] + 0.5) / (frequencies[term] + 0.5))
+                self._postings[term].append((index, idf * frequency * (k1 + 1) / (frequency + norm)))
+
+    def search(self, query: str, top_k: int) -> List[int]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            for index, score in self._postings.get(term, ()):
+                scores[index] += score
+
+        return sorted(scores, key=lambda index: (-scores[index], index))[:top_k]
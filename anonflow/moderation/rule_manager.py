@@ -1,29 +1,81 @@
 import logging
+import re
 from os import listdir
 from pathlib import Path
-from typing import List
+from typing import List, Optional
+
+from .rule_index import BM25Index
+
+ALWAYS_MARKER = "[always]"
+
+_HEADING = re.compile(r"^#", re.MULTILINE)
 
 
 class RuleManager:
-    def __init__(self, rules_dir: Path):
+    def __init__(self, rules_dir: Path, top_k: int = 0):
         self._logger = logging.getLogger(__name__)
 
         self.rules_dir = rules_dir
+        self.top_k = top_k
+
         self._rules: List[str] = []
+        self._sections: List[str] = []
+        self._always: List[int] = []
+        self._index: Optional[BM25Index] = None
+
+    @staticmethod
+    def _split_sections(rule: str):
+        # Every markdown heading starts a section; text before the first heading is a section of its own.
+        starts = [match.start() for match in _HEADING.finditer(rule)]
+        bounds = zip([0, *starts], [*starts, len(rule)])
+        return [section for start, end in bounds if (section := rule[start:end].strip())]
 
-    def reload(self):
+    def read(self):
         if not self.rules_dir.exists():
             self.rules_dir.mkdir(parents=True, exist_ok=True)
 
-        self._rules.clear()
-        for rule_filename in listdir(self.rules_dir):
+        rules: List[str] = []
+        for rule_filename in sorted(listdir(self.rules_dir)):
             rule_filepath = Path(self.rules_dir / rule_filename).resolve()
             with rule_filepath.open(encoding="utf-8") as rule_file:
                 rule = rule_file.read()
                 if rule:
-                    self._rules.append(rule)
+                    rules.append(rule)
+
+        return rules
+
+    def reload(self, rules: Optional[List[str]] = None):
+        # Rules can be read beforehand, so that a failed read leaves the caller's other state untouched too.
+        if rules is None:
+            rules = self.read()
+
+        sections: List[str] = []
+        always: List[int] = []
+        for rule in rules:
+            for section in self._split_sections(rule):
+                first_line, _, rest = section.partition("\n")
+                if ALWAYS_MARKER in first_line:
+                    always.append(len(sections))
+                    section = (first_line.replace(ALWAYS_MARKER, "").rstrip() + "\n" + rest).strip()
+                sections.append(section)
+
+        self._rules = rules
+        self._sections = sections
+        self._always = always
+        self._index = BM25Index(self._sections) if self.top_k else None
+
+        self._logger.info(
+            "Rules loaded. Total=%d, Sections=%d, Always=%d",
+            len(self._rules), len(self._sections), len(self._always)
+        )
 
-        self._logger.info("Rules loaded. Total=%d", len(self._rules))
+    def get_rules(self, text: Optional[str] = None):
+        if not self._index or self.top_k >= self._index.size:
+            return self._rules
+        if not text:
+            return [self._sections[index] for index in self._always]
 
-    def get_rules(self):
-        return self._rules
+        # Sections keep their order in the files so that related rules stay together.
+        selected = set(self._always)
+        selected.update(self._index.search(text, self.top_k))
+        return [self._sections[index] for index in sorted(selected)]
@@ -7,6 +7,14 @@ CONFIG_EXAMPLE_FILEPATH = ROOT_DIR / "config.yml.example"
 
 DATABASE_FILEPATH = ROOT_DIR / "anonflow.db"
 
+PENDING_UPDATES_FILEPATH = ROOT_DIR / "pending_updates.jsonl"
+
+TRACES_FILEPATH = ROOT_DIR / "traces.jsonl"
+
+RECORDING_FILEPATH = ROOT_DIR / "recording.jsonl"
+
+PROFILES_DIR = ROOT_DIR / "profiles"
+
 RULES_DIR = ROOT_DIR / "rules"
 
 TRANSLATIONS_DIR = ROOT_DIR / "translations"
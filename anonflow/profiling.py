@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Dict, Optional, Tuple
+
+from anonflow import metrics
+
+from . import paths
+
+
+SOURCE_PREFIXES = tuple(dict.fromkeys(
+    str(Path(path)) + "/"
+    for path in (
+        paths.ROOT_DIR,
+        sysconfig.get_paths()["purelib"],
+        sysconfig.get_paths()["platlib"],
+        sysconfig.get_paths()["stdlib"]
+    )
+))
+
+
+class ProfilerBusyError(RuntimeError): ...
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        interval: float = 0.5,
+        threshold: float = 0.1,
+        asyncio_debug: bool = False,
+        slow_callback_duration: float = 0.1
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.interval = interval
+        self.threshold = threshold
+        self.asyncio_debug = asyncio_debug
+        self.slow_callback_duration = slow_callback_duration
+
+        self._heartbeat = time.monotonic()
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start_time = loop.time()
+            self._heartbeat = time.monotonic()
+
+            await asyncio.sleep(self.interval)
+
+            lag = max(0, loop.time() - start_time - self.interval)
+            metrics.event_loop_lag_seconds.observe(lag)
+
+    def _watch(self):
+        # Runs in its own thread so that it can look at the loop while the loop is stuck.
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_time = time.monotonic() - heartbeat - self.interval
+            if blocked_time < self.threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+
+            frame = sys._current_frames().get(self._thread_id) # type: ignore
+            metrics.event_loop_stalls_total.inc()
+            self._logger.warning(
+                "Event loop has been blocked for %.3fs in:\n%s",
+                blocked_time,
+                "".join(traceback.format_stack(frame)).rstrip() if frame else "<unknown>"
+            )
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self.asyncio_debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_callback_duration
+
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="anonflow-loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def close(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+
+class SamplingProfiler:
+    def __init__(
+        self,
+        directory: Path = paths.PROFILES_DIR,
+        interval: float = 0.005,
+        name: str = "profile"
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.directory = directory
+        self.interval = interval
+        self.name = name
+
+        self._labels: Dict[CodeType, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+
+    @property
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+    def _get_label(self, code: CodeType):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in SOURCE_PREFIXES:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+        return label
+
+    def _collapse(self, frame: Optional[FrameType]):
+        labels = []
+        while frame is not None:
+            labels.append(self._get_label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _sample(self, thread_id: int, duration: float):
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + duration
+
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                stacks[self._collapse(frame)] += 1
+            del frame
+
+            if self._stopped.wait(self.interval):
+                break
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filepath = self.directory / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}.collapsed"
+        with filepath.open("w", encoding="utf-8") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        return filepath, sum(stacks.values())
+
+    async def _run(self, duration: float):
+        self._logger.info("Sampling the event loop for %.1fs.", duration)
+        filepath, samples = await asyncio.to_thread(self._sample, threading.get_ident(), duration)
+        self._logger.info("Profile with %d samples written to %s.", samples, filepath)
+        return filepath, samples
+
+    def start(self, duration: float) -> "asyncio.Task[Tuple[Path, int]]":
+        if self.is_running:
+            raise ProfilerBusyError("A profile is already being recorded.")
+
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run(duration))
+        return self._task
+
+    async def run(self, duration: float):
+        return await asyncio.shield(self.start(duration))
+
+    async def close(self):
+        self._stopped.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+import re
+import secrets
+import time
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError
+
+if TYPE_CHECKING:
+    from httpx import Request, Response
+
+ID_KEYS = frozenset(("id", "user_id", "chat_id", "from_chat_id", "sender_chat_id"))
+FILE_KEYS = frozenset(("file_id", "file_unique_id", "file_path"))
+TEXT_KEYS = frozenset((
+    "text", "caption", "query", "question", "explanation", "title", "address", "file_name", "reason"
+))
+NAME_KEYS = frozenset(("first_name", "sender_user_name", "author_signature"))
+URL_KEYS = frozenset(("url",))
+LOCATION_KEYS = frozenset(("latitude", "longitude"))
+DROPPED_KEYS = frozenset((
+    "last_name", "username", "phone_number", "email", "bio", "vcard",
+    "foursquare_id", "foursquare_type", "google_place_id", "google_place_type"
+))
+PUBLIC_CHAT_TYPES = frozenset(("group", "supergroup", "channel"))
+
+ANONYMOUS_NAME = "User"
+MAX_CACHED_IDS = 65536
+
+_LETTERS = re.compile(r"[^\W\d_]")
+_DIGITS = re.compile(r"\d")
+_COMMAND = re.compile(r"^/\w+(?:@\w+)?")
+# A "reason" string inside JSON text, such as the moderation calls in a model output.
+_JSON_REASON = re.compile(r'("reason"\s*:\s*")((?:[^"\\]|\\.)*)("?)')
+_JSON_ESCAPE = re.compile(r"\\u[0-9a-fA-F]{4}|\\.")
+
+
+class Recorder:
+    def __init__(
+        self,
+        filepath: Path,
+        salt: Optional[str] = None,
+        redact_text: bool = True
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.filepath = filepath
+        self.redact_text = redact_text
+
+        if not salt:
+            self._logger.warning("recording.salt is not set, user ids will not match between restarts.")
+            salt = secrets.token_hex(16)
+        self._key = hashlib.sha256(salt.encode()).digest()
+
+        self._ids: Dict[int, int] = {}
+        self._file: Optional[IO[str]] = None
+
+    def _digest(self, value: str, size: int):
+        return hashlib.blake2b(value.encode(), key=self._key, digest_size=size).digest()
+
+    def hash_id(self, value: int):
+        # Groups and channels have negative ids and are not personal data;
+        # keeping them lets the replay config point at the same chats.
+        if value <= 0:
+            return value
+
+        hashed = self._ids.get(value)
+        if hashed is None:
+            if len(self._ids) >= MAX_CACHED_IDS:
+                self._ids.clear()
+            hashed = self._ids[value] = int.from_bytes(self._digest(str(value), 6), "big") or 1
+        return hashed
+
+    def hash_file(self, value: str):
+        # File ids and paths can be used to download the original file with the bot token.
+        return self._digest(value, 16).hex() + Path(value).suffix
+
+    @staticmethod
+    def mask(text: str):
+        # Keeps length, whitespace, punctuation and emoji so entity offsets,
+        # prompt sizes and copypasta (identical texts) survive redaction.
+        command = _COMMAND.match(text)
+        prefix = command.group() if command else ""
+        return prefix + _DIGITS.sub("0", _LETTERS.sub("x", text[len(prefix):]))
+
+    def hash_url(self, value: str):
+        return f"https://{self._digest(value, 8).hex()}.invalid"
+
+    def mask_reasons(self, text: str):
+        # Masks the "reason" values of JSON embedded in text, re-encoding them so that the JSON still parses.
+        def mask_value(match: re.Match):
+            try:
+                value = json.loads(f'"{match.group(2)}"')
+            except ValueError:
+                value = _JSON_ESCAPE.sub(" ", match.group(2))
+            # An output cut off inside the reason keeps its missing closing quote missing.
+            masked = json.dumps(self.mask(value), ensure_ascii=False)
+            return match.group(1)[:-1] + (masked if match.group(3) else masked[:-1])
+
+        return _JSON_REASON.sub(mask_value, text)
+
+    def anonymize(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, dict):
+            # Bots and public chats are not personal data, their names and titles are kept.
+            keep_names = value.get("is_bot") is True or value.get("type") in PUBLIC_CHAT_TYPES
+            result = {}
+            for item_key, item in value.items():
+                if keep_names and isinstance(item, str):
+                    result[item_key] = item
+                elif item_key in NAME_KEYS and not keep_names:
+                    result[item_key] = ANONYMOUS_NAME
+                elif item_key not in DROPPED_KEYS:
+                    result[item_key] = self.anonymize(item, item_key)
+            return result
+        elif isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        elif key in ID_KEYS and isinstance(value, int) and not isinstance(value, bool):
+            return self.hash_id(value)
+        elif key in FILE_KEYS and isinstance(value, str):
+            return self.hash_file(value)
+        elif key in URL_KEYS and isinstance(value, str):
+            return self.hash_url(value)
+        elif key in LOCATION_KEYS and isinstance(value, (int, float)):
+            return 0.0
+        elif key in TEXT_KEYS and isinstance(value, str) and self.redact_text:
+            return self.mask(value)
+
+        return value
+
+    def _redact_output(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            return {key: self._redact_output(item) for key, item in value.items()}
+        elif isinstance(value, list):
+            return [self._redact_output(item) for item in value]
+        elif isinstance(value, str):
+            return self.mask_reasons(value)
+        return value
+
+    def _write(self, record: Dict[str, Any]):
+        try:
+            if self._file is None:
+                self._file = self.filepath.open("a", encoding="utf-8")
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+        except OSError:
+            self._logger.exception("Failed to write a record to %s.", self.filepath)
+
+    def record_update(self, update: Any):
+        self._write({"ts": round(time.time(), 3), "type": "update", "update": self.anonymize(_dump(update))})
+
+    def record_bot(
+        self,
+        method: str,
+        duration: float,
+        result: Any = None,
+        error: Optional[TelegramAPIError] = None
+    ):
+        record: Dict[str, Any] = {
+            "ts": round(time.time(), 3),
+            "type": "bot",
+            "method": method,
+            "duration": round(duration, 4)
+        }
+        if error is not None:
+            record["error"] = {
+                "type": type(error).__name__,
+                "message": error.message,
+                "retry_after": getattr(error, "retry_after", None)
+            }
+        else:
+            record["result"] = self.anonymize(_dump(result))
+        self._write(record)
+
+    def record_openai(
+        self,
+        endpoint: str,
+        status: int,
+        duration: float,
+        body: Any,
+        retry_after_ms: Optional[str] = None
+    ):
+        # Model outputs carry the decision JSON that the replay has to parse,
+        # so only the reasons, which may quote the post, are masked.
+        if self.redact_text:
+            body = self._redact_output(body)
+        self._write({
+            "ts": round(time.time(), 3),
+            "type": "openai",
+            "endpoint": endpoint,
+            "status": status,
+            "duration": round(duration, 4),
+            "retry_after_ms": retry_after_ms,
+            "body": body
+        })
+
+    async def _on_request(self, request: "Request"):
+        request.extensions["anonflow_start"] = time.perf_counter()
+
+    async def _on_response(self, response: "Response"):
+        request = response.request
+        if request.method != "POST":
+            return
+
+        duration = time.perf_counter() - request.extensions.get("anonflow_start", time.perf_counter())
+        endpoint = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+
+        body = None
+        # Streamed responses are not buffered here, only their timing is kept.
+        if not response.headers.get("content-type", "").startswith("text/event-stream"):
+            await response.aread()
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+
+        self.record_openai(endpoint, response.status_code, duration, body, response.headers.get("retry-after-ms"))
+
+    def get_httpx_hooks(self):
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class RequestRecordingMiddleware(BaseRequestMiddleware):
+    def __init__(self, recorder: Recorder):
+        self.recorder = recorder
+
+    async def __call__(self, make_request, bot, method):
+        start_time = time.perf_counter()
+        try:
+            result = await make_request(bot, method)
+        except TelegramAPIError as e:
+            self.recorder.record_bot(method.__api_method__, time.perf_counter() - start_time, error=e)
+            raise
+
+        self.recorder.record_bot(method.__api_method__, time.perf_counter() - start_time, result=result)
+        return result
+
+
+def _dump(value: Any):
+    if hasattr(value, "model_dump"):
+        # Unset fields hold aiogram's Default placeholders, which cannot be serialized.
+        return value.model_dump(mode="json", by_alias=True, exclude_none=True, exclude_unset=True)
+    elif isinstance(value, list):
+        return [_dump(item) for item in value]
+    return value
+
+def load(filepath: Path) -> Iterator[Dict[str, Any]]:
+    with filepath.open(encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -1,11 +1,17 @@
 from .accounts.moderator import ModeratorService
 from .accounts.user import UserService
 from .transport.delivery import DeliveryService
+from .transport.digest import StaffDigest
+from .transport.limiter import RateLimiter
+from .transport.outbox import Outbox
 from .transport.router import MessageRouter
 
 __all__ = [
     "ModeratorService",
     "UserService",
     "DeliveryService",
+    "RateLimiter",
+    "Outbox",
+    "StaffDigest",
     "MessageRouter",
 ]
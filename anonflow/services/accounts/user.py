@@ -1,17 +1,28 @@
 import logging
+from typing import Optional
 
+from cachetools import TTLCache
 from sqlalchemy.exc import IntegrityError
 
+from anonflow import metrics
 from anonflow.database import Database, UserRepository
 
 
 class UserService:
-    def __init__(self, database: Database, user_repository: UserRepository):
+    def __init__(
+        self,
+        database: Database,
+        user_repository: UserRepository,
+        cache_size: int = 1024,
+        cache_ttl: int = 60
+    ):
         self._logger = logging.getLogger(__name__)
 
         self._database = database
         self._user_repository = user_repository
 
+        self._languages: TTLCache[int, Optional[str]] = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
     async def add(self, user_id: int):
         try:
             async with self._database.begin_session() as session:
@@ -23,11 +34,27 @@ class UserService:
         async with self._database.get_session() as session:
             return await self._user_repository.get(session, user_id)
 
+    async def get_language(self, user_id: int) -> Optional[str]:
+        try:
+            language = self._languages[user_id]
+        except KeyError:
+            metrics.cache_requests_total.inc("user_language", "miss")
+        else:
+            metrics.cache_requests_total.inc("user_language", "hit")
+            return language
+
+        async with self._database.get_session() as session:
+            language = await self._user_repository.get_language(session, user_id)
+
+        self._languages[user_id] = language
+        return language
+
     async def has(self, user_id: int):
         async with self._database.get_session() as session:
             return await self._user_repository.has(session, user_id)
 
     async def remove(self, user_id: int):
+        self._languages.pop(user_id, None)
         try:
             async with self._database.begin_session() as session:
                 await self._user_repository.remove(session, user_id)
@@ -35,6 +62,7 @@ class UserService:
             self._logger.warning("Failed to remove user user_id=%s", user_id)
 
     async def update(self, user_id: int, **fields):
+        self._languages.pop(user_id, None)
         try:
             async with self._database.begin_session() as session:
                 await self._user_repository.update(session, user_id, **fields)
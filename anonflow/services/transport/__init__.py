@@ -1,7 +1,13 @@
 from .delivery import DeliveryService
+from .digest import StaffDigest
+from .limiter import RateLimiter
+from .outbox import Outbox
 from .router import MessageRouter
 
 __all__ = [
     "DeliveryService",
+    "RateLimiter",
+    "Outbox",
+    "StaffDigest",
     "MessageRouter"
 ]
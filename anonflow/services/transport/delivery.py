@@ -1,7 +1,15 @@
-from typing import Optional, Union
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, TypeVar, Union
 
 from aiogram import Bot
 from aiogram.client.bot import Default
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError
+)
 from aiogram.types import (
     ChatIdUnion,
     InputMediaPhoto,
@@ -9,12 +17,34 @@ from aiogram.types import (
     ReplyMarkupUnion
 )
 
-from .content import ContentMediaGroup, ContentMediaItem, MediaType
+from anonflow import metrics, tracing
+
+from .content import (
+    ContentMediaGroup,
+    ContentMediaItem,
+    ContentTextItem,
+    MediaType
+)
+from .limiter import RateLimiter
+from .outbox import Outbox, OutboxItem
+
+T = TypeVar("T")
 
 
 class DeliveryService:
-    def __init__(self, bot: Bot):
+    def __init__(
+        self,
+        bot: Bot,
+        rate_limiter: Optional[RateLimiter] = None,
+        outbox: Optional[Outbox] = None
+    ):
+        self._logger = logging.getLogger(__name__)
+
         self._bot = bot
+        self._rate_limiter = rate_limiter
+        self._outbox = outbox
+
+        self._chat_tails: Dict[ChatIdUnion, asyncio.Future] = {}
 
     @staticmethod
     def _wrap_media(item: ContentMediaItem):
@@ -25,24 +55,90 @@ class DeliveryService:
         else:
             raise ValueError("Media item type is invalid.")
 
-    async def send_media(
+    @staticmethod
+    def _get_method(content: Union[ContentTextItem, ContentMediaItem, ContentMediaGroup]):
+        if isinstance(content, ContentMediaGroup):
+            if len(content.items) > 1:
+                return "sendMediaGroup"
+            content = content.items[0]
+
+        if isinstance(content, ContentTextItem):
+            return "sendMessage"
+        return "sendPhoto" if content.type == MediaType.PHOTO else "sendVideo"
+
+    def _call(
         self,
         chat_id: ChatIdUnion,
+        call: Callable[[], Awaitable[T]],
+        method: str = "unknown",
+        cost: int = 1
+    ) -> Awaitable[T]:
+        previous = self._chat_tails.get(chat_id)
+        done = asyncio.get_running_loop().create_future()
+        self._chat_tails[chat_id] = done
+
+        async def run():
+            outcome = "cancelled"
+            start_time = time.perf_counter()
+            try:
+                with tracing.span("delivery", method=method):
+                    with tracing.span("delivery.wait"):
+                        if previous is not None:
+                            await asyncio.shield(previous)
+                            start_time = time.perf_counter()
+                        if self._rate_limiter:
+                            await self._rate_limiter.acquire(chat_id, cost)
+
+                    result = await call()
+                outcome = "ok"
+                return result
+            except TelegramRetryAfter:
+                outcome = "retry_after"
+                raise
+            except TelegramNetworkError:
+                outcome = "network_error"
+                raise
+            except TelegramServerError:
+                outcome = "server_error"
+                raise
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                metrics.delivery_requests_total.inc(method, outcome)
+                metrics.delivery_latency_seconds.observe(time.perf_counter() - start_time, method)
+
+                done.set_result(None)
+                if self._chat_tails.get(chat_id) is done:
+                    del self._chat_tails[chat_id]
+
+        # Started right away, so the next call to the chat is released even if this one is never awaited.
+        return asyncio.ensure_future(run())
+
+    @staticmethod
+    def _get_cost(content: Union[ContentTextItem, ContentMediaItem, ContentMediaGroup]):
+        # Telegram counts every message of a media group against the limits.
+        if isinstance(content, ContentMediaGroup):
+            return max(1, len(content.items))
+        return 1
+
+    def _prepare_media(
+        self,
         media_item: ContentMediaItem,
         parse_mode: Optional[Union[str, Default]] = Default("parse_mode"),
         reply_markup: Optional[ReplyMarkupUnion] = None
     ):
         media = self._wrap_media(media_item)
         if isinstance(media, InputMediaPhoto):
-            await self._bot.send_photo(
+            return lambda chat_id: self._bot.send_photo(
                 chat_id,
                 media.media,
                 caption=media.caption,
                 parse_mode=parse_mode,
                 reply_markup=reply_markup
             )
-        elif isinstance(media, InputMediaVideo):
-            await self._bot.send_video(
+        else:
+            return lambda chat_id: self._bot.send_video(
                 chat_id,
                 media.media,
                 caption=media.caption,
@@ -50,18 +146,116 @@ class DeliveryService:
                 reply_markup=reply_markup
             )
 
+    def _prepare_media_group(self, media_group: ContentMediaGroup):
+        media = [self._wrap_media(item) for item in media_group.items]
+        return lambda chat_id: self._bot.send_media_group(chat_id=chat_id, media=media)
+
+    def _prepare_text(
+        self,
+        text: str,
+        parse_mode: Optional[Union[str, Default]] = Default("parse_mode"),
+        reply_markup: Optional[ReplyMarkupUnion] = None
+    ):
+        return lambda chat_id: self._bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup
+        )
+
+    def _prepare(self, content: Union[ContentTextItem, ContentMediaItem, ContentMediaGroup]):
+        if isinstance(content, ContentTextItem):
+            return self._prepare_text(content.text)
+        elif isinstance(content, ContentMediaItem):
+            return self._prepare_media(content)
+        elif len(content.items) > 1:
+            return self._prepare_media_group(content)
+        elif content.items:
+            return self._prepare_media(content.items[0])
+
+    async def _deliver(self, item: OutboxItem):
+        send = self._prepare(item.content)
+        if send:
+            await self._call(
+                item.chat_id,
+                lambda: send(item.chat_id),
+                self._get_method(item.content),
+                self._get_cost(item.content)
+            )
+
+    async def fan_out(
+        self,
+        chat_ids: Iterable[ChatIdUnion],
+        content: Union[ContentTextItem, ContentMediaItem, ContentMediaGroup]
+    ):
+        send = self._prepare(content)
+        if send is None:
+            return
+
+        chat_ids = list(chat_ids)
+        if self._outbox:
+            await self._outbox.put(chat_ids, content) # type: ignore
+            return
+
+        method = self._get_method(content)
+        cost = self._get_cost(content)
+        calls = [
+            self._call(chat_id, lambda chat_id=chat_id: send(chat_id), method, cost)
+            for chat_id in chat_ids
+        ]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+
+        for chat_id, result in zip(chat_ids, results):
+            if isinstance(result, BaseException):
+                self._logger.error(
+                    "Failed to deliver to chat_id=%s", chat_id, exc_info=result
+                )
+
+    async def start(self):
+        if self._outbox:
+            await self._outbox.start(self._deliver)
+
+    async def close(self):
+        if self._outbox:
+            await self._outbox.close()
+
+    async def edit_text(
+        self,
+        chat_id: ChatIdUnion,
+        message_id: int,
+        text: str,
+        parse_mode: Optional[Union[str, Default]] = Default("parse_mode"),
+        reply_markup: Optional[ReplyMarkupUnion] = None
+    ):
+        return await self._call(
+            chat_id,
+            lambda: self._bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=message_id,
+                text=text,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup # type: ignore
+            ),
+            "editMessageText"
+        )
+
+    async def send_media(
+        self,
+        chat_id: ChatIdUnion,
+        media_item: ContentMediaItem,
+        parse_mode: Optional[Union[str, Default]] = Default("parse_mode"),
+        reply_markup: Optional[ReplyMarkupUnion] = None
+    ):
+        send = self._prepare_media(media_item, parse_mode, reply_markup)
+        return await self._call(chat_id, lambda: send(chat_id), self._get_method(media_item))
+
     async def send_media_group(
         self,
         chat_id: ChatIdUnion,
         media_group: ContentMediaGroup,
     ):
-        await self._bot.send_media_group(
-            chat_id=chat_id,
-            media=[
-                self._wrap_media(item)
-                for item in media_group.items
-            ]
-        )
+        send = self._prepare_media_group(media_group)
+        return await self._call(chat_id, lambda: send(chat_id), "sendMediaGroup", self._get_cost(media_group))
 
     async def send_text(
         self,
@@ -70,9 +264,5 @@ class DeliveryService:
         parse_mode: Optional[Union[str, Default]] = Default("parse_mode"),
         reply_markup: Optional[ReplyMarkupUnion] = None
     ):
-        await self._bot.send_message(
-            chat_id=chat_id,
-            text=text,
-            parse_mode=parse_mode,
-            reply_markup=reply_markup
-        )
+        send = self._prepare_text(text, parse_mode, reply_markup)
+        return await self._call(chat_id, lambda: send(chat_id), "sendMessage")
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+from aiogram.types import ChatIdUnion
+
+from .content import ContentTextItem
+from .delivery import DeliveryService
+
+MAX_MESSAGE_LENGTH = 4096
+HEADER_RESERVE = 256
+
+
+class StaffDigest:
+    def __init__(
+        self,
+        delivery_service: DeliveryService,
+        header: Callable[[int], str],
+        interval: float = 60,
+        max_items: int = 20,
+        max_length: int = MAX_MESSAGE_LENGTH
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self._delivery_service = delivery_service
+        self._header = header
+
+        self.interval = interval
+        self.max_items = max_items
+        self.max_length = max_length
+
+        self._buffers: Dict[ChatIdUnion, List[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _split(self, items: List[str]):
+        # Items are formatted HTML, so chunks are only split between them and an item is never cut.
+        limit = self.max_length - HEADER_RESERVE
+
+        chunks: List[List[str]] = [[]]
+        length = 0
+        for item in items:
+            if chunks[-1] and length + len(item) > limit:
+                chunks.append([])
+                length = 0
+
+            chunks[-1].append(item)
+            length += len(item) + 2
+
+        return chunks
+
+    async def _flush_chat(self, chat_id: ChatIdUnion):
+        items = self._buffers.pop(chat_id, None)
+        if not items:
+            return
+
+        for chunk in self._split(items):
+            text = "\n\n".join([self._header(len(chunk)), *chunk])
+            await self._delivery_service.fan_out([chat_id], ContentTextItem(text))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                self._logger.exception("Failed to flush staff digest.")
+
+    async def add(self, chat_ids: Iterable[ChatIdUnion], text: str):
+        for chat_id in chat_ids:
+            buffer = self._buffers.setdefault(chat_id, [])
+            buffer.append(text)
+
+            if len(buffer) >= self.max_items:
+                await self._flush_chat(chat_id)
+
+    async def flush(self):
+        for chat_id in list(self._buffers):
+            await self._flush_chat(chat_id)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        await self.flush()
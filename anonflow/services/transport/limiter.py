@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Dict, FrozenSet, Iterable
+
+from aiogram.types import ChatIdUnion
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def is_full(self):
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
+
+    def reserve(self, amount: float = 1) -> float:
+        self._refill(time.monotonic())
+        self._tokens -= amount
+
+        if self._tokens >= 0:
+            return 0
+        return -self._tokens / self.rate
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        global_per_second: float = 30,
+        private_chat_per_second: float = 1,
+        group_chat_per_minute: float = 20,
+        chat_burst: float = 3,
+        max_idle_buckets: int = 1024,
+        shared_chat_ids: Iterable[ChatIdUnion] = (),
+        shards: int = 1
+    ):
+        self.private_chat_rate = private_chat_per_second
+        self.group_chat_rate = group_chat_per_minute / 60
+        self.chat_burst = chat_burst
+        self.max_idle_buckets = max_idle_buckets
+        self.shards = shards
+
+        # Chats that every worker sends to, such as staff chats and channels, get a share of their limits per worker.
+        self._shared_chat_ids: FrozenSet[ChatIdUnion] = frozenset(shared_chat_ids)
+
+        self._global_bucket = TokenBucket(global_per_second, global_per_second)
+        self._chat_buckets: Dict[ChatIdUnion, TokenBucket] = {}
+
+    @staticmethod
+    def _is_group_chat(chat_id: ChatIdUnion):
+        return isinstance(chat_id, str) or chat_id < 0
+
+    def _get_chat_bucket(self, chat_id: ChatIdUnion):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_idle_buckets:
+                self._chat_buckets = {
+                    key: value
+                    for key, value in self._chat_buckets.items()
+                    if not value.is_full()
+                }
+
+            share = self.shards if chat_id in self._shared_chat_ids else 1
+            bucket = self._chat_buckets[chat_id] = TokenBucket(
+                (self.group_chat_rate if self._is_group_chat(chat_id) else self.private_chat_rate) / share,
+                self.chat_burst / share
+            )
+
+        return bucket
+
+    def set_shared_chat_ids(self, chat_ids: Iterable[ChatIdUnion]):
+        chat_ids = frozenset(chat_ids)
+        for chat_id in chat_ids ^ self._shared_chat_ids:
+            self._chat_buckets.pop(chat_id, None)
+        self._shared_chat_ids = chat_ids
+
+    async def acquire(self, chat_id: ChatIdUnion, cost: float = 1):
+        delay = self._get_chat_bucket(chat_id).reserve(cost)
+        if delay:
+            await asyncio.sleep(delay)
+
+        delay = self._global_bucket.reserve(cost)
+        if delay:
+            await asyncio.sleep(delay)
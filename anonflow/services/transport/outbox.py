@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Set, Union
+
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError
+)
+
+from anonflow import metrics, tracing
+from anonflow.database import Database, OutboxRepository
+
+from .content import (
+    ContentMediaGroup,
+    ContentMediaItem,
+    ContentTextItem,
+    MediaType
+)
+
+Content = Union[ContentTextItem, ContentMediaItem, ContentMediaGroup]
+
+
+@dataclass
+class OutboxItem:
+    id: int
+    chat_id: int
+    content: Content
+    attempts: int = 0
+    next_attempt_at: float = 0
+
+
+def encode_content(content: Content):
+    if isinstance(content, ContentTextItem):
+        return "text", json.dumps(asdict(content), ensure_ascii=False)
+    elif isinstance(content, ContentMediaItem):
+        return "media", json.dumps(asdict(content), ensure_ascii=False)
+    elif isinstance(content, ContentMediaGroup):
+        return "media_group", json.dumps(asdict(content), ensure_ascii=False)
+    else:
+        raise ValueError("Content type is invalid.")
+
+def decode_content(kind: str, payload: str) -> Content:
+    data = json.loads(payload)
+
+    def media_item(item):
+        return ContentMediaItem(
+            type=MediaType(item["type"]),
+            file_id=item["file_id"],
+            caption=item.get("caption")
+        )
+
+    if kind == "text":
+        return ContentTextItem(text=data["text"])
+    elif kind == "media":
+        return media_item(data)
+    elif kind == "media_group":
+        return ContentMediaGroup(items=[media_item(item) for item in data["items"]])
+    else:
+        raise ValueError(f"Outbox entry kind {kind!r} is invalid.")
+
+
+class Outbox:
+    def __init__(
+        self,
+        database: Database,
+        outbox_repository: OutboxRepository,
+        *,
+        workers: int = 8,
+        max_attempts: int = 10,
+        backoff_base: float = 1,
+        backoff_max: float = 300,
+        shard: Optional[int] = None,
+        shards: int = 1
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self._database = database
+        self._outbox_repository = outbox_repository
+
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.shard = shard
+        self.shards = shards
+
+        self._deliver: Optional[Callable[[OutboxItem], Awaitable]] = None
+
+        self._semaphore = asyncio.Semaphore(workers)
+        self._queues: Dict[int, Deque[OutboxItem]] = {}
+        self._drainers: Dict[int, asyncio.Task] = {}
+        self._started = False
+
+        metrics.outbox_pending.set_function(
+            lambda: sum(len(queue) for queue in self._queues.values())
+        )
+
+    def _get_backoff(self, attempts: int):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _enqueue(self, item: OutboxItem):
+        self._queues.setdefault(item.chat_id, deque()).append(item)
+
+        if self._started and item.chat_id not in self._drainers:
+            task = asyncio.create_task(self._drain(item.chat_id))
+            self._drainers[item.chat_id] = task
+
+    async def _complete(self, item: OutboxItem):
+        async with self._database.begin_session() as session:
+            await self._outbox_repository.remove(session, item.id)
+
+    async def _fail(self, item: OutboxItem, error: BaseException):
+        self._logger.error(
+            "Giving up on outbox entry id=%s chat_id=%s after %d attempt(s).",
+            item.id, item.chat_id, item.attempts, exc_info=error
+        )
+        async with self._database.begin_session() as session:
+            await self._outbox_repository.update(
+                session,
+                item.id,
+                status="failed",
+                attempts=item.attempts,
+                last_error=repr(error)
+            )
+
+    async def _reschedule(self, item: OutboxItem, delay: float, error: BaseException):
+        item.next_attempt_at = time.time() + delay
+        self._logger.warning(
+            "Failed to deliver outbox entry id=%s chat_id=%s, retrying in %.1fs. Attempt %d/%d. Error: %r",
+            item.id, item.chat_id, delay, item.attempts, self.max_attempts, error
+        )
+        async with self._database.begin_session() as session:
+            await self._outbox_repository.update(
+                session,
+                item.id,
+                attempts=item.attempts,
+                next_attempt_at=item.next_attempt_at,
+                last_error=repr(error)
+            )
+
+    async def _process(self, item: OutboxItem):
+        while True:
+            delay = item.next_attempt_at - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self._semaphore:
+                    await self._deliver(item) # type: ignore
+            except TelegramRetryAfter as e:
+                item.attempts += 1
+                error, delay = e, e.retry_after
+            except (TelegramNetworkError, TelegramServerError) as e:
+                item.attempts += 1
+                error, delay = e, self._get_backoff(item.attempts)
+            except Exception as e:
+                item.attempts += 1
+                await self._fail(item, e)
+                return
+            else:
+                await self._complete(item)
+                return
+
+            if item.attempts >= self.max_attempts:
+                await self._fail(item, error)
+                return
+
+            await self._reschedule(item, delay, error)
+
+    async def _drain(self, chat_id: int):
+        # Drainers outlive the update that started them and serve later ones too.
+        tracing.detach()
+
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                try:
+                    await self._process(queue[0])
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self._logger.exception("Failed to update outbox entry id=%s.", queue[0].id)
+                queue.popleft()
+        finally:
+            if not queue:
+                self._queues.pop(chat_id, None)
+            self._drainers.pop(chat_id, None)
+
+    async def put(self, chat_ids: Iterable[int], content: Content):
+        kind, payload = encode_content(content)
+
+        with tracing.span("outbox.put"):
+            async with self._database.begin_session() as session:
+                entries = [
+                    await self._outbox_repository.add(session, chat_id, kind, payload, self.shard)
+                    for chat_id in chat_ids
+                ]
+
+        for entry in entries:
+            self._enqueue(OutboxItem(id=entry.id, chat_id=entry.chat_id, content=content)) # type: ignore
+
+    async def start(self, deliver: Callable[[OutboxItem], Awaitable]):
+        self._deliver = deliver
+
+        async with self._database.get_session() as session:
+            entries = await self._outbox_repository.get_pending(session, self.shard, self.shards)
+
+        for entry in entries:
+            try:
+                content = decode_content(entry.kind, entry.payload) # type: ignore
+            except (ValueError, KeyError):
+                self._logger.exception("Dropping malformed outbox entry id=%s.", entry.id)
+                async with self._database.begin_session() as session:
+                    await self._outbox_repository.update(session, entry.id, status="failed") # type: ignore
+                continue
+
+            self._queues.setdefault(entry.chat_id, deque()).append( # type: ignore
+                OutboxItem(
+                    id=entry.id, # type: ignore
+                    chat_id=entry.chat_id, # type: ignore
+                    content=content,
+                    attempts=entry.attempts, # type: ignore
+                    next_attempt_at=entry.next_attempt_at # type: ignore
+                )
+            )
+
+        if entries:
+            self._logger.info("Replaying %d pending outbox entries.", len(entries))
+
+        self._started = True
+        for chat_id in self._queues:
+            self._drainers[chat_id] = asyncio.create_task(self._drain(chat_id))
+
+    async def close(self):
+        self._started = False
+
+        drainers: Set[asyncio.Task] = set(self._drainers.values())
+        for task in drainers:
+            task.cancel()
+        await asyncio.gather(*drainers, return_exceptions=True)
+
+        self._queues.clear()
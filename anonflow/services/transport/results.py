@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import TypeAlias, Union
 
+from anonflow.config.models import ModerationSeverity
+
 from .content import ContentMediaGroup, ContentMediaItem, ContentTextItem
 
 
@@ -16,6 +18,19 @@ class CommandInfoResult(Result):
 class CommandStartResult(Result):
     pass
 
+@dataclass(frozen=True)
+class ProfilingBusyResult(Result):
+    pass
+
+@dataclass(frozen=True)
+class ProfilingFinishedResult(Result):
+    filepath: str
+    samples: int
+
+@dataclass(frozen=True)
+class ProfilingStartedResult(Result):
+    duration: float
+
 @dataclass(frozen=True)
 class PostPreparedResult(Result):
     content: Union[ContentTextItem, ContentMediaItem, ContentMediaGroup]
@@ -25,6 +40,9 @@ class PostPreparedResult(Result):
 class ModerationDecisionResult(Result):
     is_approved: bool
     reason: str
+    severity: ModerationSeverity = "medium"
+    # Not approved, but left to moderators instead of being rejected.
+    needs_review: bool = False
 
 @dataclass(frozen=True)
 class ModerationStartedResult(Result):
@@ -49,6 +67,9 @@ class UserNotRegisteredResult(Result):
 Results: TypeAlias = Union[
     CommandInfoResult,
     CommandStartResult,
+    ProfilingBusyResult,
+    ProfilingFinishedResult,
+    ProfilingStartedResult,
     PostPreparedResult,
     ModerationDecisionResult,
     ModerationStartedResult,
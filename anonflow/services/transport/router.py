@@ -1,12 +1,21 @@
+import html
+import logging
 from itertools import chain
-from typing import Any, Callable, Dict, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple, get_args
 
+from aiogram.enums import ChatType
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import ChatIdUnion, Message
+from cachetools import TTLCache
 
-from anonflow.translator import Translator
+from anonflow import tracing
+from anonflow.config.models import ModerationSeverity
+from anonflow.services.accounts.user import UserService
+from anonflow.translator import DEFAULT_LANGUAGE, Translator
 
-from .content import ContentMediaGroup, ContentTextItem
+from .content import ContentTextItem
 from .delivery import DeliveryService
+from .digest import StaffDigest
 from .results import (
     Results,
     CommandInfoResult,
@@ -14,12 +23,18 @@ from .results import (
     ModerationDecisionResult,
     ModerationStartedResult,
     PostPreparedResult,
+    ProfilingBusyResult,
+    ProfilingFinishedResult,
+    ProfilingStartedResult,
     UserBannedResult,
     UserNotRegisteredResult,
     UserSubscriptionRequiredResult,
     UserThrottledResult
 )
 
+EXCERPT_LENGTH = 64
+DIGEST_REASON_LENGTH = 512
+
 
 class MessageRouter:
     def __init__(
@@ -27,17 +42,34 @@ class MessageRouter:
         moderation_chat_ids: Tuple[ChatIdUnion],
         publication_channel_ids: Tuple[ChatIdUnion],
         delivery_service: DeliveryService,
-        translator: Translator
+        translator: Translator,
+        status_message: bool = False,
+        staff_digest: Optional[StaffDigest] = None,
+        digest_immediate_severity: ModerationSeverity = "high",
+        user_service: Optional[UserService] = None
     ):
+        self._logger = logging.getLogger(__name__)
+
         self.moderation_chat_ids = moderation_chat_ids
         self.publication_channel_ids = publication_channel_ids
         self.delivery_service = delivery_service
         self.translator = translator
+        self.user_service = user_service
+
+        self.staff_digest = staff_digest
+        self.digest_immediate_severity = digest_immediate_severity
+
+        self._status_messages: Optional[TTLCache] = (
+            TTLCache(maxsize=4096, ttl=3600) if status_message else None
+        )
 
         self._handlers: Dict[Any, Callable] = {
             CommandInfoResult: self._handle_command_info,
             CommandStartResult: self._handle_command_start,
             PostPreparedResult: self._handle_post_prepared,
+            ProfilingBusyResult: self._handle_profiling_busy,
+            ProfilingFinishedResult: self._handle_profiling_finished,
+            ProfilingStartedResult: self._handle_profiling_started,
             ModerationStartedResult: self._handle_moderation_started,
             ModerationDecisionResult: self._handle_moderation_decision,
             UserBannedResult: self._handle_user_banned,
@@ -46,6 +78,28 @@ class MessageRouter:
             UserThrottledResult: self._handle_user_throttled
         }
 
+    async def _send_status(self, message: Message, text: str, final: bool = False):
+        if self._status_messages is None:
+            await self.delivery_service.send_text(message.chat.id, text)
+            return
+
+        key = (message.chat.id, message.message_id)
+
+        status_message_id = self._status_messages.pop(key, None) if final else self._status_messages.get(key)
+        if status_message_id is not None:
+            try:
+                await self.delivery_service.edit_text(message.chat.id, status_message_id, text)
+                return
+            except TelegramBadRequest:
+                self._logger.warning(
+                    "Failed to edit status message chat_id=%s message_id=%s",
+                    message.chat.id, status_message_id
+                )
+
+        status_message = await self.delivery_service.send_text(message.chat.id, text)
+        if not final:
+            self._status_messages[key] = status_message.message_id
+
     async def _handle_command_info(self, result: CommandInfoResult, message: Message, _):
         await self.delivery_service.send_text(message.chat.id, _("messages.user.command_info", message=message))
 
@@ -60,51 +114,88 @@ class MessageRouter:
         )
 
         content = result.content
-        for chat_id in chat_ids:
-            if isinstance(content, ContentTextItem):
-                await self.delivery_service.send_text(chat_id, _("messages.channel.text", text=content.text))
-            elif isinstance(content, ContentMediaGroup):
-                items = content.items
-                if len(items) > 1:
-                    await self.delivery_service.send_media_group(chat_id, content)
-                elif len(items) == 1:
-                    await self.delivery_service.send_media(chat_id, items[0])
+        if isinstance(content, ContentTextItem):
+            content = ContentTextItem(_("messages.channel.text", text=content.text))
+
+        await self.delivery_service.fan_out(chat_ids, content)
 
         if result.moderation_approved:
-            await message.answer(_("messages.user.moderation_approved", message=message))
+            await self._send_status(
+                message,
+                _("messages.user.moderation_approved", message=message),
+                final=True
+            )
+        elif self._status_messages is not None:
+            self._status_messages.pop((message.chat.id, message.message_id), None)
 
     async def _handle_moderation_started(self, result: ModerationStartedResult, message: Message, _):
-        await self.delivery_service.send_text(
-            message.chat.id,
-            _("messages.user.moderation_started", message=message)
-        )
+        await self._send_status(message, _("messages.user.moderation_started", message=message))
+
+    @staticmethod
+    def _shorten(text: str, length: int):
+        # Shortened before escaping, so that a cut never lands inside an HTML entity.
+        return html.escape(text[:length] + ("…" if len(text) > length else ""))
+
+    def _is_digest_allowed(self, result: ModerationDecisionResult):
+        if self.staff_digest is None or result.needs_review:
+            return False
+        if result.is_approved:
+            return True
+
+        severities = get_args(ModerationSeverity)
+        return severities.index(result.severity) < severities.index(self.digest_immediate_severity)
 
     async def _handle_moderation_decision(self, result: ModerationDecisionResult, message: Message, _):
-        for chat_id in self.moderation_chat_ids:
-            if result.is_approved:
-                await self.delivery_service.send_text(
-                    chat_id,
-                    _(
-                        "messages.staff.moderation_approved",
-                        message=message,
-                        explanation=result.reason,
-                    )
+        if self._is_digest_allowed(result):
+            excerpt = message.text or message.caption or ""
+            await self.staff_digest.add( # type: ignore
+                self.moderation_chat_ids,
+                _(
+                    "messages.staff.moderation_digest_approved"
+                    if result.is_approved
+                    else "messages.staff.moderation_digest_rejected",
+                    message=message,
+                    excerpt=self._shorten(excerpt, EXCERPT_LENGTH),
+                    explanation=self._shorten(result.reason, DIGEST_REASON_LENGTH),
                 )
+            )
+        else:
+            if result.is_approved:
+                key = "messages.staff.moderation_approved"
+            elif result.needs_review:
+                key = "messages.staff.moderation_review"
             else:
-                await self.delivery_service.send_text(
-                    chat_id,
-                    _(
-                        "messages.staff.moderation_rejected",
-                        message=message,
-                        explanation=result.reason,
-                    )
-                )
+                key = "messages.staff.moderation_rejected"
+
+            await self.delivery_service.fan_out(
+                self.moderation_chat_ids,
+                ContentTextItem(_(key, message=message, explanation=html.escape(result.reason)))
+            )
 
-        if not result.is_approved:
-            await self.delivery_service.send_text(
-                message.chat.id,
-                _("messages.user.moderation_rejected", message=message)
+        if result.needs_review:
+            await self._send_status(message, _("messages.user.moderation_review", message=message))
+        elif not result.is_approved:
+            await self._send_status(message, _("messages.user.moderation_rejected", message=message))
+
+    async def _handle_profiling_busy(self, result: ProfilingBusyResult, message: Message, _):
+        await self.delivery_service.send_text(message.chat.id, _("messages.staff.profiling_busy", message))
+
+    async def _handle_profiling_finished(self, result: ProfilingFinishedResult, message: Message, _):
+        await self.delivery_service.send_text(
+            message.chat.id,
+            _(
+                "messages.staff.profiling_finished",
+                message,
+                filepath=html.escape(result.filepath),
+                samples=result.samples
             )
+        )
+
+    async def _handle_profiling_started(self, result: ProfilingStartedResult, message: Message, _):
+        await self.delivery_service.send_text(
+            message.chat.id,
+            _("messages.staff.profiling_started", message, duration=round(result.duration))
+        )
 
     async def _handle_user_banned(self, result: UserBannedResult, message: Message, _):
         await self.delivery_service.send_text(message.chat.id, _("messages.user.banned", message))
@@ -125,11 +216,20 @@ class MessageRouter:
             )
         )
 
-    async def dispatch(self, result: Results, message: Message):
-        _ = self.translator.get()
+    async def _get_language(self, message: Message):
+        if self.user_service and message.chat.type == ChatType.PRIVATE:
+            language = await self.user_service.get_language(message.chat.id)
+            if language:
+                return language
+
+        return DEFAULT_LANGUAGE
 
+    async def dispatch(self, result: Results, message: Message):
         handler = self._handlers.get(type(result))
         if handler is None:
             return
 
-        await handler(result, message, _)
+        with tracing.span("dispatch", result=type(result).__name__):
+            _ = self.translator.get(await self._get_language(message))
+
+            await handler(result, message, _)
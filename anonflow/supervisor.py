@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+from contextlib import suppress
+from typing import List, Optional
+
+from aiogram import Bot
+
+from anonflow.bot.sharding import ShardRouter, poll_updates
+from anonflow.bot.webhook import run_ingress_webhook
+from anonflow.config import Config
+from anonflow.database import Database
+
+from . import paths
+
+
+def _run_worker(shard: int, shards: int, sock: socket.socket, startup_profile: bool):
+    from .app import Application
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    asyncio.run(
+        Application(shard=shard, shards=shards, startup_profile=startup_profile).run(sock=sock)
+    )
+
+
+class Supervisor:
+    def __init__(
+        self,
+        workers: int,
+        shutdown_grace: float = 10,
+        restart_delay: float = 1,
+        startup_profile: bool = False
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.workers = workers
+        self.startup_profile = startup_profile
+        self.shutdown_grace = shutdown_grace
+        self.restart_delay = restart_delay
+
+        self._shutdown_timeout = shutdown_grace
+
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.process.BaseProcess]] = [None] * workers
+        self._router = ShardRouter(workers)
+        self._stopping = False
+
+    async def _spawn(self, shard: int):
+        parent_sock, child_sock = socket.socketpair()
+
+        process = self._context.Process(
+            target=_run_worker,
+            args=(shard, self.workers, child_sock, self.startup_profile),
+            name=f"anonflow-worker-{shard}",
+            daemon=False
+        )
+        process.start()
+        child_sock.close()
+
+        self._processes[shard] = process
+        self._logger.info("Started worker %d (pid=%s).", shard, process.pid)
+
+        return await self._router.attach(shard, parent_sock)
+
+    async def _monitor(self):
+        while not self._stopping:
+            await asyncio.sleep(self.restart_delay)
+
+            for shard, process in enumerate(self._processes):
+                if self._stopping or process is None or process.is_alive():
+                    continue
+
+                self._logger.error(
+                    "Worker %d exited with code %s, restarting.", shard, process.exitcode
+                )
+                try:
+                    await self._spawn(shard)
+                except ConnectionError:
+                    self._logger.exception("Failed to restart worker %d.", shard)
+
+    def _forward(self, sig: signal.Signals):
+        for process in self._processes:
+            if process and process.is_alive() and process.pid:
+                os.kill(process.pid, sig)
+
+    async def _join(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._shutdown_timeout
+
+        for shard, process in enumerate(self._processes):
+            if process is None:
+                continue
+
+            while process.is_alive() and loop.time() < deadline:
+                await asyncio.sleep(0.1)
+
+            if process.is_alive():
+                self._logger.warning("Worker %d did not stop in time, terminating.", shard)
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+
+    async def run(self):
+        config_filepath = paths.CONFIG_FILEPATH
+        if not config_filepath.exists():
+            Config().save(config_filepath)
+            raise RuntimeError("Config file was just created. Please fill it out and restart the application.")
+
+        config = Config.load(config_filepath)
+        logging.basicConfig(
+            format=config.logging.fmt,
+            datefmt=config.logging.date_fmt,
+            level=config.logging.level,
+        )
+
+        self._shutdown_timeout = config.bot.concurrency.shutdown_timeout + self.shutdown_grace
+
+        bot_token = config.bot.token
+        if not bot_token:
+            raise ValueError("bot.token is required and cannot be empty")
+
+        database = Database(config.get_database_url())
+        await database.init()
+        await database.close()
+
+        bot = Bot(token=bot_token.get_secret_value())
+        loop = asyncio.get_running_loop()
+        stop_event = asyncio.Event()
+        monitor: Optional[asyncio.Task] = None
+
+        try:
+            ready = await asyncio.gather(*(self._spawn(shard) for shard in range(self.workers)))
+            allowed_updates = ready[0]
+            self._logger.info("Supervising %d workers.", self.workers)
+
+            if config.bot.mode == "webhook":
+                webhook = config.bot.webhook
+                if not webhook.url:
+                    raise ValueError("bot.webhook.url is required in webhook mode")
+
+                ingress = run_ingress_webhook(
+                    self._router.route,
+                    bot,
+                    url=str(webhook.url),
+                    path=webhook.path,
+                    host=webhook.host,
+                    port=webhook.port,
+                    secret_token=(
+                        webhook.secret_token.get_secret_value()
+                        if webhook.secret_token else None
+                    ),
+                    max_connections=webhook.max_connections,
+                    allowed_updates=allowed_updates,
+                    handle_signals=False
+                )
+            else:
+                await bot.delete_webhook()
+                ingress = poll_updates(bot, self._router.route, allowed_updates=allowed_updates)
+
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                with suppress(NotImplementedError):
+                    loop.add_signal_handler(sig, stop_event.set)
+            for sig in (signal.SIGHUP, signal.SIGUSR1):
+                with suppress(NotImplementedError, AttributeError):
+                    loop.add_signal_handler(sig, self._forward, sig)
+
+            monitor = asyncio.create_task(self._monitor())
+            ingress_task = asyncio.create_task(ingress)
+            stop_task = asyncio.create_task(stop_event.wait())
+
+            await asyncio.wait({ingress_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+            for task in (ingress_task, stop_task):
+                task.cancel()
+            results = await asyncio.gather(ingress_task, stop_task, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        finally:
+            self._logger.info("Shutting down workers...")
+            self._stopping = True
+            if monitor:
+                monitor.cancel()
+                await asyncio.gather(monitor, return_exceptions=True)
+
+            await self._router.close()
+            await self._join()
+            await bot.session.close()
@@ -0,0 +1,268 @@
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+
+MAX_SPANS = 256
+
+_tracer: Optional["Tracer"] = None
+_trace: ContextVar[Optional["Trace"]] = ContextVar("anonflow_trace", default=None)
+_parent: ContextVar[int] = ContextVar("anonflow_span", default=0)
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "attrs", "started_at", "start", "duration", "spans", "refs")
+
+    def __init__(self, trace_id: int, name: str, attrs: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.name = name
+        self.attrs = attrs
+
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+        # [parent, name, start offset, duration, attrs]; span id is the index + 1.
+        self.spans: List[List[Any]] = []
+        self.refs = 1
+
+    def to_dict(self):
+        return {
+            "trace_id": f"{self.trace_id:016x}",
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": _ms(self.duration),
+            "spans": [
+                {
+                    "id": span_id,
+                    "parent": parent,
+                    "name": name,
+                    "start_ms": _ms(start),
+                    "duration_ms": _ms(duration),
+                    "attrs": attrs
+                }
+                for span_id, (parent, name, start, duration, attrs) in enumerate(self.spans, 1)
+            ]
+        }
+
+
+class _Span:
+    __slots__ = ("_trace", "_record", "_token", "_start")
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self._trace = trace
+        self._record = [0, name, 0.0, None, attrs]
+
+    def set(self, **attrs: Any):
+        self._record[4].update(attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._record[0] = _parent.get()
+        self._record[2] = self._start - self._trace.start
+
+        self._trace.spans.append(self._record)
+        self._token = _parent.set(len(self._trace.spans))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._record[3] = time.perf_counter() - self._start
+        if exc_type is not None:
+            self._record[4]["error"] = exc_type.__name__
+        _parent.reset(self._token)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(
+        self,
+        export_filepath: Optional[Path] = None,
+        sample_rate: float = 0.01,
+        slow_threshold: float = 5,
+        report_size: int = 10
+    ):
+        self._logger = logging.getLogger(__name__)
+
+        self.export_filepath = export_filepath
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.report_size = report_size
+
+        self._ids = itertools.count(1)
+        self._slowest: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._file: Optional[IO[str]] = None
+
+    def start(self, name: str, **attrs: Any):
+        return Trace(next(self._ids), name, attrs)
+
+    def finish(self, trace: Trace):
+        trace.refs -= 1
+        if trace.refs > 0 or trace.duration is not None:
+            return
+
+        trace.duration = time.perf_counter() - trace.start
+        data = None
+
+        if self.report_size > 0 and (
+            len(self._slowest) < self.report_size or trace.duration > self._slowest[0][0]
+        ):
+            data = trace.to_dict()
+            entry = (trace.duration, trace.trace_id, data)
+            if len(self._slowest) < self.report_size:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heapreplace(self._slowest, entry)
+
+        if self.export_filepath and (
+            trace.duration >= self.slow_threshold or random.random() < self.sample_rate
+        ):
+            self._export(data or trace.to_dict())
+
+    def _export(self, data: Dict[str, Any]):
+        try:
+            if self._file is None:
+                self._file = self.export_filepath.open("a", encoding="utf-8") # type: ignore
+            self._file.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+        except OSError:
+            self._logger.exception("Failed to export trace to %s.", self.export_filepath)
+
+    def get_slowest(self):
+        return [data for _, _, data in sorted(self._slowest, reverse=True)]
+
+    def report(self):
+        return format_report(self.get_slowest())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def _ms(value: Optional[float]):
+    return None if value is None else round(value * 1000, 3)
+
+def get_tracer():
+    return _tracer
+
+def set_tracer(tracer: Optional[Tracer]):
+    global _tracer
+    _tracer = tracer
+
+def start(name: str, **attrs: Any):
+    if _tracer is None:
+        return None
+    return _tracer.start(name, **attrs)
+
+def finish(trace: Optional[Trace]):
+    if trace is not None and _tracer is not None:
+        _tracer.finish(trace)
+
+def retain():
+    trace = _trace.get()
+    if trace is None or trace.duration is not None:
+        return None
+
+    trace.refs += 1
+    return trace
+
+release = finish
+
+def detach():
+    _trace.set(None)
+    _parent.set(0)
+
+@contextmanager
+def activate(trace: Optional[Trace]):
+    if trace is None:
+        yield
+        return
+
+    trace_token = _trace.set(trace)
+    parent_token = _parent.set(0)
+    try:
+        yield
+    finally:
+        _parent.reset(parent_token)
+        _trace.reset(trace_token)
+
+def span(name: str, **attrs: Any):
+    trace = _trace.get()
+    if trace is None or trace.duration is not None or len(trace.spans) >= MAX_SPANS:
+        return _NOOP_SPAN
+    return _Span(trace, name, attrs)
+
+
+def _format_attrs(attrs: Dict[str, Any]):
+    return " ".join(f"{key}={value}" for key, value in attrs.items())
+
+def format_report(traces: Iterable[Dict[str, Any]]):
+    traces = list(traces)
+    if not traces:
+        return "No traces recorded."
+
+    lines = [f"Slowest {len(traces)} update(s):"]
+    for rank, trace in enumerate(traces, 1):
+        lines.append(
+            f"#{rank} {trace['name']} {_format_attrs(trace['attrs'])} "
+            f"{trace['duration_ms']:.1f} ms (trace {trace['trace_id']})"
+        )
+
+        depths = {0: 0}
+        for span_data in trace["spans"]:
+            depth = depths.get(span_data["parent"], 0) + 1
+            depths[span_data["id"]] = depth
+
+            duration = span_data["duration_ms"]
+            label = f"{'  ' * depth}{span_data['name']}"
+            lines.append(
+                f"  {label:<48} "
+                f"{'unfinished' if duration is None else f'{duration:.1f} ms':>12} "
+                f"@{span_data['start_ms']:.1f} ms  {_format_attrs(span_data['attrs'])}".rstrip()
+            )
+
+    return "\n".join(lines)
+
+def load(filepath: Path) -> List[Dict[str, Any]]:
+    with filepath.open(encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m anonflow.tracing",
+        description="Show the slowest updates recorded in exported traces."
+    )
+    parser.add_argument("filepath", type=Path, help="Exported traces (JSONL).")
+    parser.add_argument("--top", type=int, default=10, help="Number of updates to show.")
+    args = parser.parse_args()
+
+    traces = sorted(load(args.filepath), key=lambda trace: trace["duration_ms"] or 0, reverse=True)
+    print(format_report(traces[:args.top]))
+
+
+if __name__ == "__main__":
+    main()
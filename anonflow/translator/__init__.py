@@ -1,3 +1,3 @@
-from .translator import Translator
+from .translator import DEFAULT_LANGUAGE, Translator
 
-__all__ = ["Translator"]
+__all__ = ["DEFAULT_LANGUAGE", "Translator"]
@@ -1,75 +1,210 @@
+import asyncio
 import gettext
-from collections import defaultdict
+import logging
 from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import Literal, Optional
+from string import Formatter
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from aiogram import Bot
 from aiogram.types import Message
 
 from anonflow import __version_str__
 
+DEFAULT_LANGUAGE = "ru"
+
+
+MESSAGE_FIELDS: Dict[str, Callable[[Message], Any]] = {
+    "chat_id": attrgetter("chat.id"),
+    "user_id": attrgetter("from_user.id"),
+    "first_name": attrgetter("from_user.first_name"),
+    "last_name": attrgetter("from_user.last_name"),
+    "full_name": attrgetter("from_user.full_name"),
+    "username": attrgetter("from_user.username")
+}
+BOT_FIELDS: Dict[str, Callable[[Any], Any]] = {
+    "bot_first_name": attrgetter("first_name"),
+    "bot_last_name": attrgetter("last_name"),
+    "bot_username": attrgetter("username"),
+    "bot_version": lambda bot: __version_str__
+}
+
+
+class Template:
+    def __init__(self, s: str):
+        self.source = s
+
+        self._parts = [
+            (literal, field_name, format_spec, conversion)
+            for literal, field_name, format_spec, conversion in Formatter().parse(s)
+        ]
+
+        self.fields = tuple(dict.fromkeys(
+            field_name
+            for _, field_name, _, _ in self._parts
+            if field_name is not None
+        ))
+        self.getters = tuple(
+            (
+                field_name,
+                MESSAGE_FIELDS.get(field_name) or BOT_FIELDS.get(field_name),
+                field_name in BOT_FIELDS
+            )
+            for field_name in self.fields
+        )
+        self._is_simple = all(
+            field_name.isidentifier() and "{" not in (format_spec or "")
+            for _, field_name, format_spec, _ in self._parts
+            if field_name is not None
+        )
+
+    def render(self, context: Dict[str, Any]):
+        if not self.fields:
+            return self.source
+        if not self._is_simple:
+            return self.source.format_map(_DefaultContext(context))
+
+        chunks = []
+        for literal, field_name, format_spec, conversion in self._parts:
+            chunks.append(literal)
+            if field_name is None:
+                continue
+
+            value = context[field_name]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            chunks.append(format(value, format_spec) if format_spec else str(value))
+
+        return "".join(chunks)
+
+
+class _DefaultContext(dict):
+    def __missing__(self, key):
+        return ""
+
 
 class Translator:
-    def __init__(self, translations_dir: Path):
+    def __init__(self, translations_dir: Path, reload_interval: float = 5):
+        self._logger = logging.getLogger(__name__)
+
         self.translations_dir = translations_dir
+        self.reload_interval = reload_interval
 
         self.bot = None
 
-    @staticmethod
-    @lru_cache
-    def _get_translator(lang: str, translations_dir: Path):
-        translator = gettext.translation(
-            "messages",
-            translations_dir,
-            languages=[lang],
-            fallback=True
+        self._catalogs: Dict[str, gettext.NullTranslations] = {}
+        self._templates: Dict[Tuple[str, str], Template] = {}
+        self._translators: Dict[str, Callable[..., str]] = {}
+
+        self._mtime = self._get_mtime()
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_mtime(self):
+        if not self.translations_dir.exists():
+            return 0
+
+        return max(
+            (
+                filepath.stat().st_mtime
+                for pattern in ("*.mo", "*.po")
+                for filepath in self.translations_dir.rglob(pattern)
+            ),
+            default=0
         )
-        return translator
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+
+            # Walking the translations directory is blocking, so it stays off the event loop.
+            mtime = await asyncio.to_thread(self._get_mtime)
+            if mtime != self._mtime:
+                self._mtime = mtime
+                self.reload()
+                self._logger.info("Translations reloaded.")
+
+    def _get_catalog(self, lang: str):
+        catalog = self._catalogs.get(lang)
+        if catalog is None:
+            catalog = gettext.NullTranslations()
+            for language in reversed(dict.fromkeys((lang, DEFAULT_LANGUAGE))):
+                mofile = gettext.find("messages", self.translations_dir, languages=[language])
+                if mofile:
+                    with open(mofile, "rb") as fp:
+                        translations = gettext.GNUTranslations(fp)
+                    translations.add_fallback(catalog)
+                    catalog = translations
+
+            self._catalogs[lang] = catalog
+
+        return catalog
+
+    def _get_template(self, lang: str, msgid: str):
+        key = (lang, msgid)
+
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = Template(self._get_catalog(lang).gettext(msgid))
+
+        return template
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _compile(s: str):
+        return Template(s)
+
+    def _render(self, template: Template, message: Optional[Message], extra: Dict[str, Any]):
+        if not template.fields:
+            return template.source
+
+        if not isinstance(message, Message):
+            message = None
+        bot = self.bot if message else None
+
+        context = {}
+        for field_name, getter, is_bot_field in template.getters:
+            if field_name in extra:
+                context[field_name] = extra[field_name]
+                continue
+
+            target = bot if is_bot_field else message
+            try:
+                context[field_name] = getter(target) if getter and target is not None else ""
+            except AttributeError:
+                context[field_name] = ""
+
+        return template.render(context)
 
     def format(self, s: str, message: Optional[Message], **extra):
-        bot = self.bot
-
-        msg_context = {}
-        if isinstance(message, Message):
-            user = message.from_user
-            chat = message.chat
-
-            first_name = getattr(user, "first_name", "")
-            last_name = getattr(user, "last_name", "")
-
-            msg_context = {
-                "chat_id": getattr(chat, "id", ""),
-                "user_id": getattr(user, "id", ""),
-                "first_name": first_name,
-                "last_name": last_name,
-                "full_name": " ".join(filter(None, (first_name, last_name))),
-                "username": getattr(user, "username", ""),
-                "bot_first_name": getattr(bot, "first_name", ""),
-                "bot_last_name": getattr(bot, "last_name", ""),
-                "bot_username": getattr(bot, "username", ""),
-                "bot_version": __version_str__
-            }
-
-        return s.format_map(
-            defaultdict(
-                str,
-                msg_context | extra
-            )
-        )
+        return self._render(self._compile(s), message, extra)
 
-    def get(self, lang: Literal["ru"] = "ru"):
-        translator = self._get_translator(lang, self.translations_dir)
+    def get(self, lang: str = DEFAULT_LANGUAGE):
+        translator = self._translators.get(lang)
+        if translator is None:
+            def _(msgid: str, message: Optional[Message] = None, **extra):
+                return self._render(self._get_template(lang, msgid), message, extra)
 
-        def _(msgid: str, message: Optional[Message] = None, **extra):
-            return self.format(
-                translator.gettext(msgid),
-                message=message,
-                **extra
-            )
+            translator = self._translators[lang] = _
+
+        return translator
 
-        return _
+    def reload(self):
+        self._catalogs.clear()
+        self._templates.clear()
 
     async def init(self, bot: Optional[Bot]):
         if bot:
             self.bot = await bot.get_me()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
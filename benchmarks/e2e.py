@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import itertools
+import random
+import statistics
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from anonflow import tracing
+from anonflow.app import Application
+from anonflow.bot.routers import MediaRouter
+from anonflow.config import Config
+from anonflow.constants import SYSTEM_USER_ID
+from anonflow.database import BanRepository
+
+from .fake_openai import add_arguments, from_arguments
+from .stub_session import StubSession
+
+MODERATION_CHAT_ID = -1001
+PUBLICATION_CHANNEL_ID = -1002
+
+UPDATE_KINDS = ("text", "photo", "album", "start", "banned")
+TEXTS = (
+    "Ищу попутчиков на концерт в субботу, пишите в комментариях.",
+    "Кто-нибудь знает, работает ли столовая в главном корпусе на каникулах?",
+    "Потерялся чёрный рюкзак возле библиотеки, внутри конспекты по матанализу.",
+    "Lost keys near the gym yesterday evening, blue keychain.",
+    "Продам велосипед, почти новый, торг уместен."
+)
+
+
+class LatencyTracer(tracing.Tracer):
+    def __init__(self, report_size: int = 0):
+        super().__init__(report_size=report_size)
+
+        self.latencies: Dict[int, float] = {}
+
+    def finish(self, trace: tracing.Trace):
+        super().finish(trace)
+        if trace.refs == 0 and trace.duration is not None:
+            self.latencies[trace.attrs["update_id"]] = trace.duration
+
+
+class UpdateFactory:
+    def __init__(self, users: int, banned_users: int, album_size: Tuple[int, int]):
+        self.users = users
+        self.banned_users = banned_users
+        self.album_size = album_size
+
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._new_users = itertools.count(users + banned_users + 1)
+        self._media_groups = itertools.count(1)
+
+    def _message(self, user_id: int, **fields):
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "User", "language_code": "ru"},
+                **fields
+            }
+        }
+
+    def _photo(self):
+        file_id = f"photo-{next(self._file_ids):012d}"
+        return [
+            {"file_id": f"{file_id}-{size}", "file_unique_id": f"{file_id}-{size}", "width": size, "height": size}
+            for size in (90, 320, 1280)
+        ]
+
+    def build(self, kind: str) -> List[Dict[str, Any]]:
+        user_id = random.randint(1, self.users)
+
+        if kind == "text":
+            return [self._message(user_id, text=random.choice(TEXTS))]
+        elif kind == "photo":
+            return [self._message(user_id, photo=self._photo(), caption=random.choice(TEXTS))]
+        elif kind == "album":
+            media_group_id = str(next(self._media_groups))
+            return [
+                self._message(
+                    user_id,
+                    photo=self._photo(),
+                    media_group_id=media_group_id,
+                    **({"caption": random.choice(TEXTS)} if index == 0 else {})
+                )
+                for index in range(random.randint(*self.album_size))
+            ]
+        elif kind == "start":
+            return [self._message(next(self._new_users), text="/start")]
+        elif kind == "banned":
+            return [self._message(self.users + random.randint(1, self.banned_users), text=random.choice(TEXTS))]
+
+        raise ValueError(f"Unknown update kind {kind!r}.")
+
+
+def parse_mix(value: str):
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in UPDATE_KINDS:
+            raise argparse.ArgumentTypeError(f"Unknown update kind {kind!r}.")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+def percentile(values: List[float], q: int):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+def add_stack_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--openai-port", type=int, default=8090)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-waiting", type=int, default=1024)
+    parser.add_argument("--throttling-delay", type=float, default=0)
+    parser.add_argument("--media-group-window", type=float, default=0.5)
+    parser.add_argument("--rate-limit", action="store_true", help="Enable the delivery rate limiter.")
+    parser.add_argument("--outbox", action="store_true", help="Deliver through the persistent outbox.")
+    parser.add_argument("--report", type=int, default=0, help="Print the span breakdown of the N slowest updates.")
+
+def build_config(
+    args,
+    database_path: Path,
+    openai_url: Optional[str],
+    moderation_chat_ids: Sequence[int] = (MODERATION_CHAT_ID,),
+    publication_channel_ids: Sequence[int] = (PUBLICATION_CHANNEL_ID,)
+):
+    return Config.model_validate({
+        "bot": {
+            "token": "42:TEST",
+            "concurrency": {"limit": args.concurrency, "max_waiting": args.max_waiting}
+        },
+        "behavior": {
+            "throttling": {"enabled": args.throttling_delay > 0, "delay": args.throttling_delay},
+            "subscription_requirement": {"enabled": False},
+            "media_groups": {"window": args.media_group_window, "adaptive": False}
+        },
+        "database": {"name_or_path": str(database_path)},
+        "delivery": {
+            "rate_limit": {"enabled": args.rate_limit},
+            "outbox": {"enabled": args.outbox}
+        },
+        "forwarding": {
+            "moderation_chat_ids": list(moderation_chat_ids),
+            "publication_channel_ids": list(publication_channel_ids)
+        },
+        "openai": {"api_key": "sk-benchmark", "base_url": openai_url, "max_retries": 2},
+        "moderation": {"enabled": openai_url is not None},
+        "logging": {"level": "ERROR"},
+        "tracing": {"enabled": True, "report_size": 0},
+        "profiling": {"sampling": False}
+    })
+
+@asynccontextmanager
+async def run_stack(config: Config, session: StubSession) -> AsyncIterator[Application]:
+    app = Application(config=config, session=session)
+    await app.init()
+    app._init_routers()
+
+    try:
+        yield app
+    finally:
+        for router in app.routers:
+            if isinstance(router, MediaRouter):
+                await router.close()
+        await app.delivery_service.close() # type: ignore
+        await app.database.close() # type: ignore
+        await app.moderation_planner.close() # type: ignore
+        await app.bot.session.close() # type: ignore
+        tracing.set_tracer(None)
+
+async def dispatch(app: Application, updates: Iterable[Tuple[float, Dict[str, Any]]]):
+    bot, dispatcher, concurrency = app.bot, app.dispatcher, app.concurrency
+    assert bot and dispatcher and concurrency
+
+    # Each update is fed `offset` seconds after the start; 0 feeds it immediately.
+    start_time = time.perf_counter()
+    tasks = []
+    for offset, update in updates:
+        delay = start_time + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(await concurrency.spawn(dispatcher.feed_raw_update(bot, update)))
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+    while not await concurrency.wait_idle(1):
+        pass
+
+    return time.perf_counter() - start_time
+
+def print_results(
+    elapsed_time: float,
+    update_kinds: Dict[int, str],
+    kinds: Iterable[str],
+    tracer: LatencyTracer,
+    session: StubSession,
+    report: int = 0
+):
+    total = len(update_kinds)
+    calls = sum(session.calls.values())
+    print(
+        f"updates={total} time={elapsed_time:.3f}s "
+        f"throughput={total / elapsed_time:.1f} upd/s api_calls={calls} "
+        f"api_calls_per_update={calls / max(total, 1):.2f}"
+    )
+
+    print(f"{'kind':>8} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for kind in ("all", *kinds):
+        values = [
+            latency for update_id, latency in tracer.latencies.items()
+            if kind == "all" or update_kinds.get(update_id) == kind
+        ]
+        if values:
+            print(
+                f"{kind:>8} {len(values):>6} "
+                + " ".join(f"{percentile(values, q) * 1000:>7.1f}ms" for q in (50, 95, 99))
+                + f" {max(values) * 1000:>7.1f}ms"
+            )
+
+    print("api calls: " + ", ".join(f"{name}={count}" for name, count in session.calls.most_common()))
+    if report:
+        print(tracer.report())
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Feed synthetic updates through the full bot stack.")
+    parser.add_argument("--updates", type=int, default=2000, help="Number of logical posts (an album counts once).")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--banned-users", type=int, default=20)
+    parser.add_argument("--mix", type=parse_mix, default="text=60,photo=15,album=10,start=10,banned=5")
+    parser.add_argument("--album-size", type=int, nargs=2, default=(2, 6))
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Bot API latency in seconds.")
+    parser.add_argument("--api-jitter", type=float, default=0.02)
+    parser.add_argument("--moderation", choices=("off", "fake"), default="off")
+    parser.add_argument("--seed", type=int, default=None)
+    add_stack_arguments(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    openai_server = None
+    openai_url = None
+    if args.moderation == "fake":
+        openai_server = from_arguments(args)
+        openai_url = await openai_server.start(port=args.openai_port)
+
+    session = StubSession(latency=args.api_latency, jitter=args.api_jitter)
+
+    factory = UpdateFactory(args.users, args.banned_users, tuple(args.album_size)) # type: ignore
+    kinds = random.choices(list(args.mix), weights=list(args.mix.values()), k=args.updates)
+    batches = [(kind, factory.build(kind)) for kind in kinds]
+    update_kinds = {update["update_id"]: kind for kind, updates in batches for update in updates}
+
+    tracer = LatencyTracer(report_size=args.report)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            config = build_config(args, Path(directory) / "bench.db", openai_url)
+            async with run_stack(config, session) as app:
+                assert app.database and app.user_service and app.delivery_service
+
+                for user_id in range(1, args.users + args.banned_users + 1):
+                    await app.user_service.add(user_id)
+                async with app.database.begin_session() as db_session:
+                    for user_id in range(args.users + 1, args.users + args.banned_users + 1):
+                        await BanRepository().ban(db_session, SYSTEM_USER_ID, user_id)
+
+                tracing.set_tracer(tracer)
+                await app.delivery_service.start()
+                session.calls.clear()
+
+                elapsed_time = await dispatch(app, ((0, update) for _, updates in batches for update in updates))
+    finally:
+        if openai_server:
+            await openai_server.close()
+
+    print(f"posts={args.updates}")
+    print_results(elapsed_time, update_kinds, UPDATE_KINDS, tracer, session, args.report)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+class FakeBotAPI:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        retry_after_rate: float = 0,
+        retry_after: int = 1,
+        error_rate: float = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+
+        self.calls: Dict[str, int] = {}
+        self.sent: List[Dict[str, Any]] = []
+        self.updates: List[Dict[str, Any]] = []
+
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    def _message(self, chat_id: Any, **fields):
+        chat_id = int(chat_id)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            **fields
+        }
+
+    def _result(self, method: str, params: Dict[str, Any]):
+        chat_id = params.get("chat_id", 0)
+
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "anonflow", "username": "anonflow_bot"}
+        elif method == "getUpdates":
+            offset = int(params.get("offset") or 0)
+            limit = int(params.get("limit") or 100)
+            updates = [update for update in self.updates if update["update_id"] >= offset][:limit]
+            self.updates = [update for update in self.updates if update["update_id"] >= offset]
+            return updates
+        elif method in ("setWebhook", "deleteWebhook"):
+            return True
+        elif method == "sendMediaGroup":
+            return [self._message(chat_id, photo=[]) for _ in range(2)]
+        elif method == "editMessageText":
+            return self._message(chat_id, text=params.get("text", ""))
+        elif method.startswith("send"):
+            self.sent.append({"method": method, **params})
+            return self._message(chat_id, text=params.get("text", ""))
+
+        return True
+
+    async def _handle(self, request: web.Request):
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+        params: Dict[str, Any] = dict(request.query)
+        if request.can_read_body:
+            if request.content_type == "application/json":
+                params.update(await request.json())
+            else:
+                params.update(await request.post())
+
+        if method != "getUpdates":
+            await asyncio.sleep(max(0, random.gauss(self.latency, self.jitter)))
+
+        if method.startswith("send") and random.random() < self.retry_after_rate:
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after}
+                },
+                status=429
+            )
+        if method.startswith("send") and random.random() < self.error_rate:
+            return web.json_response(
+                {"ok": False, "error_code": 500, "description": "Internal Server Error"},
+                status=500
+            )
+
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local fake Telegram Bot API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--retry-after-rate", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    server = FakeBotAPI(
+        latency=args.latency,
+        retry_after_rate=args.retry_after_rate,
+        error_rate=args.error_rate
+    )
+    print(f"Listening on {await server.start(args.host, args.port)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
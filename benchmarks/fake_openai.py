@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+LATENCY_DISTRIBUTIONS = ("fixed", "normal", "lognormal", "exponential")
+
+
+class FakeOpenAI:
+    def __init__(
+        self,
+        latency: float = 0.3,
+        jitter: float = 0.1,
+        distribution: str = "lognormal",
+        rate_limit_rate: float = 0,
+        error_rate: float = 0,
+        malformed_rate: float = 0,
+        flagged_rate: float = 0,
+        reject_rate: float = 0,
+        retry_after: float = 0.05,
+        stream_interval: float = 0.01,
+        stream_chunk_size: int = 8,
+        input_token_latency: float = 0,
+        spike_start: float = 0,
+        spike_duration: float = 0,
+        spike_latency: float = 0,
+        slow_rate: float = 0,
+        slow_latency: float = 0
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}.")
+
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.flagged_rate = flagged_rate
+        self.reject_rate = reject_rate
+        self.retry_after = retry_after
+        self.stream_interval = stream_interval
+        self.stream_chunk_size = stream_chunk_size
+        self.input_token_latency = input_token_latency
+        # GPT responses take `spike_latency` during [spike_start, spike_start + spike_duration) after reset().
+        self.spike_start = spike_start
+        self.spike_duration = spike_duration
+        self.spike_latency = spike_latency
+        # Occasional very slow responses, drawn independently for every request.
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+
+        self.calls: Dict[str, int] = {}
+        self.rate_limited = 0
+        self.errors = 0
+        self.malformed = 0
+        self.input_tokens = 0
+
+        self._started = time.monotonic()
+        self._ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    def get_latency(self):
+        if self.distribution == "fixed" or self.latency <= 0:
+            return max(0, self.latency)
+        elif self.distribution == "normal":
+            return max(0, random.gauss(self.latency, self.jitter))
+        elif self.distribution == "exponential":
+            return random.expovariate(1 / self.latency)
+
+        # Lognormal with the given mean and standard deviation: a long right tail like real APIs.
+        variance = self.jitter ** 2
+        sigma2 = max(1e-9, math.log(1 + variance / self.latency ** 2))
+        mu = math.log(self.latency) - sigma2 / 2
+        return random.lognormvariate(mu, sigma2 ** 0.5)
+
+    def reset(self):
+        self.calls.clear()
+        self.rate_limited = self.errors = self.malformed = self.input_tokens = 0
+        self._started = time.monotonic()
+
+    def _error(self, status: int, message: str, error_type: str, code: Optional[str] = None):
+        return web.json_response(
+            {"error": {"message": message, "type": error_type, "param": None, "code": code}},
+            status=status,
+            headers={"retry-after-ms": str(int(self.retry_after * 1000))}
+        )
+
+    def _moderation(self, body: Dict[str, Any]):
+        inputs = body.get("input")
+        count = len(inputs) if isinstance(inputs, list) and inputs and isinstance(inputs[0], str) else 1
+        return {
+            "id": f"modr-{next(self._ids)}",
+            "model": body.get("model", "omni-moderation-latest"),
+            "results": [
+                {
+                    "flagged": random.random() < self.flagged_rate,
+                    "categories": {},
+                    "category_scores": {},
+                    "category_applied_input_types": {}
+                }
+                for _ in range(count)
+            ]
+        }
+
+    def _decision(self, structured: bool = False):
+        rejected = random.random() < self.reject_rate
+        calls = [{
+            "name": "moderation_decision",
+            "args": {
+                "status": "reject" if rejected else "approve",
+                "reason": "Synthetic rejection." if rejected else "Synthetic approval.",
+                "severity": "medium" if rejected else None
+            }
+        }]
+
+        # Schema-constrained output always matches the schema.
+        if structured:
+            return json.dumps({"calls": calls})
+
+        if random.random() < self.malformed_rate:
+            self.malformed += 1
+            return random.choice((
+                'Sure! Here is the decision: [{"name": "moderation_decision"',
+                json.dumps(calls[0]),
+                f"```json\n{json.dumps(calls)}\n```",
+                f"Here is the decision:\n{json.dumps(calls)}\nLet me know if you need anything else.",
+                json.dumps(calls)[:-1] + ",]"
+            ))
+
+        return json.dumps(calls)
+
+    def _response(self, body: Dict[str, Any]):
+        text_format = (body.get("text") or {}).get("format") or {}
+        text = self._decision(structured=text_format.get("type") == "json_schema")
+        input_tokens = len(json.dumps(body.get("input", ""), ensure_ascii=False)) // 4
+        output_tokens = max(1, len(text) // 4)
+        self.input_tokens += input_tokens
+        response_id = next(self._ids)
+
+        return {
+            "id": f"resp_{response_id}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "gpt-5-mini"),
+            "output": [
+                {
+                    "type": "message",
+                    "id": f"msg_{response_id}",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": text, "annotations": []}]
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens
+            }
+        }
+
+    async def _handle(self, request: web.Request):
+        endpoint = request.match_info["endpoint"]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+        try:
+            body = await request.json() if request.can_read_body else {}
+        except ConnectionResetError:
+            # The client gave up on the request, e.g. a cancelled hedged request.
+            return web.Response(status=499)
+
+        latency = self.get_latency()
+        if endpoint == "responses" and 0 <= time.monotonic() - self._started - self.spike_start < self.spike_duration:
+            latency = self.spike_latency * random.uniform(0.8, 1.2)
+        elif random.random() < self.slow_rate:
+            latency = self.slow_latency * random.uniform(0.8, 1.2)
+        await asyncio.sleep(latency)
+
+        if random.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            return self._error(429, "Rate limit reached.", "requests", "rate_limit_exceeded")
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return self._error(500, "The server had an error while processing your request.", "server_error")
+
+        if endpoint == "moderations":
+            return web.json_response(self._moderation(body))
+        elif endpoint == "responses":
+            response = self._response(body)
+            # Prompt processing time grows with the prompt.
+            await asyncio.sleep(response["usage"]["input_tokens"] / 1000 * self.input_token_latency)
+            if body.get("stream"):
+                return await self._stream(request, response)
+
+            # Without streaming the whole text is generated before anything is sent.
+            text = response["output"][0]["content"][0]["text"]
+            await asyncio.sleep(math.ceil(len(text) / self.stream_chunk_size) * self.stream_interval)
+            return web.json_response(response)
+
+        return self._error(404, f"Unknown endpoint {endpoint!r}.", "invalid_request_error")
+
+    async def _stream(self, request: web.Request, response: Dict[str, Any]):
+        stream = web.StreamResponse(headers={"content-type": "text/event-stream"})
+
+        sequence_numbers = itertools.count()
+        message = response["output"][0]
+        text = message["content"][0]["text"]
+
+        async def send(event_type: str, **data):
+            event = {"type": event_type, "sequence_number": next(sequence_numbers), **data}
+            await stream.write(f"event: {event_type}\ndata: {json.dumps(event)}\n\n".encode())
+
+        try:
+            await stream.prepare(request)
+            await send("response.created", response={**response, "status": "in_progress", "output": []})
+            for start in range(0, len(text), self.stream_chunk_size):
+                await asyncio.sleep(self.stream_interval)
+                await send(
+                    "response.output_text.delta",
+                    item_id=message["id"],
+                    output_index=0,
+                    content_index=0,
+                    delta=text[start:start + self.stream_chunk_size],
+                    logprobs=[]
+                )
+            await send("response.output_text.done", item_id=message["id"], output_index=0, content_index=0, text=text, logprobs=[])
+            await send("response.completed", response=response)
+            await stream.write_eof()
+        except ConnectionResetError:
+            # The client stopped reading early or gave up on the request.
+            pass
+
+        return stream
+
+    async def _handle_head(self, request: web.Request):
+        return web.Response()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8090):
+        app = web.Application()
+        app.router.add_post("/v1/{endpoint}", self._handle)
+        app.router.add_route("HEAD", "/v1/", self._handle_head)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+        return f"http://{host}:{port}/v1/"
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.3, help="Mean response latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Latency standard deviation in seconds.")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Share of requests answered with 429.")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of requests answered with 500.")
+    parser.add_argument("--malformed-rate", type=float, default=0, help="Share of GPT outputs that are not valid JSON arrays.")
+    parser.add_argument("--flagged-rate", type=float, default=0, help="Share of omni results that are flagged.")
+    parser.add_argument("--reject-rate", type=float, default=0, help="Share of GPT decisions that reject.")
+    parser.add_argument("--stream-interval", type=float, default=0.01, help="Delay between streamed text chunks.")
+    parser.add_argument("--input-token-latency", type=float, default=0, help="Extra latency per 1000 prompt tokens.")
+    parser.add_argument("--spike-start", type=float, default=0, help="Seconds into the run when GPT latency spikes.")
+    parser.add_argument("--spike-duration", type=float, default=0, help="Length of the GPT latency spike in seconds.")
+    parser.add_argument("--spike-latency", type=float, default=0, help="GPT latency during the spike.")
+    parser.add_argument("--slow-rate", type=float, default=0, help="Share of requests answered after --slow-latency.")
+    parser.add_argument("--slow-latency", type=float, default=0, help="Latency of the slow requests in seconds.")
+
+def from_arguments(args: argparse.Namespace):
+    return FakeOpenAI(
+        latency=args.latency,
+        jitter=args.jitter,
+        distribution=args.distribution,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate,
+        flagged_rate=args.flagged_rate,
+        reject_rate=args.reject_rate,
+        stream_interval=args.stream_interval,
+        input_token_latency=args.input_token_latency,
+        spike_start=args.spike_start,
+        spike_duration=args.spike_duration,
+        spike_latency=args.spike_latency,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local fake OpenAI API server (moderations and responses).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = from_arguments(args)
+    print(f"Listening on {await server.start(args.host, args.port)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram.types import Chat, Message, PhotoSize, User, Video
+
+from anonflow import paths
+from anonflow.bot.routers import MediaRouter
+from anonflow.moderation import ModerationExecutor, ModerationPlanner, RuleManager
+from anonflow.services import MessageRouter
+from anonflow.services.transport.results import (
+    ModerationDecisionResult,
+    ModerationStartedResult,
+    UserThrottledResult
+)
+from anonflow.translator import Translator
+
+from .moderation import RULES
+from .translator import POCatalog
+
+BASELINE_FILEPATH = Path(__file__).resolve().parent / "micro_baseline.json"
+
+TEXT = "Продам велосипед, почти новый, торг уместен. Пишите в личку, отвечу всем. " * 4
+IMAGE = "/9j/" + "A" * 64 * 1024
+
+# A case is either a callable timed with timeit or a coroutine function run `number` times in one loop iteration.
+Case = Tuple[Callable[[], Any], bool]
+
+
+class StubDeliveryService:
+    # Returns a prebuilt message so that the cases measure the router, not pydantic.
+    def __init__(self):
+        self._message = Message(message_id=1, date=datetime.now(), chat=Chat(id=42, type="private"), text="")
+
+    async def send_text(self, chat_id, text, **kwargs):
+        return self._message
+
+    async def edit_text(self, chat_id, message_id, text, **kwargs):
+        return True
+
+    async def fan_out(self, chat_ids, content, **kwargs):
+        for _ in chat_ids:
+            pass
+
+
+def build_message(**fields):
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=42, type="private"),
+        from_user=User(id=42, is_bot=False, first_name="Ivan", last_name="Ivanov", username="ivan"),
+        **fields
+    )
+
+def build_photo(index: int):
+    return [
+        PhotoSize(file_id=f"photo-{index}-{size}", file_unique_id=f"photo-{index}-{size}", width=size, height=size)
+        for size in (90, 320, 1280)
+    ]
+
+def calibrate(number: int = 200_000):
+    # A fixed pure-Python workload; cases are compared relative to it so that
+    # a baseline recorded on one machine stays meaningful on another.
+    def workload():
+        total = 0
+        for index in range(100):
+            total += index * index
+        return total
+
+    return min(timeit.repeat(workload, number=number // 100, repeat=5)) / (number // 100)
+
+def build_cases(rules_dir: Path) -> Dict[str, Case]:
+    translator = Translator(translations_dir=paths.TRANSLATIONS_DIR)
+    translator.bot = User(id=1, is_bot=True, first_name="anonflow", username="anonflow_bot") # type: ignore
+    translator._catalogs["ru"] = POCatalog(paths.TRANSLATIONS_DIR / "ru" / "LC_MESSAGES" / "messages.po")
+    _ = translator.get("ru")
+
+    rule_manager = RuleManager(rules_dir=rules_dir)
+
+    (rules_dir / "selected").mkdir()
+    (rules_dir / "selected" / "rules.md").write_text(RULES, encoding="utf-8")
+    selected_rule_manager = RuleManager(rules_dir=rules_dir / "selected", top_k=3)
+    selected_rule_manager.reload()
+    planner = ModerationPlanner(
+        api_key=None,
+        gpt_model="gpt-5-mini",
+        backends=frozenset(["omni", "gpt"]),
+        rule_manager=rule_manager
+    )
+    executor = ModerationExecutor(planner=planner)
+
+    message_router = MessageRouter(
+        moderation_chat_ids=(-1001,),
+        publication_channel_ids=(-1002,),
+        delivery_service=StubDeliveryService(), # type: ignore
+        translator=translator
+    )
+    media_router = MediaRouter(
+        message_router,
+        forwarding_types=frozenset(["text", "photo", "video"]),
+        moderation_executor=executor
+    )
+
+    message = build_message(text=TEXT)
+    photo = build_message(photo=build_photo(0), caption=TEXT)
+    video = build_message(video=Video(file_id="video", file_unique_id="video", width=1280, height=720, duration=10))
+    album = [build_message(photo=build_photo(index)) for index in range(10)]
+    decision = ModerationDecisionResult(is_approved=False, reason="Spam.", severity="high")
+
+    async def process():
+        async for _ in executor.process(TEXT):
+            pass
+
+    return {
+        "translator.format": (
+            lambda: translator.format("Hi {first_name} ({user_id}), posts by @{bot_username}: {explanation}", message, explanation="Spam."),
+            False
+        ),
+        "translator.get.static": (lambda: _("messages.user.moderation_started", message), False),
+        "translator.get.context": (lambda: _("messages.user.command_info", message), False),
+        "message_router.dispatch.started": (lambda: message_router.dispatch(ModerationStartedResult(), message), True),
+        "message_router.dispatch.throttled": (
+            lambda: message_router.dispatch(UserThrottledResult(remaining_time=42), message), True
+        ),
+        "message_router.dispatch.decision": (lambda: message_router.dispatch(decision, message), True),
+        "planner.build_content.text": (lambda: planner._build_content(TEXT), False),
+        "planner.build_content.image": (lambda: planner._build_content(TEXT, IMAGE), False),
+        "planner.build_functions_prompt": (lambda: planner._build_functions_prompt(planner._functions), False),
+        "executor.process": (process, True),
+        "rule_manager.get_rules.top_k": (lambda: selected_rule_manager.get_rules(TEXT), False),
+        "media_router.get_media.photo": (lambda: media_router._get_media(photo), False),
+        "media_router.get_media.video": (lambda: media_router._get_media(video), False),
+        "media_router.can_send_media.album": (lambda: media_router._can_send_media(album), False)
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int, min_time: float):
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+async def measure_async(func: Callable[[], Awaitable[Any]], repeat: int, min_time: float):
+    async def run(number: int):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start_time
+
+    number = 1
+    while await run(number) < min_time:
+        number *= 2
+    return min([await run(number) for _ in range(repeat)]) / number
+
+async def run_cases(cases: Dict[str, Case], repeat: int, min_time: float):
+    results = {}
+    for name, (func, is_async) in cases.items():
+        if is_async:
+            results[name] = await measure_async(func, repeat, min_time)
+        else:
+            results[name] = measure(func, repeat, min_time)
+    return results
+
+def is_regression(seconds: float, calibration: float, expected: float, threshold: float, floor: float):
+    # Sub-microsecond cases jitter by more than the relative threshold, so the slowdown must also exceed an absolute floor.
+    relative = seconds / calibration
+    return (relative / expected - 1) * 100 > threshold and (relative - expected) * calibration > floor
+
+def find_regressions(
+    results: Dict[str, float],
+    calibration: float,
+    baseline: Optional[Dict[str, Any]],
+    threshold: float,
+    floor: float
+) -> List[str]:
+    cases = (baseline or {}).get("cases", {})
+    return [
+        name for name, seconds in results.items()
+        if cases.get(name, {}).get("relative")
+        and is_regression(seconds, calibration, cases[name]["relative"], threshold, floor)
+    ]
+
+async def confirm_regressions(
+    cases: Dict[str, Case],
+    results: Dict[str, float],
+    calibration: float,
+    baseline: Optional[Dict[str, Any]],
+    args: argparse.Namespace
+):
+    # A single slow run is usually noise: suspects are measured again and keep their best time.
+    for _ in range(args.confirm):
+        suspects = find_regressions(results, calibration, baseline, args.threshold, args.floor / 1e6)
+        if not suspects:
+            break
+
+        retried = await run_cases({name: cases[name] for name in suspects}, args.repeat, args.min_time)
+        for name, seconds in retried.items():
+            results[name] = min(results[name], seconds)
+
+def compare(
+    results: Dict[str, float],
+    calibration: float,
+    baseline: Optional[Dict[str, Any]],
+    threshold: float,
+    floor: float = 0
+) -> List[str]:
+    regressions = []
+    cases = (baseline or {}).get("cases", {})
+
+    print(f"{'case':<38} {'time':>11} {'relative':>10} {'baseline':>10} {'change':>9}")
+    for name, seconds in results.items():
+        relative = seconds / calibration
+        line = f"{name:<38} {seconds * 1e6:>9.2f}us {relative:>10.2f}"
+
+        expected = cases.get(name, {}).get("relative")
+        if expected:
+            change = (relative / expected - 1) * 100
+            line += f" {expected:>10.2f} {change:>+8.1f}%"
+            if is_regression(seconds, calibration, expected, threshold, floor):
+                line += "  REGRESSION"
+                regressions.append(name)
+        else:
+            line += f" {'-':>10} {'new':>9}"
+        print(line)
+
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks of per-message hot paths.")
+    parser.add_argument("--threshold", type=float, default=25, help="Allowed slowdown against the baseline, in percent.")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this string.")
+    parser.add_argument(
+        "--floor", type=float, default=0.1,
+        help="Slowdowns smaller than this, in microseconds, are not regressions."
+    )
+    parser.add_argument(
+        "--confirm", type=int, default=2,
+        help="How many times cases over the threshold are measured again before they are reported."
+    )
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum duration of one timing run, in seconds.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILEPATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as rules_dir:
+        cases = {
+            name: case for name, case in build_cases(Path(rules_dir)).items()
+            if args.filter in name
+        }
+        calibration = calibrate()
+        results = await run_cases(cases, args.repeat, args.min_time)
+
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else None
+        if not args.update_baseline:
+            await confirm_regressions(cases, results, calibration, baseline, args)
+
+    regressions = compare(
+        results, calibration, None if args.update_baseline else baseline, args.threshold, args.floor / 1e6
+    )
+
+    if args.update_baseline:
+        cases_data = (baseline or {}).get("cases", {}) if args.filter else {}
+        cases_data.update({
+            name: {"seconds": round(seconds, 12), "relative": round(seconds / calibration, 4)}
+            for name, seconds in results.items()
+        })
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "calibration": round(calibration, 12),
+            "cases": dict(sorted(cases_data.items()))
+        }, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}.")
+    elif regressions:
+        print(
+            f"\n{len(regressions)} case(s) are more than {args.threshold:g}% slower than the baseline: "
+            + ", ".join(regressions),
+            file=sys.stderr
+        )
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
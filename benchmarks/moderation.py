@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import logging
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from anonflow import metrics
+from anonflow.moderation import (
+    BackendHealth,
+    Hedger,
+    ModerationExecutor,
+    ModerationPlanner,
+    RuleManager,
+    TokenBudget
+)
+from anonflow.services.transport.results import ModerationDecisionResult
+
+from .fake_openai import add_arguments, from_arguments
+
+RULES = """
+# General [always]
+Posts are published anonymously. Reject anything that breaks the law or the rules below.
+Posts must be written in Russian or English.
+
+# Personal data
+No personal data of other people: phone numbers, home addresses, passport or ID documents,
+car plates, workplaces. Photos of other people are only allowed with their consent.
+Doxxing, publishing private conversations or screenshots of private chats is forbidden.
+
+# Insults and harassment
+No insults, humiliation or harassment of users, staff or third parties.
+Criticism of opinions is fine, attacks on people are not. Repeated mockery counts as harassment.
+
+# Violence and threats
+No threats, calls for violence, glorification of attacks or instructions for hurting people or animals.
+
+# Hate speech
+No hate speech based on nationality, religion, gender, sexual orientation, disability or age.
+
+# Advertising and spam
+No advertising, spam, links to paid services, referral codes or promo codes.
+Repeated identical posts and chain messages are spam.
+
+# Buying and selling
+Private sales of personal belongings are allowed once a week: bikes, phones, clothes, furniture.
+Reselling, dropshipping and shop announcements are advertising.
+Weapons, medicines, alcohol, tobacco and counterfeit goods cannot be sold.
+
+# Drugs
+No drug sales, drug use promotion or instructions for obtaining prohibited substances.
+
+# Adult content
+No pornography or sexual content. Mild jokes are allowed, explicit descriptions are not.
+
+# Politics
+Political discussion is allowed without propaganda, agitation or calls to take part in unauthorized rallies.
+
+# Fraud
+No scams, pyramid schemes, fake giveaways, phishing links or requests for card details and codes from SMS.
+
+# Job offers
+Job offers must name the employer and the salary. Offers of easy money, couriers for cash and
+remote work without details are fraud.
+
+# Lost and found
+Lost and found posts are allowed: documents, keys, pets, phones. Do not publish full document numbers.
+
+# Events
+Announcements of free local events are allowed. Paid events count as advertising.
+""".strip()
+
+POSTS = (
+    "Selling my old bike, almost new, price negotiable, DM me.",
+    "Lost my keys near the park yesterday evening, please write if you found them.",
+    "Anyone else think the new bus schedule is terrible? Buses every 40 minutes now.",
+    "Easy money! Remote work 2 hours a day, 5000 per day, no experience needed, write in DM.",
+    "Free concert in the city square on Saturday at 6 pm, come everyone!",
+    "You are all idiots, I hope somebody finally shuts you up."
+)
+
+
+def percentile(values: List[float], q: float):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+async def run_user(executor: ModerationExecutor, user: int, messages: int, latencies: List[float], failures: List[BaseException]):
+    for index in range(messages):
+        start_time = time.perf_counter()
+        try:
+            decisions = [
+                result
+                async for result in executor.process(f"User {user} post #{index}: {POSTS[(user + index) % len(POSTS)]}")
+                if isinstance(result, ModerationDecisionResult)
+            ]
+            if not decisions:
+                raise RuntimeError("No moderation decision was produced.")
+        except Exception as e:
+            failures.append(e)
+        else:
+            latencies.append(time.perf_counter() - start_time)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure ModerationExecutor throughput against a fake OpenAI API.")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent synthetic users.")
+    parser.add_argument("--messages", type=int, default=10, help="Messages sent by each user, one after another.")
+    parser.add_argument("--backends", default="omni,gpt", help="Comma-separated moderation backends.")
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--output", choices=("text", "json_schema"), default="text", help="GPT output mode.")
+    parser.add_argument("--stream", action="store_true", help="Stream GPT responses and act on the first decision.")
+    parser.add_argument("--rules-dir", type=Path, help="Use these rule files instead of the built-in rule set.")
+    parser.add_argument("--rules-top-k", type=int, default=0, help="Attach only the k most relevant rule sections.")
+    parser.add_argument("--daily-tokens", type=int, help="GPT token budget for the run.")
+    parser.add_argument("--request-tokens", type=int, help="Largest GPT prompt allowed, in tokens.")
+    parser.add_argument("--on-exceeded", choices=("omni", "queue"), default="omni")
+    parser.add_argument("--adaptive", action="store_true", help="Skip backends that break the latency SLO.")
+    parser.add_argument("--latency-slo", type=float, default=1, help="p95 latency SLO of the adaptive policy.")
+    parser.add_argument("--probe-interval", type=float, default=1, help="Seconds between probes of a degraded backend.")
+    parser.add_argument("--hedging", action="store_true", help="Duplicate requests slower than the rolling p95.")
+    parser.add_argument("--hedge-max-rate", type=float, default=0.1, help="Largest share of duplicated requests.")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    metrics.set_enabled(True)
+
+    server = from_arguments(args)
+    base_url = await server.start(port=args.port)
+
+    with tempfile.TemporaryDirectory() as rules_dir:
+        if args.rules_dir:
+            rules_dir = args.rules_dir
+        else:
+            (Path(rules_dir) / "rules.md").write_text(RULES, encoding="utf-8")
+        rule_manager = RuleManager(rules_dir=Path(rules_dir), top_k=args.rules_top_k)
+        rule_manager.reload()
+
+        planner = ModerationPlanner(
+            api_key="sk-benchmark",
+            gpt_model="gpt-5-mini",
+            backends=frozenset(backend.strip() for backend in args.backends.split(",") if backend.strip()), # type: ignore
+            rule_manager=rule_manager,
+            base_url=base_url,
+            timeout=30,
+            max_retries=args.max_retries,
+            output=args.output,
+            stream=args.stream,
+            token_budget=TokenBudget(
+                daily_tokens=args.daily_tokens,
+                request_tokens=args.request_tokens,
+                on_exceeded=args.on_exceeded
+            ),
+            backend_health=BackendHealth(
+                enabled=args.adaptive,
+                latency_slo=args.latency_slo,
+                probe_interval=args.probe_interval
+            ),
+            hedger=Hedger(enabled=args.hedging, max_rate=args.hedge_max_rate)
+        )
+        planner.set_enabled(True)
+        executor = ModerationExecutor(planner=planner)
+
+        try:
+            await planner.prewarm()
+            server.reset()
+            metrics.moderation_prompt_chars._values.clear()
+            metrics.moderation_prompt_tokens_estimated_total._values.clear()
+
+            latencies: List[float] = []
+            failures: List[BaseException] = []
+
+            start_time = time.perf_counter()
+            await asyncio.gather(*(
+                run_user(executor, user, args.messages, latencies, failures)
+                for user in range(args.users)
+            ))
+            elapsed_time = time.perf_counter() - start_time
+        finally:
+            await planner.close()
+            await server.close()
+
+    total = args.users * args.messages
+    print(
+        f"messages={total} users={args.users} time={elapsed_time:.3f}s "
+        f"throughput={len(latencies) / elapsed_time:.1f} msg/s failures={len(failures)}"
+    )
+    if latencies:
+        print(
+            f"latency p50={percentile(latencies, 50) * 1000:.1f}ms "
+            f"p95={percentile(latencies, 95) * 1000:.1f}ms "
+            f"p99={percentile(latencies, 99) * 1000:.1f}ms "
+            f"max={max(latencies) * 1000:.1f}ms"
+        )
+    print(
+        f"requests={dict(sorted(server.calls.items()))} "
+        f"http_retries={server.rate_limited + server.errors} "
+        f"(429={server.rate_limited} 500={server.errors}) "
+        f"malformed_outputs={server.malformed} "
+        f"parse_retries={int(metrics.moderation_parse_retries_total._values.get((), 0))}"
+    )
+    _, prompt_chars, prompts = metrics.moderation_prompt_chars._values.get((), (None, 0, 0))
+    responses = server.calls.get("responses", 0)
+    if prompts and responses:
+        print(
+            f"prompt_chars/request={prompt_chars / prompts:.0f} "
+            f"input_tokens/request={server.input_tokens / responses:.0f}"
+        )
+    for (backend, model), usage in planner.token_budget.get_usage().items():
+        print(
+            f"usage {backend}/{model}: requests={usage.requests} "
+            f"input_tokens={usage.input_tokens} output_tokens={usage.output_tokens}"
+        )
+    estimated = metrics.moderation_prompt_tokens_estimated_total._values
+    if estimated:
+        print("estimated prompt tokens: " + " ".join(f"{part}={int(tokens)}" for (part,), tokens in estimated.items()))
+    switches = metrics.moderation_backend_switches_total._values
+    if switches:
+        print(
+            "backend switches: " + " ".join(f"{backend}/{state}={int(count)}" for (backend, state), count in switches.items())
+            + " skipped: " + " ".join(
+                f"{backend}={int(count)}" for (backend,), count in metrics.moderation_backend_skipped_total._values.items()
+            )
+        )
+    hedges = metrics.moderation_hedges_total._values
+    if hedges:
+        print("hedges: " + " ".join(f"{backend}/{outcome}={int(count)}" for (backend, outcome), count in sorted(hedges.items())))
+    exceeded = metrics.moderation_budget_exceeded_total._values
+    if exceeded:
+        print("budget exceeded: " + " ".join(f"{action}={int(count)}" for (action,), count in exceeded.items()))
+    for error in {type(failure).__name__ for failure in failures}:
+        print(f"failed with {error}: {sum(type(failure).__name__ == error for failure in failures)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
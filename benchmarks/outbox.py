@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from sqlalchemy.engine import URL
+
+from anonflow.database import Database, OutboxRepository
+from anonflow.services import DeliveryService, Outbox, RateLimiter
+from anonflow.services.transport.content import ContentTextItem
+
+from .fake_bot_api import FakeBotAPI
+
+
+async def run(args, base_url: str, server: FakeBotAPI, use_outbox: bool):
+    server.sent.clear()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = Database(
+            URL.create("sqlite+aiosqlite", database=str(Path(tmp_dir) / "bench.db"))
+        )
+        await database.init()
+
+        bot = Bot(
+            token="42:TEST",
+            session=AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+        )
+        delivery_service = DeliveryService(
+            bot,
+            rate_limiter=RateLimiter() if args.rate_limit else None,
+            outbox=Outbox(
+                database,
+                OutboxRepository(),
+                workers=args.workers,
+                backoff_base=0.05,
+                backoff_max=1
+            ) if use_outbox else None
+        )
+        await delivery_service.start()
+
+        chat_ids = [-(1000 + i) for i in range(args.chats)]
+        expected = args.posts * args.chats
+
+        start_time = time.perf_counter()
+        for i in range(args.posts):
+            await delivery_service.fan_out(chat_ids, ContentTextItem(f"post #{i}"))
+        enqueued_time = time.perf_counter() - start_time
+
+        while (
+            use_outbox
+            and len(server.sent) < expected
+            and time.perf_counter() - start_time < args.timeout
+        ):
+            await asyncio.sleep(0.01)
+        elapsed_time = time.perf_counter() - start_time
+
+        await delivery_service.close()
+        await bot.session.close()
+        await database.close()
+
+    delivered = min(len(server.sent), expected)
+    print(
+        f"{'outbox' if use_outbox else 'direct':>6}: "
+        f"delivered={delivered}/{expected} "
+        f"handler_time={enqueued_time:.3f}s total_time={elapsed_time:.3f}s "
+        f"throughput={delivered / elapsed_time:.1f} msg/s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark DeliveryService against a local fake Bot API server.")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--retry-after-rate", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--rate-limit", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    server = FakeBotAPI(
+        latency=args.latency,
+        retry_after_rate=args.retry_after_rate,
+        retry_after=1,
+        error_rate=args.error_rate
+    )
+    base_url = await server.start(port=args.port)
+    try:
+        await run(args, base_url, server, use_outbox=False)
+        await run(args, base_url, server, use_outbox=True)
+    finally:
+        await server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import logging
+import tempfile
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram import exceptions
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import web
+
+from anonflow import recording, tracing
+
+from .e2e import (
+    MODERATION_CHAT_ID,
+    PUBLICATION_CHANNEL_ID,
+    LatencyTracer,
+    add_stack_arguments,
+    build_config,
+    dispatch,
+    print_results,
+    run_stack
+)
+from .fake_openai import FakeOpenAI
+from .stub_session import StubSession
+
+UPDATE_KINDS = ("text", "photo", "album", "video", "command", "message", "callback_query", "other")
+
+
+class ReplaySession(StubSession):
+    def __init__(self, records: Dict[str, Deque[Dict[str, Any]]], replay_latency: bool = True, **kwargs):
+        super().__init__(**kwargs)
+
+        self.records = records
+        self.replay_latency = replay_latency
+        self.replayed = 0
+
+        self._file_sizes: Dict[str, int] = {}
+        for record in records.get("getFile", ()):
+            result = record.get("result") or {}
+            if "file_path" in result and "file_size" in result:
+                self._file_sizes[result["file_path"]] = result["file_size"]
+
+    def _get_file_size(self, url: str):
+        _, _, path = url.partition("/file/bot")
+        return self._file_sizes.get(path.partition("/")[2], self.file_size)
+
+    def _raise(self, method: TelegramMethod, error: Dict[str, Any]):
+        message = error.get("message") or ""
+        if error["type"] == "TelegramRetryAfter":
+            raise exceptions.TelegramRetryAfter(method=method, message=message, retry_after=error["retry_after"] or 1)
+
+        cls = getattr(exceptions, error["type"], None)
+        if (
+            not isinstance(cls, type)
+            or not issubclass(cls, exceptions.TelegramAPIError)
+            or cls is exceptions.TelegramMigrateToChat
+        ):
+            cls = exceptions.TelegramBadRequest
+        raise cls(method=method, message=message)
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None
+    ) -> TelegramType:
+        queue = self.records.get(method.__api_method__)
+        if not queue:
+            return await super().make_request(bot, method, timeout)
+
+        record = queue.popleft()
+        self.calls[method.__api_method__] += 1
+        self.replayed += 1
+
+        if self.replay_latency:
+            await asyncio.sleep(record["duration"])
+        if "error" in record:
+            self._raise(method, record["error"])
+
+        # Fall back to a synthetic result when the recorded one no longer fits the method.
+        try:
+            return self._validate(bot, method, record["result"])
+        except ValueError:
+            return self._validate(bot, method, self._result(method.__api_method__, method.model_dump(exclude_none=True)))
+
+
+class ReplayOpenAI(FakeOpenAI):
+    def __init__(self, records: Dict[str, Deque[Dict[str, Any]]], replay_latency: bool = True, **kwargs):
+        super().__init__(**kwargs)
+
+        self.records = records
+        self.replay_latency = replay_latency
+        self.replayed = 0
+
+    async def _handle(self, request: web.Request):
+        endpoint = request.match_info["endpoint"]
+        queue = self.records.get(endpoint)
+        if not queue:
+            return await super()._handle(request)
+
+        record = queue.popleft()
+        # Streamed responses are recorded without their body.
+        if record["body"] is None and record["status"] < 400:
+            return await super()._handle(request)
+
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        self.replayed += 1
+
+        await request.read()
+        if self.replay_latency:
+            await asyncio.sleep(record["duration"])
+
+        status = record["status"]
+        if status == 429:
+            self.rate_limited += 1
+        elif status >= 500:
+            self.errors += 1
+
+        headers = {"retry-after-ms": record["retry_after_ms"]} if record.get("retry_after_ms") else None
+        if isinstance(record["body"], (dict, list)):
+            return web.json_response(record["body"], status=status, headers=headers)
+        return web.Response(text=record["body"] or "", status=status, headers=headers)
+
+
+def get_update_kind(update: Dict[str, Any]):
+    message = update.get("message")
+    if message is None:
+        return "callback_query" if "callback_query" in update else "other"
+    elif "media_group_id" in message:
+        return "album"
+    elif "photo" in message:
+        return "photo"
+    elif "video" in message:
+        return "video"
+    elif message.get("text", "").startswith("/"):
+        return "command"
+    elif "text" in message:
+        return "text"
+    return "message"
+
+def get_user_id(update: Dict[str, Any]):
+    for key, event in update.items():
+        if isinstance(event, dict) and isinstance(event.get("from"), dict):
+            return event["from"].get("id")
+    return None
+
+def load(filepath: Path, max_gap: float):
+    updates: List[Tuple[float, Dict[str, Any]]] = []
+    bot_records: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+    openai_records: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+
+    offset = 0.0
+    last_ts = None
+    for record in recording.load(filepath):
+        if record["type"] == "update":
+            # Long pauses (nights, restarts) are shortened to `max_gap`.
+            if last_ts is not None:
+                offset += min(max(0, record["ts"] - last_ts), max_gap)
+            last_ts = record["ts"]
+            updates.append((offset, record["update"]))
+        elif record["type"] == "bot":
+            bot_records[record["method"]].append(record)
+        elif record["type"] == "openai":
+            openai_records[record["endpoint"]].append(record)
+
+    return updates, bot_records, openai_records
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic through the full bot stack.")
+    parser.add_argument("filepath", type=Path, help="Recording written with recording.enabled.")
+    parser.add_argument(
+        "--speed", type=float, default=0,
+        help="Replay speed: 1 keeps the recorded timing, 2 is twice as fast, 0 feeds updates as fast as possible."
+    )
+    parser.add_argument("--max-gap", type=float, default=5, help="Longest pause between two updates, in seconds.")
+    parser.add_argument("--no-latency", action="store_true", help="Answer recorded API calls without their recorded latency.")
+    parser.add_argument("--moderation", choices=("recorded", "off"), default="recorded")
+    parser.add_argument("--moderation-chat-ids", type=int, nargs="+", default=[MODERATION_CHAT_ID])
+    parser.add_argument("--publication-channel-ids", type=int, nargs="+", default=[PUBLICATION_CHANNEL_ID])
+    parser.add_argument("--api-latency", type=float, default=0.05, help="Latency of Bot API calls missing from the recording.")
+    parser.add_argument("--api-jitter", type=float, default=0.02)
+    add_stack_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    updates, bot_records, openai_records = load(args.filepath, args.max_gap)
+    if not updates:
+        parser.error(f"{args.filepath} contains no updates.")
+    if args.speed > 0:
+        updates = [(offset / args.speed, update) for offset, update in updates]
+    else:
+        updates = [(0, update) for _, update in updates]
+
+    update_kinds = {update["update_id"]: get_update_kind(update) for _, update in updates}
+    user_ids = {user_id for _, update in updates if (user_id := get_user_id(update)) is not None and user_id > 0}
+
+    openai_server = None
+    openai_url = None
+    if args.moderation == "recorded":
+        openai_server = ReplayOpenAI(openai_records, replay_latency=not args.no_latency)
+        openai_url = await openai_server.start(port=args.openai_port)
+
+    session = ReplaySession(
+        bot_records,
+        replay_latency=not args.no_latency,
+        latency=args.api_latency,
+        jitter=args.api_jitter
+    )
+    tracer = LatencyTracer(report_size=args.report)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            config = build_config(
+                args,
+                Path(directory) / "replay.db",
+                openai_url,
+                moderation_chat_ids=args.moderation_chat_ids,
+                publication_channel_ids=args.publication_channel_ids
+            )
+
+            async with run_stack(config, session) as app:
+                assert app.user_service and app.delivery_service
+
+                # Users who start with /start in the recording register themselves during the replay.
+                first_texts: Dict[int, str] = {}
+                for _, update in updates:
+                    user_id = get_user_id(update)
+                    if user_id in user_ids and user_id not in first_texts:
+                        first_texts[user_id] = (update.get("message") or {}).get("text", "")
+                for user_id in user_ids:
+                    if not first_texts.get(user_id, "").startswith("/start"):
+                        await app.user_service.add(user_id)
+
+                tracing.set_tracer(tracer)
+                await app.delivery_service.start()
+                session.calls.clear()
+
+                elapsed_time = await dispatch(app, updates)
+    finally:
+        if openai_server:
+            await openai_server.close()
+
+    print(
+        f"users={len(user_ids)} speed={args.speed or 'max'} "
+        f"replayed_bot_responses={session.replayed} "
+        f"replayed_openai_responses={openai_server.replayed if openai_server else 0}"
+    )
+    print_results(elapsed_time, update_kinds, UPDATE_KINDS, tracer, session, args.report)
+
+if __name__ == "__main__":
+    asyncio.run(main())
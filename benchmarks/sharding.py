@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import multiprocessing
+import socket
+import time
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.types import Message
+
+from anonflow.bot.sharding import ShardRouter, run_worker
+
+
+def build_update(update_id: int, chats: int):
+    chat_id = 1000 + update_id % chats
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "User"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "caption": f"post #{update_id}",
+            "photo": [
+                {
+                    "file_id": f"photo-{update_id}-{size}",
+                    "file_unique_id": f"unique-{update_id}-{size}",
+                    "width": size,
+                    "height": size
+                }
+                for size in (90, 320, 800, 1280)
+            ]
+        }
+    }
+
+
+def _worker(sock: socket.socket, payload_size: int):
+    dispatcher = Dispatcher()
+    router = Router()
+    payload = b"\x00" * payload_size
+
+    @router.message(F.photo)
+    async def on_photo(message: Message):
+        data = base64.b64encode(payload + message.photo[-1].file_id.encode())
+        hashlib.sha256(data).hexdigest()
+
+    dispatcher.include_router(router)
+    bot = Bot(token="42:TEST")
+
+    async def main():
+        try:
+            await run_worker(dispatcher, bot, sock)
+        finally:
+            await bot.session.close()
+
+    asyncio.run(main())
+
+
+async def bench(args, workers: int):
+    context = multiprocessing.get_context("spawn")
+    shard_router = ShardRouter(workers)
+
+    processes = []
+    attaches = []
+    for shard in range(workers):
+        parent_sock, child_sock = socket.socketpair()
+        process = context.Process(target=_worker, args=(child_sock, args.payload_size))
+        process.start()
+        child_sock.close()
+
+        processes.append(process)
+        attaches.append(shard_router.attach(shard, parent_sock))
+    await asyncio.gather(*attaches)
+
+    updates = [build_update(i, args.chats) for i in range(1, args.updates + 1)]
+
+    start_time = time.perf_counter()
+    for update in updates:
+        await shard_router.route(update)
+    await shard_router.close()
+
+    while any(process.is_alive() for process in processes):
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - start_time
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure update throughput of sharded worker processes.")
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--payload-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        elapsed_time = await bench(args, workers)
+        baseline = baseline or elapsed_time
+        print(
+            f"workers={workers}: updates={args.updates} time={elapsed_time:.3f}s "
+            f"throughput={args.updates / elapsed_time:.1f} upd/s speedup={baseline / elapsed_time:.2f}x"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
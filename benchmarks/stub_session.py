@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Callable, Dict, Mapping, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "anonflow", "username": "anonflow_bot"}
+
+
+class StubSession(BaseSession):
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        file_size: int = 128 * 1024,
+        responder: Optional[Callable[[str, Dict[str, Any]], Any]] = None
+    ):
+        super().__init__()
+
+        self.latency = latency
+        self.jitter = jitter
+        self.file_size = file_size
+        self.responder = responder
+
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    def _get_latency(self):
+        if self.latency <= 0:
+            return 0
+        return max(0, random.gauss(self.latency, self.jitter))
+
+    def _message(self, chat_id: Any, **fields):
+        chat_id = int(chat_id) if isinstance(chat_id, (int, str)) else 0
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            **fields
+        }
+
+    def _result(self, name: str, params: Dict[str, Any]):
+        chat_id = params.get("chat_id", 0)
+
+        if name == "getMe":
+            return BOT_USER
+        elif name == "getFile":
+            return {
+                "file_id": params["file_id"],
+                "file_unique_id": params["file_id"][-16:],
+                "file_size": self.file_size,
+                "file_path": f"photos/{params['file_id']}.jpg"
+            }
+        elif name == "getChatMember":
+            return {
+                "status": "member",
+                "user": {"id": params["user_id"], "is_bot": False, "first_name": "User"}
+            }
+        elif name == "sendMediaGroup":
+            return [self._message(chat_id, photo=[]) for _ in params.get("media", ())]
+        elif name in ("sendMessage", "editMessageText"):
+            return self._message(chat_id, text=params.get("text", ""))
+        elif name.startswith("send"):
+            return self._message(chat_id, caption=params.get("caption"))
+
+        return True
+
+    def _validate(self, bot: Bot, method: TelegramMethod[TelegramType], result: Any) -> TelegramType:
+        response = Response[method.__returning__].model_validate( # type: ignore
+            {"ok": True, "result": result}, context={"bot": bot}
+        )
+        return response.result # type: ignore
+
+    def _get_file_size(self, url: str):
+        return self.file_size
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+        timeout: Optional[int] = None
+    ) -> TelegramType:
+        name = method.__api_method__
+        self.calls[name] += 1
+
+        latency = self._get_latency()
+        if latency:
+            await asyncio.sleep(latency)
+
+        params = method.model_dump(exclude_none=True)
+        result = self.responder(name, params) if self.responder else None
+        if result is None:
+            result = self._result(name, params)
+
+        return self._validate(bot, method, result)
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: Optional[Mapping[str, Any]] = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True
+    ) -> AsyncGenerator[bytes, None]:
+        self.calls["download"] += 1
+
+        latency = self._get_latency()
+        if latency:
+            await asyncio.sleep(latency)
+
+        remaining = self._get_file_size(url)
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            remaining -= size
+            yield b"\xff" * size
+
+    async def close(self):
+        pass
@@ -0,0 +1,111 @@
+import argparse
+import ast
+import gettext
+import timeit
+from collections import defaultdict
+from datetime import datetime
+
+from aiogram.types import Chat, Message, User
+
+from anonflow import __version_str__, paths
+from anonflow.translator import Translator
+
+CASES = {
+    "static": ("messages.user.moderation_started", {}),
+    "extra": ("messages.staff.moderation_rejected", {"explanation": "Spam."}),
+    "context": ("messages.user.command_info", {}),
+}
+
+
+def legacy_format(bot, s: str, message, **extra):
+    user = message.from_user
+    chat = message.chat
+
+    first_name = getattr(user, "first_name", "")
+    last_name = getattr(user, "last_name", "")
+
+    msg_context = {
+        "chat_id": getattr(chat, "id", ""),
+        "user_id": getattr(user, "id", ""),
+        "first_name": first_name,
+        "last_name": last_name,
+        "full_name": " ".join(filter(None, (first_name, last_name))),
+        "username": getattr(user, "username", ""),
+        "bot_first_name": getattr(bot, "first_name", ""),
+        "bot_last_name": getattr(bot, "last_name", ""),
+        "bot_username": getattr(bot, "username", ""),
+        "bot_version": __version_str__
+    }
+
+    return s.format_map(defaultdict(str, msg_context | extra))
+
+
+class POCatalog(gettext.NullTranslations):
+    def __init__(self, filepath):
+        super().__init__()
+
+        self._messages = {}
+        msgid = msgstr = None
+        current = None
+        with open(filepath, encoding="utf-8") as po_file:
+            for line in po_file:
+                line = line.strip()
+                if line.startswith("msgid "):
+                    if msgid:
+                        self._messages[msgid] = msgstr
+                    msgid, msgstr, current = ast.literal_eval(line[6:]), "", "msgid"
+                elif line.startswith("msgstr "):
+                    msgstr, current = ast.literal_eval(line[7:]), "msgstr"
+                elif line.startswith('"') and current == "msgid":
+                    msgid += ast.literal_eval(line)
+                elif line.startswith('"') and current == "msgstr":
+                    msgstr += ast.literal_eval(line)
+        if msgid:
+            self._messages[msgid] = msgstr
+
+    def gettext(self, message):
+        return self._messages.get(message) or message
+
+
+def build_message():
+    return Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=42, type="private"),
+        from_user=User(id=42, is_bot=False, first_name="Ivan", last_name="Ivanov", username="ivan"),
+        text="Hello"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the Translator render path.")
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    translator = Translator(translations_dir=paths.TRANSLATIONS_DIR)
+    translator.bot = User(id=1, is_bot=True, first_name="anonflow", username="anonflow_bot") # type: ignore
+    catalog = translator._catalogs["ru"] = POCatalog(
+        paths.TRANSLATIONS_DIR / "ru" / "LC_MESSAGES" / "messages.po"
+    )
+    message = build_message()
+
+    _ = translator.get("ru")
+    for name, (msgid, extra) in CASES.items():
+        template = catalog.gettext(msgid)
+
+        legacy_time = timeit.timeit(
+            lambda: legacy_format(translator.bot, catalog.gettext(msgid), message, **extra),
+            number=args.number
+        )
+        current_time = timeit.timeit(lambda: _(msgid, message=message, **extra), number=args.number)
+
+        assert _(msgid, message=message, **extra) == legacy_format(translator.bot, template, message, **extra)
+
+        print(
+            f"{name:>8}: legacy={legacy_time / args.number * 1e6:.2f}us "
+            f"compiled={current_time / args.number * 1e6:.2f}us "
+            f"speedup={legacy_time / current_time:.2f}x"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import logging
+import time
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message
+
+from anonflow.bot.webhook import run_webhook
+
+from .fake_bot_api import FakeBotAPI
+
+SECRET_TOKEN = "benchmark-secret"
+
+
+def build_update(update_id: int):
+    user_id = 1000 + update_id % 500
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": f"message #{update_id}"
+        }
+    }
+
+
+def build_dispatcher(args, handled: asyncio.Event):
+    dispatcher = Dispatcher()
+    router = Router()
+    counter = {"count": 0}
+
+    @router.message()
+    async def on_message(message: Message):
+        if args.handler_latency:
+            await asyncio.sleep(args.handler_latency)
+        counter["count"] += 1
+        if counter["count"] >= args.updates:
+            handled.set()
+
+    dispatcher.include_router(router)
+    return dispatcher
+
+
+async def bench_polling(args, bot: Bot, server: FakeBotAPI):
+    handled = asyncio.Event()
+    dispatcher = build_dispatcher(args, handled)
+    server.updates = [build_update(i) for i in range(1, args.updates + 1)]
+
+    start_time = time.perf_counter()
+    task = asyncio.create_task(
+        dispatcher.start_polling(
+            bot,
+            polling_timeout=0,
+            handle_signals=False,
+            close_bot_session=False,
+            allowed_updates=dispatcher.resolve_used_update_types()
+        )
+    )
+    await asyncio.wait_for(handled.wait(), args.timeout)
+    elapsed_time = time.perf_counter() - start_time
+
+    await dispatcher.stop_polling()
+    await task
+    return elapsed_time
+
+
+async def bench_webhook(args, bot: Bot):
+    handled = asyncio.Event()
+    dispatcher = build_dispatcher(args, handled)
+
+    task = asyncio.create_task(
+        run_webhook(
+            dispatcher,
+            bot,
+            url=None,
+            host="127.0.0.1",
+            port=args.webhook_port,
+            secret_token=SECRET_TOKEN,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            handle_signals=False
+        )
+    )
+    await asyncio.sleep(0.5)
+
+    semaphore = asyncio.Semaphore(args.connections)
+    url = f"http://127.0.0.1:{args.webhook_port}/webhook"
+
+    async with aiohttp.ClientSession() as session:
+        async def post(update_id: int):
+            async with semaphore:
+                async with session.post(
+                    url,
+                    json=build_update(update_id),
+                    headers={"X-Telegram-Bot-Api-Secret-Token": SECRET_TOKEN}
+                ) as response:
+                    response.raise_for_status()
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, args.updates + 1)))
+        await asyncio.wait_for(handled.wait(), args.timeout)
+        elapsed_time = time.perf_counter() - start_time
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return elapsed_time
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare update throughput of polling and webhook modes.")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--handler-latency", type=float, default=0)
+    parser.add_argument("--connections", type=int, default=40)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--webhook-port", type=int, default=8082)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    server = FakeBotAPI(latency=0)
+    base_url = await server.start(port=args.api_port)
+    bot = Bot(token="42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+    try:
+        for mode, bench in (
+            ("polling", lambda: bench_polling(args, bot, server)),
+            ("webhook", lambda: bench_webhook(args, bot)),
+        ):
+            elapsed_time = await bench()
+            print(f"{mode:>8}: updates={args.updates} time={elapsed_time:.3f}s throughput={args.updates / elapsed_time:.1f} upd/s")
+    finally:
+        await bot.session.close()
+        await server.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
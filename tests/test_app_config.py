@@ -0,0 +1,15 @@
+from anonflow.app import LIVE_CONFIG_FIELDS, Application
+from anonflow.bot.middleware import SubscriptionMiddleware
+
+
+def test_uninstalled_middleware_settings_require_restart():
+    app = Application()
+    live_fields = app._get_live_fields()
+    assert "behavior.subscription_requirement.channel_ids" not in live_fields
+    assert "behavior.throttling.delay" not in live_fields
+    assert "forwarding.moderation_chat_ids" in live_fields
+
+    app.middlewares = [SubscriptionMiddleware.__new__(SubscriptionMiddleware)]
+    live_fields = app._get_live_fields()
+    assert "behavior.subscription_requirement.channel_ids" in live_fields
+    assert len(live_fields) == len(LIVE_CONFIG_FIELDS) - 1
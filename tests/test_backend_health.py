@@ -0,0 +1,40 @@
+from anonflow.moderation import BackendHealth
+
+BACKENDS = frozenset(["omni", "gpt"])
+
+
+def test_slow_backend_is_skipped_and_probed():
+    health = BackendHealth(enabled=True, latency_slo=1, min_samples=5, recovery_samples=2, probe_interval=0)
+    for _ in range(5):
+        health.observe("gpt", 2)
+    assert health.is_degraded("gpt")
+
+    # With a zero probe interval every call is a probe; a single good probe is not enough to recover.
+    assert health.allow("gpt", BACKENDS)
+    health.observe("gpt", 0.1)
+    assert health.is_degraded("gpt")
+    health.observe("gpt", 0.1)
+    assert not health.is_degraded("gpt")
+
+
+def test_degraded_backend_is_skipped_between_probes():
+    health = BackendHealth(enabled=True, error_rate_slo=0.2, min_samples=5, probe_interval=60)
+    for ok in (True, False, False, True, True):
+        health.observe("gpt", 0.1, ok)
+
+    assert health.is_degraded("gpt")
+    assert not health.allow("gpt", BACKENDS)
+
+
+def test_last_backend_always_runs():
+    health = BackendHealth(enabled=True, latency_slo=1, min_samples=1, probe_interval=60)
+    health.observe("gpt", 2)
+    health.observe("omni", 2)
+    assert health.allow("gpt", BACKENDS)
+
+
+def test_disabled_health_allows_everything():
+    health = BackendHealth(min_samples=1)
+    health.observe("gpt", 100, False)
+    assert not health.is_degraded("gpt")
+    assert health.allow("gpt", BACKENDS)
@@ -0,0 +1,70 @@
+import asyncio
+
+from sqlalchemy.engine import URL
+
+from anonflow.database import Database, TokenUsageRepository
+from anonflow.moderation import TokenBudget
+from anonflow.moderation.budget import estimate_tokens
+
+
+def test_reserve_respects_limits():
+    budget = TokenBudget(daily_tokens=1000, request_tokens=400)
+    assert estimate_tokens("x" * 10) == 3
+
+    assert budget.reserve(500) is None
+    first = budget.reserve(400)
+    assert first == 400
+    second = budget.reserve(400)
+    assert second == 400
+    # In-flight reservations count against the day, so a third concurrent request is refused.
+    assert budget.reserve(300) is None
+
+    budget.release(first) # type: ignore
+    budget.record("gpt", "model", 350, 50)
+    assert budget.get_spent() == 400
+    assert budget.reserve(300) is None
+    budget.release(second) # type: ignore
+    assert budget.reserve(300) == 300
+
+
+def test_estimate_follows_reported_usage():
+    budget = TokenBudget()
+    for _ in range(50):
+        budget.record("gpt", "model", 200, 10, estimated_tokens=100)
+    assert 195 <= budget.adjust(100) <= 200
+
+
+def test_daily_budget_is_split_between_shards():
+    budget = TokenBudget(daily_tokens=1000, shard=1, shards=4)
+    assert budget.get_daily_limit() == 250
+    assert budget.reserve(300) is None
+    assert budget.reserve(250) == 250
+
+
+def test_usage_survives_restart(tmp_path):
+    async def run():
+        database = Database(URL.create("sqlite+aiosqlite", database=str(tmp_path / "anonflow.db")))
+        await database.init()
+
+        budget = TokenBudget(daily_tokens=1000, shard=1, shards=2)
+        await budget.start(database, TokenUsageRepository())
+        budget.record("gpt", "model", 300, 20)
+        budget.record("gpt", "model", 100, 10)
+        await budget.close()
+
+        restarted = TokenBudget(daily_tokens=1000, shard=1, shards=2)
+        await restarted.start(database, TokenUsageRepository())
+        usage = restarted.get_usage()[("gpt", "model")]
+        assert (usage.requests, usage.input_tokens, usage.output_tokens) == (2, 400, 30)
+        assert restarted.reserve(100) is None
+
+        # Other workers keep their own share.
+        other = TokenBudget(daily_tokens=1000, shard=0, shards=2)
+        await other.start(database, TokenUsageRepository())
+        assert other.get_spent() == 0
+
+        await restarted.close()
+        await other.close()
+        await database.close()
+
+    asyncio.run(run())
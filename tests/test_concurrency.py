@@ -0,0 +1,30 @@
+import asyncio
+
+from aiogram.types import Update
+
+from anonflow.bot.middleware import ConcurrencyMiddleware
+
+
+def test_dump_skips_started_updates(tmp_path):
+    async def run():
+        concurrency = ConcurrencyMiddleware(limit=1)
+        blocked = asyncio.Event()
+
+        async def handler(event, data):
+            await blocked.wait()
+
+        tasks = [
+            asyncio.create_task(concurrency(handler, Update(update_id=update_id), {}))
+            for update_id in (1, 2)
+        ]
+        await asyncio.sleep(0.01)
+
+        filepath = tmp_path / "pending.jsonl"
+        assert concurrency.dump(filepath) == 1
+        assert [update["update_id"] for update in ConcurrencyMiddleware.load(filepath)] == [2]
+
+        blocked.set()
+        await asyncio.gather(*tasks)
+        assert concurrency._started == set()
+
+    asyncio.run(run())
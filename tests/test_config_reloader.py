@@ -0,0 +1,186 @@
+import asyncio
+import logging
+
+from pydantic import BaseModel
+
+from anonflow import paths
+from anonflow.app import LIVE_CONFIG_FIELDS, Application
+from anonflow.bot.middleware import SubscriptionMiddleware, ThrottlingMiddleware
+from anonflow.bot.routers import TextRouter
+from anonflow.config import Config, ConfigReloader
+from anonflow.services import RateLimiter
+from anonflow.services.transport.router import MessageRouter
+
+
+class ConfigSpy:
+    # Wraps a config and records the path of every setting that is read through it.
+    def __init__(self, config, path="", reads=None):
+        self._config = config
+        self._path = path
+        self.reads = set() if reads is None else reads
+
+    def __getattr__(self, name):
+        value = getattr(self._config, name)
+        path = f"{self._path}.{name}" if self._path else name
+        if isinstance(value, BaseModel):
+            return ConfigSpy(value, path, self.reads)
+        self.reads.add(path)
+        return value
+
+
+def get_settings(data, prefix=""):
+    for key, value in data.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from get_settings(value, path)
+        else:
+            yield path
+
+
+def build_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "RULES_DIR", tmp_path / "rules")
+    app = Application(config=Config(moderation={"enabled": False})) # type: ignore
+    asyncio.run(app._init_moderation())
+    app.message_router = MessageRouter((), (), None, None) # type: ignore
+    return app
+
+
+def build_reloader(app, filepath):
+    return ConfigReloader(filepath, app.config, app._apply_config, app._get_live_fields())
+
+
+def test_adaptive_slo_is_reloaded(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    filepath = tmp_path / "config.yml"
+    filepath.write_text("moderation:\n  enabled: false\n  adaptive:\n    latency_slo: 2\n")
+
+    with caplog.at_level(logging.INFO):
+        assert build_reloader(app, filepath).reload()
+    assert app.moderation_planner.backend_health.latency_slo == 2 # type: ignore
+    assert "Applied: moderation.adaptive.latency_slo" in caplog.text
+    assert "require a restart" not in caplog.text
+
+
+def test_budget_is_reloaded(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    filepath = tmp_path / "config.yml"
+    filepath.write_text(
+        "moderation:\n  enabled: false\n  budget:\n    daily_tokens: 1000\n    on_exceeded: queue\n"
+    )
+
+    with caplog.at_level(logging.INFO):
+        assert build_reloader(app, filepath).reload()
+    token_budget = app.moderation_planner.token_budget # type: ignore
+    assert (token_budget.daily_tokens, token_budget.on_exceeded) == (1000, "queue")
+    assert "require a restart" not in caplog.text
+
+
+def test_hedging_is_reloaded(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    filepath = tmp_path / "config.yml"
+    filepath.write_text("moderation:\n  enabled: false\n  hedging:\n    enabled: true\n    max_rate: 0.2\n")
+
+    with caplog.at_level(logging.INFO):
+        assert build_reloader(app, filepath).reload()
+    hedger = app.moderation_planner.hedger # type: ignore
+    assert (hedger.enabled, hedger.max_rate) == (True, 0.2)
+    assert "require a restart" not in caplog.text
+
+
+def test_rules_top_k_is_reloaded(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    (tmp_path / "rules" / "rules.md").write_text("# Spam\nNo ads.\n\n# Violence\nNo threats.\n")
+    filepath = tmp_path / "config.yml"
+    filepath.write_text("moderation:\n  enabled: false\n  rules_top_k: 1\n")
+
+    with caplog.at_level(logging.INFO):
+        assert build_reloader(app, filepath).reload()
+    assert app.rule_manager.get_rules("buy ads") == ["# Spam\nNo ads."]
+    assert "require a restart" not in caplog.text
+
+
+def test_live_fields_match_applied_settings(tmp_path, monkeypatch):
+    app = build_app(tmp_path, monkeypatch)
+    app.middlewares = [
+        ThrottlingMiddleware.__new__(ThrottlingMiddleware),
+        SubscriptionMiddleware.__new__(SubscriptionMiddleware)
+    ]
+    app.rate_limiter = RateLimiter()
+    app.routers = [TextRouter.__new__(TextRouter)]
+    reloader = build_reloader(app, tmp_path / "config.yml")
+    assert reloader.live_fields == LIVE_CONFIG_FIELDS
+
+    spy = ConfigSpy(app.config)
+    app._apply_config(spy) # type: ignore
+
+    # Every live setting is applied, and nothing else is, apart from the API key
+    # that is only used when moderation gets enabled at runtime.
+    settings = get_settings(app.config.model_dump()) # type: ignore
+    live_settings = {field for field in settings if reloader._is_live(field)}
+    assert live_settings - spy.reads == set()
+    assert {field for field in spy.reads if not reloader._is_live(field)} == {"openai.api_key"}
+
+
+def test_live_change_is_applied(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    filepath = tmp_path / "config.yml"
+    filepath.write_text("forwarding:\n  moderation_chat_ids: [-100]\nmoderation:\n  enabled: false\n")
+    reloader = build_reloader(app, filepath)
+
+    with caplog.at_level(logging.INFO):
+        assert reloader.reload()
+    assert app.message_router.moderation_chat_ids == (-100,) # type: ignore
+    assert "Applied: forwarding.moderation_chat_ids" in caplog.text
+    assert reloader._config.forwarding.moderation_chat_ids == (-100,)
+
+
+def test_restart_only_change_is_reported(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    filepath = tmp_path / "config.yml"
+    filepath.write_text("metrics:\n  port: 9200\nmoderation:\n  enabled: false\n")
+    applied = []
+    reloader = ConfigReloader(filepath, app.config, applied.append, app._get_live_fields()) # type: ignore
+
+    with caplog.at_level(logging.INFO):
+        assert reloader.reload()
+    assert applied == []
+    assert "No runtime settings changed" in caplog.text
+    assert "require a restart: metrics.port" in caplog.text
+
+
+def test_invalid_config_is_ignored(tmp_path, monkeypatch, caplog):
+    app = build_app(tmp_path, monkeypatch)
+    filepath = tmp_path / "config.yml"
+    applied = []
+    reloader = ConfigReloader(filepath, app.config, applied.append, app._get_live_fields()) # type: ignore
+
+    for text in ("moderation: [", "moderation:\n  rules_top_k: -1\n"):
+        filepath.write_text(text)
+        with caplog.at_level(logging.ERROR):
+            assert not reloader.reload()
+    assert applied == []
+    assert reloader._config is app.config
+    assert caplog.text.count("keeping the current config") == 2
+
+
+def test_failed_apply_changes_nothing(tmp_path, monkeypatch):
+    app = build_app(tmp_path, monkeypatch)
+    planner = app.moderation_planner
+    filepath = tmp_path / "config.yml"
+    reloader = build_reloader(app, filepath)
+
+    def fail():
+        raise PermissionError("rules")
+
+    # The rules cannot be read.
+    filepath.write_text("moderation:\n  enabled: false\n  model: other\n  hedging:\n    enabled: true\n")
+    monkeypatch.setattr(app.rule_manager, "read", fail)
+    assert not reloader.reload()
+    assert (planner._gpt_model, planner.hedger.enabled) == ("gpt-5-mini", False) # type: ignore
+    monkeypatch.undo()
+
+    # Moderation cannot be enabled without an API key.
+    filepath.write_text("moderation:\n  model: other\n  hedging:\n    enabled: true\n")
+    assert not reloader.reload()
+    assert (planner._gpt_model, planner.hedger.enabled) == ("gpt-5-mini", False) # type: ignore
+    assert reloader._config is app.config
@@ -0,0 +1,64 @@
+import asyncio
+
+from anonflow.services.transport.content import ContentMediaGroup, ContentMediaItem, MediaType
+from anonflow.services.transport.delivery import DeliveryService
+from anonflow.services.transport.limiter import RateLimiter
+
+
+class StubBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+    async def send_media_group(self, chat_id, media):
+        self.sent.append((chat_id, len(media)))
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.costs = []
+
+    async def acquire(self, chat_id, cost=1):
+        self.costs.append((chat_id, cost))
+
+
+def test_unawaited_call_does_not_block_chat():
+    async def run():
+        bot = StubBot()
+        delivery = DeliveryService(bot) # type: ignore
+
+        # A call that is returned but not awaited still runs and releases the chat.
+        delivery._call(1, lambda: bot.send_message(1, "first"), "sendMessage")
+        await asyncio.wait_for(delivery.send_text(1, "second"), timeout=1)
+        assert bot.sent == [(1, "first"), (1, "second")]
+
+    asyncio.run(run())
+
+
+def test_media_group_is_charged_per_item():
+    async def run():
+        limiter = RecordingLimiter()
+        delivery = DeliveryService(StubBot(), limiter) # type: ignore
+        group = ContentMediaGroup([ContentMediaItem(MediaType.PHOTO, str(index)) for index in range(4)])
+
+        await delivery.send_media_group(-1, group)
+        await delivery.fan_out([1, 2], group)
+        assert limiter.costs == [(-1, 4), (1, 4), (2, 4)]
+
+    asyncio.run(run())
+
+
+def test_rate_limiter_waits_for_group_cost():
+    async def run():
+        limiter = RateLimiter(global_per_second=100, private_chat_per_second=10, chat_burst=3)
+        loop = asyncio.get_running_loop()
+
+        start = loop.time()
+        await limiter.acquire(1, 3)
+        assert loop.time() - start < 0.05
+        await limiter.acquire(1, 2)
+        assert loop.time() - start >= 0.15
+
+    asyncio.run(run())
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message
+
+from anonflow.services.transport.digest import HEADER_RESERVE, StaffDigest
+from anonflow.services.transport.results import ModerationDecisionResult
+from anonflow.services.transport.router import DIGEST_REASON_LENGTH, MessageRouter
+
+
+class StubDelivery:
+    def __init__(self):
+        self.sent = []
+
+    async def fan_out(self, chat_ids, content):
+        self.sent.append((list(chat_ids), content.text))
+
+    async def send_text(self, chat_id, text, **kwargs):
+        self.sent.append(([chat_id], text))
+
+
+def translate(key, message=None, **kwargs):
+    return f"{key}: " + " | ".join(f"{name}={value}" for name, value in kwargs.items())
+
+
+def build_message(text):
+    return Message(message_id=1, date=datetime.now(), chat=Chat(id=42, type="private"), text=text)
+
+
+def test_split_keeps_items_whole():
+    digest = StaffDigest(None, header=str, max_length=HEADER_RESERVE + 100) # type: ignore
+    items = ["<b>" + "a" * 40 + "</b>", "&amp;" * 30, "<i>short</i>"]
+
+    chunks = digest._split(items)
+    assert [item for chunk in chunks for item in chunk] == items
+    assert all(sum(len(item) + 2 for item in chunk[:-1]) <= 100 for chunk in chunks)
+
+
+def test_flush_sends_chunks_with_header():
+    async def run():
+        delivery = StubDelivery()
+        digest = StaffDigest(delivery, header=lambda count: f"Digest ({count})", max_items=3) # type: ignore
+
+        await digest.add([1, 2], "first")
+        await digest.add([1], "second")
+        assert delivery.sent == []
+
+        await digest.add([1], "third")
+        assert delivery.sent == [([1], "Digest (3)\n\nfirst\n\nsecond\n\nthird")]
+
+        await digest.close()
+        assert delivery.sent[-1] == ([2], "Digest (1)\n\nfirst")
+
+    asyncio.run(run())
+
+
+def test_reason_is_escaped():
+    async def run():
+        delivery = StubDelivery()
+        digest = StaffDigest(delivery, header=str) # type: ignore
+        router = MessageRouter((1,), (), delivery, None, staff_digest=digest) # type: ignore
+        message = build_message("<post>")
+
+        reason = "<b>" + "&" * DIGEST_REASON_LENGTH
+        await router._handle_moderation_decision(
+            ModerationDecisionResult(is_approved=True, reason=reason), message, translate
+        )
+        item = digest._buffers[1][0]
+        assert "excerpt=&lt;post&gt;" in item
+        assert "explanation=&lt;b&gt;" + "&amp;" * (DIGEST_REASON_LENGTH - 3) + "…" in item
+
+        await router._handle_moderation_decision(
+            ModerationDecisionResult(is_approved=False, reason="<script>", severity="high"), message, translate
+        )
+        assert "explanation=&lt;script&gt;" in delivery.sent[0][1]
+
+    asyncio.run(run())
@@ -0,0 +1,136 @@
+import asyncio
+import random
+import socket
+
+import aiohttp
+
+from anonflow.moderation import Hedger
+from benchmarks.fake_openai import FakeOpenAI
+
+
+class ScriptedBackend:
+    def __init__(self, latencies):
+        self.latencies = list(latencies)
+        self.calls = 0
+
+    async def request(self):
+        latency = self.latencies[self.calls] if self.calls < len(self.latencies) else self.latencies[-1]
+        self.calls += 1
+        await asyncio.sleep(latency)
+        return latency
+
+
+def warm_up(hedger, backend, latency, count):
+    hedger._get_state(backend).latencies.extend([latency] * count)
+    hedger._get_state(backend).hedged.extend([False] * count)
+
+
+def test_slow_request_is_hedged_and_sampled_once():
+    async def run():
+        hedger = Hedger(enabled=True, min_samples=5, max_rate=0.5, min_delay=0.01)
+        warm_up(hedger, "gpt", 0.02, 20)
+
+        backend = ScriptedBackend([1, 0.01])
+        hedges = []
+        result = await asyncio.wait_for(
+            hedger.run("gpt", backend.request, on_hedge=lambda: hedges.append(True) or True), timeout=0.5
+        )
+        assert (result, backend.calls, hedges) == (0.01, 2, [True])
+
+        latencies = hedger._states["gpt"].latencies
+        # One sample for the call, measured from the first request, so it includes the hedge delay.
+        assert len(latencies) == 21
+        assert 0.03 <= latencies[-1] < 0.5
+
+    asyncio.run(run())
+
+
+def test_declined_hedge_waits_for_first_request():
+    async def run():
+        hedger = Hedger(enabled=True, min_samples=5, max_rate=0.5, min_delay=0.01)
+        warm_up(hedger, "gpt", 0.02, 20)
+
+        backend = ScriptedBackend([0.1, 0.01])
+        assert await hedger.run("gpt", backend.request, on_hedge=lambda: False) == 0.1
+        assert backend.calls == 1
+        assert hedger._states["gpt"].hedged_count == 0
+
+    asyncio.run(run())
+
+
+def test_rate_cap_limits_hedges():
+    async def run():
+        hedger = Hedger(enabled=True, min_samples=5, max_rate=0.1, window=20, min_delay=0.01)
+        warm_up(hedger, "gpt", 0.01, 20)
+
+        backend = ScriptedBackend([0.05])
+        for _ in range(10):
+            await hedger.run("gpt", backend.request)
+        assert hedger._states["gpt"].hedged_count <= 2
+
+    asyncio.run(run())
+
+
+def test_no_hedging_during_warm_up():
+    async def run():
+        hedger = Hedger(enabled=True, min_samples=5)
+        backend = ScriptedBackend([0.01])
+        for _ in range(4):
+            await hedger.run("gpt", backend.request)
+
+        assert backend.calls == 4
+        assert hedger.get_delay("gpt") is None
+        assert len(hedger._states["gpt"].latencies) == 4
+
+    asyncio.run(run())
+
+
+def test_hedging_cuts_injected_tail_latency():
+    async def run():
+        random.seed(1)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        server = FakeOpenAI(latency=0.02, distribution="fixed", stream_interval=0, slow_rate=0.05, slow_latency=0.5)
+        url = await server.start(port=port) + "responses"
+        # The hedge delay must sit below the injected tail, so the quantile is above the slow rate.
+        hedger = Hedger(enabled=True, quantile=0.8, min_samples=10, max_rate=0.3, window=50)
+
+        async with aiohttp.ClientSession() as session:
+            async def request():
+                async with session.post(url, json={"model": "gpt", "input": "text"}) as response:
+                    return await response.json()
+
+            loop = asyncio.get_running_loop()
+            durations = []
+            for _ in range(80):
+                start = loop.time()
+                await hedger.run("gpt", request)
+                durations.append(loop.time() - start)
+
+        await server.close()
+
+        # Once warmed up, a slow response is cut off at roughly the p95 delay plus one fast request.
+        assert max(durations[10:]) < 0.25
+        assert hedger.get_delay("gpt") < 0.25 # type: ignore
+
+    asyncio.run(run())
+
+
+def test_hedge_reserves_token_budget(tmp_path):
+    from anonflow import tracing
+    from anonflow.moderation import ModerationPlanner, RuleManager, TokenBudget
+
+    budget = TokenBudget(daily_tokens=100)
+    planner = ModerationPlanner(None, "model", frozenset(["gpt"]), RuleManager(tmp_path), token_budget=budget)
+    span = tracing.span("planner.gpt")
+
+    reserved = budget.reserve(60)
+    assert planner._reserve_gpt_hedge(50, span) is False
+    assert budget.get_spent() == 0
+
+    budget.release(reserved) # type: ignore
+    assert planner._reserve_gpt_hedge(50, span) is True
+    assert budget.get_spent() == 50
+    assert budget.reserve(60) is None
@@ -0,0 +1,53 @@
+import asyncio
+
+from anonflow.bot.media_groups import MediaGroupAggregator, _PendingGroup
+
+
+async def _noop(items):
+    pass
+
+
+def test_window_uses_high_percentile_of_gaps():
+    aggregator = MediaGroupAggregator(_noop, window=2, min_window=0.2, max_window=5)
+    for _ in range(90):
+        aggregator._observe_gap(_PendingGroup(chat_id=1), 0.01)
+    for _ in range(10):
+        aggregator._observe_gap(_PendingGroup(chat_id=1), 0.5)
+
+    assert aggregator._get_window(_PendingGroup(chat_id=1)) == 2.0
+
+
+def test_window_floor_and_slow_group():
+    aggregator = MediaGroupAggregator(_noop, window=2, min_window=1.5, max_window=5)
+    fast = _PendingGroup(chat_id=1)
+    for _ in range(50):
+        aggregator._observe_gap(fast, 0.005)
+    assert aggregator._get_window(fast) == 1.5
+
+    slow = _PendingGroup(chat_id=1)
+    aggregator._observe_gap(slow, 1.2)
+    assert aggregator._get_window(slow) == 2.4
+
+
+def test_slow_album_is_not_split():
+    batches = []
+
+    async def callback(items):
+        batches.append(items)
+
+    async def run():
+        aggregator = MediaGroupAggregator(callback, window=0.3, min_window=0.3, max_window=1)
+        # Prime the history with fast albums.
+        for index in range(3):
+            aggregator.add(1, f"fast-{index}", "a")
+            aggregator.add(1, f"fast-{index}", "b")
+        for item in range(3):
+            aggregator.add(2, "slow", item)
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(0.6)
+        await aggregator.close()
+
+    asyncio.run(run())
+
+    assert [0, 1, 2] in batches
+    assert len(batches) == 4
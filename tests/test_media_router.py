@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message, PhotoSize, Video
+
+from anonflow.bot.routers import MediaRouter
+from anonflow.services.transport.results import ModerationDecisionResult
+
+
+class StubExecutor:
+    def __init__(self):
+        self.calls = []
+
+    async def process(self, text=None, image=None):
+        self.calls.append((text, image))
+        yield ModerationDecisionResult(is_approved=True, reason="ok")
+
+
+def build_message(message_id=1, **fields):
+    return Message(message_id=message_id, date=datetime.now(), chat=Chat(id=42, type="private"), **fields)
+
+
+def build_video(**fields):
+    return build_message(video=Video(file_id="v", file_unique_id="v", width=1, height=1, duration=1), **fields)
+
+
+def build_photo(**fields):
+    return build_message(photo=[PhotoSize(file_id="p", file_unique_id="p", width=1, height=1)], **fields)
+
+
+def test_refused_media_is_not_moderated():
+    async def run():
+        executor = StubExecutor()
+        router = MediaRouter(None, frozenset(["photo"]), executor) # type: ignore
+
+        _, task = router._start_moderation(build_video())
+        assert task is None
+
+        # The caption is shared by the album, so it is still checked, without downloading the video.
+        _, task = router._start_moderation(build_video(caption="hello"))
+        assert task is not None
+        await task
+        assert executor.calls == [("hello", None)]
+
+        _, task = router._start_moderation(build_photo())
+        assert task is not None
+        task.cancel()
+        await router.close()
+
+    asyncio.run(run())
+
+
+def test_refused_group_cancels_pending_moderation():
+    async def run():
+        router = MediaRouter(None, frozenset(["text"]), StubExecutor()) # type: ignore
+        slow = asyncio.create_task(asyncio.sleep(10))
+        await router._process_pending([(build_photo(), slow), (build_video(), None)]) # type: ignore
+        await asyncio.sleep(0)
+        assert slow.cancelled()
+        await router.close()
+
+    asyncio.run(run())
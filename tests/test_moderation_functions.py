@@ -0,0 +1,43 @@
+from typing import Literal
+
+import pytest
+
+from anonflow.moderation.exceptions import ModerationFunctionArgumentsError
+from anonflow.moderation.functions import ModerationFunction
+
+
+def decide(status: Literal["approve", "reject"], reason: str, severity: str = "medium"):
+    return status, reason, severity
+
+
+def test_bind_drops_unknown_and_null_optional_arguments():
+    function = ModerationFunction.from_callable(decide)
+    assert function.bind({"status": "approve", "reason": "ok", "severity": None, "extra": 1}) == {
+        "status": "approve",
+        "reason": "ok"
+    }
+
+
+def test_bind_requires_an_object_with_required_arguments():
+    function = ModerationFunction.from_callable(decide)
+    with pytest.raises(ModerationFunctionArgumentsError):
+        function.bind(["approve"])
+    with pytest.raises(ModerationFunctionArgumentsError, match="reason"):
+        function.bind({"status": "approve"})
+
+
+def test_bind_keeps_extra_arguments_for_var_keyword():
+    def log(message: str, **fields):
+        return message
+
+    assert ModerationFunction.from_callable(log).bind({"message": "hi", "level": "info"}) == {
+        "message": "hi",
+        "level": "info"
+    }
+
+
+def test_schema_makes_optional_arguments_nullable():
+    args = ModerationFunction.from_callable(decide).schema["properties"]["args"]
+    assert args["required"] == ["status", "reason", "severity"]
+    assert args["properties"]["status"] == {"type": "string", "enum": ["approve", "reject"]}
+    assert args["properties"]["severity"] == {"type": ["string", "null"]}
@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import pytest
+
+from anonflow import metrics
+from anonflow.moderation import ModerationPlanner, RuleManager
+from anonflow.moderation.exceptions import ModerationOutputParseError
+from anonflow.moderation.output import OutputParser, parse_output
+
+CALL = {"name": "moderation_decision", "args": {"status": "approve", "reason": "ok"}}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps([CALL]),
+    json.dumps({"calls": [CALL]}),
+    json.dumps(CALL),
+    f"```json\n{json.dumps([CALL])}\n```",
+    f"Here is the decision:\n{json.dumps([CALL])}\nLet me know if you need anything else.",
+    json.dumps([CALL])[:-1] + ",]",
+    json.dumps([CALL, CALL])[:-len(json.dumps(CALL)) - 1]
+])
+def test_parse_output_repairs_common_defects(text):
+    assert parse_output(text)[0] == CALL
+
+
+@pytest.mark.parametrize("text", ["", "I cannot help with that.", '[{"name": "moderation_decision"'])
+def test_parse_output_rejects_text_without_calls(text):
+    with pytest.raises(ModerationOutputParseError):
+        parse_output(text)
+
+
+def test_parser_returns_calls_as_they_complete():
+    text = json.dumps({"calls": [{"name": "first", "args": {"note": "a } in a string"}}, CALL]})
+    parser = OutputParser()
+
+    calls = []
+    completed_at = []
+    for index in range(0, len(text), 7):
+        for call in parser.feed(text[index:index + 7]):
+            calls.append(call)
+            completed_at.append(index)
+
+    assert [call["name"] for call in calls] == ["first", "moderation_decision"]
+    assert completed_at[0] < len(text) // 2
+    # Nested objects such as "args" are not calls on their own.
+    assert all("name" in call for call in calls)
+
+
+def test_parse_retries_are_not_counted_as_successful_calls(tmp_path, monkeypatch):
+    async def run():
+        rule_manager = RuleManager(tmp_path)
+        rule_manager.reload()
+        planner = ModerationPlanner(None, "model", frozenset(["gpt"]), rule_manager, max_retries=1)
+        planner._should_run = lambda backend: True # type: ignore
+        responses = iter(["no calls here", json.dumps([CALL])])
+
+        async def request_gpt(params, span):
+            return next(responses), None, None
+
+        planner._request_gpt = request_gpt # type: ignore
+        monkeypatch.setattr(metrics, "_enabled", True)
+        requests = metrics.moderation_backend_requests_total
+        monkeypatch.setattr(requests, "_values", {})
+
+        assert await planner._run_gpt("post") == [CALL]
+        assert requests._values == {("gpt", "parse_error"): 1, ("gpt", "ok"): 1}
+
+    asyncio.run(run())
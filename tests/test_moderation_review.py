@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+
+from aiogram.types import Chat, Message
+
+from anonflow.bot.routers import MediaRouter
+from anonflow.moderation import ModerationExecutor, ModerationPlanner, RuleManager, TokenBudget
+from anonflow.services.transport.results import ModerationDecisionResult
+from anonflow.services.transport.router import MessageRouter
+
+
+class StubDelivery:
+    def __init__(self):
+        self.sent = []
+
+    async def fan_out(self, chat_ids, content):
+        self.sent.append(("staff", content.text))
+
+    async def send_text(self, chat_id, text, **kwargs):
+        self.sent.append(("user", text))
+
+
+def translate(key, message=None, **kwargs):
+    return key
+
+
+def test_exhausted_budget_queues_for_review(tmp_path):
+    async def run():
+        rule_manager = RuleManager(tmp_path)
+        rule_manager.reload()
+        planner = ModerationPlanner(
+            None, "model", frozenset(["gpt"]), rule_manager,
+            token_budget=TokenBudget(daily_tokens=1, on_exceeded="queue")
+        )
+        executor = ModerationExecutor(planner)
+        planner._should_run = lambda backend: True # type: ignore
+
+        calls = await planner._run_gpt("Продам велосипед")
+        function = planner.get_function(calls[0]["name"]) # type: ignore
+        decision = function.func(**function.bind(calls[0]["args"])) # type: ignore
+        assert decision == ModerationDecisionResult(
+            is_approved=False, reason=calls[0]["args"]["reason"], needs_review=True # type: ignore
+        )
+        assert executor.moderation_decision("reject", "spam").needs_review is False
+
+    asyncio.run(run())
+
+
+def test_review_is_not_reported_as_rejection():
+    async def run():
+        delivery = StubDelivery()
+        router = MessageRouter((1,), (), delivery, None) # type: ignore
+        message = Message(message_id=1, date=datetime.now(), chat=Chat(id=42, type="private"), text="post")
+
+        await router._handle_moderation_decision(
+            ModerationDecisionResult(is_approved=False, reason="budget", needs_review=True), message, translate
+        )
+        assert delivery.sent == [
+            ("staff", "messages.staff.moderation_review"),
+            ("user", "messages.user.moderation_review")
+        ]
+
+    asyncio.run(run())
+
+
+def test_album_review_yields_to_rejection():
+    review = ModerationDecisionResult(is_approved=False, reason="budget", needs_review=True)
+    rejected = ModerationDecisionResult(is_approved=False, reason="spam", severity="high")
+    approved = ModerationDecisionResult(is_approved=True, reason="ok")
+
+    assert MediaRouter._merge_decisions([approved, review]).needs_review # type: ignore
+    assert not MediaRouter._merge_decisions([review, rejected]).needs_review # type: ignore
@@ -0,0 +1,107 @@
+import asyncio
+
+from aiogram.exceptions import TelegramNetworkError
+from aiogram.methods import SendMessage
+from sqlalchemy.engine import URL
+
+from anonflow.database import Database, OutboxRepository
+from anonflow.services.transport.content import ContentMediaGroup, ContentMediaItem, ContentTextItem, MediaType
+from anonflow.services.transport.outbox import Outbox, decode_content, encode_content
+
+
+async def create_database(tmp_path):
+    database = Database(URL.create("sqlite+aiosqlite", database=str(tmp_path / "anonflow.db")))
+    await database.init()
+    return database
+
+
+async def get_entries(database):
+    async with database.get_session() as session:
+        return await OutboxRepository().get_pending(session)
+
+
+def test_content_round_trip():
+    group = ContentMediaGroup([ContentMediaItem(MediaType.PHOTO, "a", "caption"), ContentMediaItem(MediaType.VIDEO, "b")])
+    for content in (ContentTextItem("text"), group.items[0], group):
+        assert decode_content(*encode_content(content)) == content
+
+
+def test_entries_are_delivered_in_order_and_retried(tmp_path):
+    async def run():
+        database = await create_database(tmp_path)
+        outbox = Outbox(database, OutboxRepository(), backoff_base=0.01)
+        delivered = []
+        failures = [True]
+
+        async def deliver(item):
+            if item.content.text == "first" and failures:
+                failures.pop()
+                raise TelegramNetworkError(SendMessage(chat_id=item.chat_id, text=""), "timeout")
+            delivered.append((item.chat_id, item.content.text, item.attempts))
+
+        await outbox.start(deliver)
+        await outbox.put([1, 2], ContentTextItem("first"))
+        await outbox.put([1], ContentTextItem("second"))
+
+        for _ in range(100):
+            if len(delivered) == 3:
+                break
+            await asyncio.sleep(0.01)
+
+        assert [entry for entry in delivered if entry[0] == 1] == [(1, "first", 1), (1, "second", 0)]
+        assert (2, "first", 0) in delivered
+        assert await get_entries(database) == []
+
+        await outbox.close()
+        await database.close()
+
+    asyncio.run(run())
+
+
+def test_pending_entries_are_replayed_after_restart(tmp_path):
+    async def run():
+        database = await create_database(tmp_path)
+
+        stopped = Outbox(database, OutboxRepository())
+        await stopped.put([1], ContentTextItem("kept"))
+        assert len(await get_entries(database)) == 1
+
+        delivered = []
+
+        async def deliver(item):
+            delivered.append(item.content)
+
+        outbox = Outbox(database, OutboxRepository())
+        await outbox.start(deliver)
+        await asyncio.sleep(0.05)
+
+        assert delivered == [ContentTextItem("kept")]
+        assert await get_entries(database) == []
+
+        await outbox.close()
+        await database.close()
+
+    asyncio.run(run())
+
+
+def test_failed_entries_are_kept_as_failed(tmp_path):
+    async def run():
+        database = await create_database(tmp_path)
+        outbox = Outbox(database, OutboxRepository())
+
+        async def deliver(item):
+            raise ValueError("bad request")
+
+        await outbox.start(deliver)
+        await outbox.put([1], ContentTextItem("broken"))
+        await asyncio.sleep(0.05)
+
+        assert await get_entries(database) == []
+        async with database.get_session() as session:
+            entry = await OutboxRepository()._get(session, filters={"chat_id": 1})
+        assert (entry.status, entry.attempts) == ("failed", 1)
+
+        await outbox.close()
+        await database.close()
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+import asyncio
+
+from aiogram.filters import CommandObject
+
+from anonflow.bot.routers.profile import ProfileRouter
+from anonflow.services.transport.results import ProfilingFinishedResult, ProfilingStartedResult
+
+
+class StubProfiler:
+    def __init__(self):
+        self.finish = asyncio.Event()
+
+    def start(self, duration):
+        async def run():
+            await self.finish.wait()
+            return "profile.collapsed", 10
+
+        return asyncio.create_task(run())
+
+
+class StubMessageRouter:
+    def __init__(self):
+        self.results = []
+
+    async def dispatch(self, result, message):
+        self.results.append(result)
+
+
+def test_profile_is_reported_in_background():
+    async def run():
+        profiler = StubProfiler()
+        message_router = StubMessageRouter()
+        router = ProfileRouter(message_router, None, profiler) # type: ignore
+        router.setup()
+        on_profile = router.message.handlers[0].callback
+
+        await asyncio.wait_for(on_profile(None, CommandObject(command="profile", args="5")), timeout=1)
+        assert message_router.results == [ProfilingStartedResult(5)]
+
+        profiler.finish.set()
+        await asyncio.gather(*router._reports)
+        assert message_router.results[-1] == ProfilingFinishedResult("profile.collapsed", 10)
+
+    asyncio.run(run())
@@ -0,0 +1,104 @@
+import json
+from datetime import datetime
+
+from aiogram.types import (
+    Chat,
+    Contact,
+    LinkPreviewOptions,
+    Location,
+    Message,
+    MessageEntity,
+    MessageOriginHiddenUser,
+    Poll,
+    PollOption,
+    Update,
+    User,
+    Venue
+)
+
+from anonflow.recording import ANONYMOUS_NAME, Recorder, load
+
+SECRETS = (
+    "Ivan", "Petrov", "ivan_petrov", "+79991234567", "Secret Street", "Hidden Cafe",
+    "example.com", "55.7558", "37.6173", "Ivan Petrov Hidden", "Who is Ivan", "Ivan's poll", "TEL",
+    "123456789", "987654321"
+)
+
+
+def build_update():
+    user = User(id=123456789, is_bot=False, first_name="Ivan", last_name="Petrov", username="ivan_petrov")
+    location = Location(latitude=55.7558, longitude=37.6173)
+    return Update(
+        update_id=1,
+        message=Message(
+            message_id=10,
+            date=datetime.now(),
+            chat=Chat(id=123456789, type="private", first_name="Ivan", username="ivan_petrov"),
+            from_user=user,
+            text="Call Ivan at +79991234567, see example.com",
+            entities=[MessageEntity(type="text_link", offset=0, length=4, url="https://example.com/ivan")],
+            link_preview_options=LinkPreviewOptions(url="https://example.com/preview"),
+            forward_origin=MessageOriginHiddenUser(date=datetime.now(), sender_user_name="Ivan Petrov Hidden"),
+            location=location,
+            contact=Contact(
+                phone_number="+79991234567",
+                first_name="Ivan",
+                last_name="Petrov",
+                user_id=987654321,
+                vcard="BEGIN:VCARD\nTEL:+79991234567\nEND:VCARD"
+            ),
+            venue=Venue(
+                location=location,
+                title="Hidden Cafe",
+                address="Secret Street 1",
+                google_place_id="Ivan-place"
+            ),
+            poll=Poll(
+                id="poll",
+                question="Who is Ivan?",
+                options=[PollOption(text="Ivan's poll", voter_count=1)],
+                total_voter_count=1,
+                is_closed=False,
+                is_anonymous=True,
+                type="quiz",
+                allows_multiple_answers=False,
+                explanation="Ivan Petrov lives on Secret Street"
+            )
+        )
+    )
+
+
+def test_full_update_is_anonymized(tmp_path):
+    recorder = Recorder(tmp_path / "recording.jsonl", salt="salt")
+    recorder.record_update(build_update())
+    recorder.close()
+
+    text = (tmp_path / "recording.jsonl").read_text(encoding="utf-8")
+    for secret in SECRETS:
+        assert secret not in text
+
+    message = next(load(tmp_path / "recording.jsonl"))["update"]["message"]
+    assert message["from"]["first_name"] == ANONYMOUS_NAME
+    assert message["location"] == {"latitude": 0.0, "longitude": 0.0}
+    assert message["entities"][0]["url"].endswith(".invalid")
+    assert len(message["text"]) == len("Call Ivan at +79991234567, see example.com")
+
+
+def test_public_chat_names_are_kept(tmp_path):
+    recorder = Recorder(tmp_path / "recording.jsonl", salt="salt")
+    chat = {"id": -100, "type": "channel", "title": "News", "username": "news"}
+    assert recorder.anonymize({"chat": chat}) == {"chat": chat}
+
+
+def test_openai_reasons_are_masked(tmp_path):
+    recorder = Recorder(tmp_path / "recording.jsonl", salt="salt")
+    output = json.dumps({
+        "calls": [{"name": "moderation_decision", "args": {"status": "REJECT", "reason": "Quotes \"Ivan\" +7999"}}]
+    })
+    recorder.record_openai("responses", 200, 0.1, {"output": [{"content": [{"text": output}]}]})
+    recorder.close()
+
+    record = next(load(tmp_path / "recording.jsonl"))
+    calls = json.loads(record["body"]["output"][0]["content"][0]["text"])["calls"]
+    assert calls[0]["name"] == "moderation_decision"
+    assert calls[0]["args"] == {"status": "REJECT", "reason": "xxxxxx \"xxxx\" +0000"}
@@ -0,0 +1,43 @@
+from anonflow.moderation import RuleManager
+from anonflow.moderation.rule_index import BM25Index, tokenize
+
+RULES = """# Общие правила [always]
+Публикуются только анонимные сообщения.
+
+# Реклама
+Запрещена реклама товаров, услуг и каналов, продажа и объявления о покупке.
+
+# Оскорбления
+Запрещены оскорбления, угрозы и травля участников.
+
+# Личные данные
+Нельзя публиковать телефоны, адреса и фотографии других людей.
+"""
+
+
+def test_tokenize_folds_inflections_and_drops_stop_words():
+    assert tokenize("Продаю велосипеды и продажа, это все") == ["продаю", "велоси", "продаж"]
+
+
+def test_bm25_ranks_matching_documents_first():
+    index = BM25Index(["реклама каналов", "угрозы и травля", "реклама реклама товаров"])
+    assert index.search("реклама", 2) == [2, 0]
+    assert index.search("травля", 5) == [1]
+    assert index.search("погода", 5) == []
+
+
+def test_rule_manager_selects_relevant_sections(tmp_path):
+    (tmp_path / "rules.md").write_text(RULES, encoding="utf-8")
+    rule_manager = RuleManager(tmp_path, top_k=1)
+    rule_manager.reload()
+
+    rules = rule_manager.get_rules("Продам велосипед, реклама моего канала")
+    assert len(rules) == 2
+    assert rules[0].startswith("# Общие правила\n")
+    assert rules[1].startswith("# Реклама")
+
+    assert rule_manager.get_rules() == [rules[0]]
+
+    rule_manager.top_k = 0
+    rule_manager.reload()
+    assert rule_manager.get_rules("реклама") == [RULES]
@@ -0,0 +1,46 @@
+import asyncio
+import socket
+
+from anonflow.bot.sharding import ShardRouter
+from anonflow.services.transport.limiter import RateLimiter
+
+
+def test_route_holds_updates_until_worker_restarts():
+    async def run():
+        router = ShardRouter(1)
+
+        async def attach():
+            parent, child = socket.socketpair()
+            task = asyncio.create_task(router.attach(0, parent))
+            reader, writer = await asyncio.open_connection(sock=child)
+            writer.write(b'{"allowed_updates": null}\n')
+            await task
+            return reader, writer
+
+        _, writer = await attach()
+        router._writers[0].close() # type: ignore
+
+        routed = asyncio.create_task(router.route({"update_id": 1, "message": {"chat": {"id": 5}}}))
+        await asyncio.sleep(0.05)
+        assert not routed.done()
+
+        reader, restarted = await attach()
+        await asyncio.wait_for(routed, timeout=1)
+        assert b'"update_id":1' in await reader.readline()
+
+        writer.close()
+        restarted.close()
+        await router.close()
+
+    asyncio.run(run())
+
+
+def test_shared_chats_get_a_share_per_worker():
+    limiter = RateLimiter(private_chat_per_second=1, group_chat_per_minute=60, shared_chat_ids=[-1], shards=4)
+    assert limiter._get_chat_bucket(-1).rate == 0.25
+    assert limiter._get_chat_bucket(-2).rate == 1
+    assert limiter._get_chat_bucket(7).rate == 1
+
+    limiter.set_shared_chat_ids([7])
+    assert limiter._get_chat_bucket(-1).rate == 1
+    assert limiter._get_chat_bucket(7).rate == 0.25
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Chat, Message
+
+from anonflow.services.transport.content import ContentTextItem
+from anonflow.services.transport.results import ModerationStartedResult, PostPreparedResult
+from anonflow.services.transport.router import MessageRouter
+
+
+class StubDelivery:
+    def __init__(self, fail_edits=False):
+        self.fail_edits = fail_edits
+        self.sent = []
+
+    async def fan_out(self, chat_ids, content):
+        self.sent.append(("fan_out", list(chat_ids), content.text))
+
+    async def send_text(self, chat_id, text, **kwargs):
+        self.sent.append(("send", chat_id, text))
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+    async def edit_text(self, chat_id, message_id, text, **kwargs):
+        if self.fail_edits:
+            raise TelegramBadRequest(None, "message to edit not found") # type: ignore
+        self.sent.append(("edit", message_id, text))
+
+
+def translate(key, message=None, **kwargs):
+    return key
+
+
+def build_message():
+    return Message(message_id=1, date=datetime.now(), chat=Chat(id=42, type="private"), text="post")
+
+
+async def submit(router, message, approved):
+    await router._handle_moderation_started(ModerationStartedResult(), message, translate)
+    await router._handle_post_prepared(
+        PostPreparedResult(content=ContentTextItem("post"), moderation_approved=approved), message, translate
+    )
+
+
+def test_approval_edits_the_status_message():
+    async def run():
+        delivery = StubDelivery()
+        router = MessageRouter((1,), (2,), delivery, None, status_message=True) # type: ignore
+
+        await submit(router, build_message(), approved=True)
+        assert delivery.sent == [
+            ("send", 42, "messages.user.moderation_started"),
+            ("fan_out", [1, 2], "messages.channel.text"),
+            ("edit", 101, "messages.user.moderation_approved")
+        ]
+        assert not router._status_messages
+
+    asyncio.run(run())
+
+
+def test_failed_edit_sends_a_new_message():
+    async def run():
+        delivery = StubDelivery(fail_edits=True)
+        router = MessageRouter((1,), (2,), delivery, None, status_message=True) # type: ignore
+        message = build_message()
+
+        await router._handle_moderation_started(ModerationStartedResult(), message, translate)
+        await router._handle_moderation_started(ModerationStartedResult(), message, translate)
+        assert [entry[0] for entry in delivery.sent] == ["send", "send"]
+        assert router._status_messages == {(42, 1): 102}
+
+        await router._handle_post_prepared(
+            PostPreparedResult(content=ContentTextItem("post"), moderation_approved=True), message, translate
+        )
+        assert delivery.sent[-1] == ("send", 42, "messages.user.moderation_approved")
+        assert not router._status_messages
+
+    asyncio.run(run())
+
+
+def test_rejection_forgets_the_status_message():
+    async def run():
+        delivery = StubDelivery()
+        router = MessageRouter((1,), (2,), delivery, None, status_message=True) # type: ignore
+
+        await submit(router, build_message(), approved=False)
+        assert delivery.sent == [
+            ("send", 42, "messages.user.moderation_started"),
+            ("fan_out", [1], "messages.channel.text")
+        ]
+        assert not router._status_messages
+
+    asyncio.run(run())
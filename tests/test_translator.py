@@ -0,0 +1,27 @@
+import asyncio
+
+from anonflow.translator import Translator
+
+
+def test_reload_runs_in_background(tmp_path):
+    async def run():
+        translator = Translator(tmp_path, reload_interval=0.01)
+        reloads = []
+        translator.reload = lambda: reloads.append(True)
+
+        # get() is on the hot path and must not touch the filesystem.
+        translator._get_mtime = lambda: 1 / 0
+        translator.get()("messages.user.command_info")
+
+        translator._get_mtime = lambda: 0
+        translator.start()
+        await asyncio.sleep(0.05)
+        assert reloads == []
+
+        translator._get_mtime = lambda: 1
+        await asyncio.sleep(0.05)
+        assert reloads == [True]
+
+        await translator.close()
+
+    asyncio.run(run())